@@ -1,5 +1,6 @@
 # Core module for the GalPRIME simulation package.
 
+from .bgcache import *
 from .bgsub import *
 from .binning import *
 from .config import *
@@ -8,4 +9,5 @@ from .kdes import *
 from .masking import *
 from .medians import *
 from .postprocessing import *
+from .sigclip import *
 from .sims import *
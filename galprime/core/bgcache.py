@@ -0,0 +1,261 @@
+import json
+import os
+import time
+
+import numpy as np
+from photutils.segmentation import detect_sources
+from scipy import ndimage
+
+from .bgsub import bgsub_source_mask, estimate_background, estimate_background_2D
+from .masking import masking_params, segment_image
+from .sigclip import sigclip_stats, sigclip_subsample
+
+
+class BackgroundSidecar:
+    """
+    Precomputed segmentation and statistics of a library of background cutouts.
+
+    Every background cutout is reused by many objects, so everything that only depends on the
+    background is computed once per cutout and persisted next to the background library: the
+    deblended segmentation map of its contaminants (as in gen_mask), the dilated source mask and the
+    sigma-clipped statistics of the background estimate (as in bgsub_source_mask and
+    estimate_background_sigclip), and the Background2D mesh. At run time only the footprint of the
+    injected model is segmented, and merged with the cached maps (see estimate_background and
+    gen_mask).
+
+    Attributes:
+        segm (numpy.ndarray): (N, H, W) deblended segmentation maps.
+        source_mask (numpy.ndarray): (N, H, W) dilated source masks.
+        clipped_stats (numpy.ndarray): (N, 3) sigma-clipped (mean, median, std) of all pixels.
+        stats (numpy.ndarray): (N, 3) sigma-clipped (mean, median, std) outside the source mask.
+        bkg_mesh (numpy.ndarray): (N, ny, nx) Background2D background meshes.
+        bkg_rms_mesh (numpy.ndarray): (N, ny, nx) Background2D background RMS meshes.
+        settings (dict): The [BGSUB] and [MASKING] settings the sidecar was computed with, and the 
+            fingerprint of its background library (see library_fingerprint).
+        filename (str): The file the sidecar was loaded from or saved to, if any.
+    """
+
+    def __init__(self, segm, source_mask, clipped_stats, stats, bkg_mesh, bkg_rms_mesh, settings={}, 
+                 filename=None):
+        self.segm = segm
+        self.source_mask = source_mask
+        self.clipped_stats = clipped_stats
+        self.stats = stats
+        self.bkg_mesh = bkg_mesh
+        self.bkg_rms_mesh = bkg_rms_mesh
+        self.settings = settings
+        self.filename = filename
+
+    def __len__(self):
+        return len(self.segm)
+
+    def matches(self, settings, backgrounds=None):
+        """ Whether the sidecar was computed with the given settings (and library fingerprint), and 
+        holds one entry per background cutout, if these are given. """
+        if any(self.settings.get(key, None) != val for key, val in settings.items()):
+            return False
+        return backgrounds is None or len(self) == len(backgrounds)
+
+    @staticmethod
+    def compute(backgrounds, config, logger=None, library=None, filename=None):
+        """ Compute the sidecar of a list of equally sized background cutouts, read from the 
+        background library file library (if given). """
+        if len(set(np.shape(bg) for bg in backgrounds)) > 1:
+            raise ValueError("All background cutouts must share the same shape")
+
+        subsample = sigclip_subsample(config)
+        segm, source_mask, clipped_stats, stats, bkg_mesh, bkg_rms_mesh = [], [], [], [], [], []
+        for bg in backgrounds:
+            bg = np.asarray(bg, dtype=float)
+            clipped = sigclip_stats(bg, subsample=subsample)
+            mask = bgsub_source_mask(bg, config)
+            _, bkg = estimate_background_2D(bg, config, source_mask=mask)
+            segm_deblend = segment_image(bg, config, bg_stats=clipped)
+
+            segm.append(np.zeros(bg.shape, dtype=np.int32) if segm_deblend is None
+                        else segm_deblend.data.astype(np.int32))
+            source_mask.append(mask)
+            clipped_stats.append(clipped)
+            stats.append(sigclip_stats(bg, mask=mask, sigma=3, subsample=subsample))
+            bkg_mesh.append(bkg.background_mesh)
+            bkg_rms_mesh.append(bkg.background_rms_mesh)
+
+        if logger is not None:
+            logger.info(f"Precomputed background segmentation and statistics for {len(backgrounds)} backgrounds")
+        return BackgroundSidecar(np.array(segm), np.array(source_mask), np.array(clipped_stats),
+                                 np.array(stats), np.array(bkg_mesh), np.array(bkg_rms_mesh),
+                                 settings={**sidecar_settings(config), **library_fingerprint(library, backgrounds)}, 
+                                 filename=filename)
+
+    def save(self, filename):
+        np.savez_compressed(filename, segm=self.segm, source_mask=self.source_mask,
+                            clipped_stats=self.clipped_stats, stats=self.stats, bkg_mesh=self.bkg_mesh,
+                            bkg_rms_mesh=self.bkg_rms_mesh, settings=json.dumps(self.settings))
+        self.filename = filename
+
+    @staticmethod
+    def load(filename):
+        with np.load(filename) as f:
+            return BackgroundSidecar(f["segm"], f["source_mask"], f["clipped_stats"], f["stats"],
+                                     f["bkg_mesh"], f["bkg_rms_mesh"], settings=json.loads(str(f["settings"])), 
+                                     filename=filename)
+
+    def footprint(self, model, index, nsigma=0.1, pad=0):
+        """ The box enclosing the pixels where an injected model is brighter than nsigma times the
+        background standard deviation (always including the central pixel), padded by pad pixels.
+
+        Returns:
+            tuple: The (y, x) slices of the box.
+        """
+        above = model > nsigma * self.clipped_stats[index, 2]
+        centre = (model.shape[0] // 2, model.shape[1] // 2)
+
+        rows, cols = np.flatnonzero(np.any(above, axis=1)), np.flatnonzero(np.any(above, axis=0))
+        y_lo, y_hi = (min(rows[0], centre[0]), max(rows[-1], centre[0])) if len(rows) > 0 else (centre[0],) * 2
+        x_lo, x_hi = (min(cols[0], centre[1]), max(cols[-1], centre[1])) if len(cols) > 0 else (centre[1],) * 2
+        return (slice(max(y_lo - pad, 0), min(y_hi + pad + 1, model.shape[0])),
+                slice(max(x_lo - pad, 0), min(x_hi + pad + 1, model.shape[1])))
+
+    def merged_source_mask(self, data, index, model, config, dilate_size=11, timings=None):
+        """ The background source mask of an image made of a background plus an injected model.
+
+        Only the model footprint is segmented (with the cached detection threshold), dilated, and
+        merged with the cached source mask of the background.
+        """
+        timings = {} if timings is None else timings
+        bgsub_config = config.get("BGSUB", {})
+        nsigma = bgsub_config.get("NSIGMA", 1)
+        npixels = bgsub_config.get("NPIXELS", 10)
+        t0 = time.perf_counter()
+
+        box = self.footprint(model, index, nsigma=bgsub_config.get("FOOTPRINT_NSIGMA", 0.1), pad=dilate_size)
+        segm = detect_sources(data[box], nsigma * self.clipped_stats[index, 2], npixels)
+        t1 = time.perf_counter()
+        timings["THRESHOLD"], timings["SEGMENT"] = 0., t1 - t0
+
+        source_mask = self.source_mask[index].copy()
+        if segm is not None:
+            source_mask[box] |= ndimage.binary_dilation(segm.data.astype(bool), np.ones((dilate_size, dilate_size)))
+        timings["DILATE"] = time.perf_counter() - t1
+        return source_mask
+
+    def estimate_background(self, data, index, model, config={}, exclude_percentile=90, interp=None):
+        """ As bgsub.estimate_background, with the source mask merged from the cached source mask of
+        the background and the segmented model footprint (see merged_source_mask).
+        """
+        timings = {}
+        source_mask = self.merged_source_mask(data, index, model, config, timings=timings)
+        return estimate_background(data, config, exclude_percentile=exclude_percentile, interp=interp,
+                                   source_mask=source_mask, timings=timings)
+
+    def gen_mask(self, data, index, model, config=None, omit_central=True):
+        """ As masking.gen_mask, for an image made of a background plus an injected model.
+
+        The contaminants of the background come from its cached segmentation map. Only the model
+        footprint is segmented and deblended (at the threshold of the cached background standard
+        deviation above the median of the image outside the cached sources), and any segment there
+        that is not the central one is added to the mask. Pixels in the central segment, which may
+        include contaminants blended with the model, are left unmasked.
+
+        Returns:
+            tuple: The mask and a metadata dictionary.
+        """
+        segm = self.segm[index]
+        bg_median = np.median(data[segm == 0])
+        bg_stats = (bg_median, bg_median, self.clipped_stats[index, 2])
+
+        nsigma = (config or {}).get("BGSUB", {}).get("FOOTPRINT_NSIGMA", 0.1)
+        box = self.footprint(model, index, nsigma=nsigma, pad=5)
+        local = segment_image(data[box], config, bg_stats=bg_stats)
+
+        mask = segm != 0
+        if local is not None:
+            centre = (data.shape[0] // 2 - box[0].start, data.shape[1] // 2 - box[1].start)
+            central_value = local.data[centre]
+            if omit_central and central_value != 0:
+                mask[box] = (mask[box] | (local.data != 0)) & (local.data != central_value)
+            else:
+                mask[box] |= local.data != 0
+        return mask, {"SIDECAR": True}
+
+
+def sidecar_settings(config):
+    """ The [BGSUB] and [MASKING] settings a background sidecar depends on. """
+    bgsub_config = config.get("BGSUB", {})
+    settings = {key: float(bgsub_config.get(key, default)) for key, default in
+                (("BOX_SIZE", 42), ("FILTER_SIZE", 7), ("NSIGMA", 1), ("NPIXELS", 10),
+                                  ("SIGCLIP_SUBSAMPLE", 0))}
+    if "MASKING" in config:
+        settings.update({f"MASKING_{key}": float(val) for key, val in masking_params(config).items()})
+    return settings
+
+
+def library_fingerprint(library=None, backgrounds=None):
+    """ The fingerprint of a background library: the size and modification time of its file (if it 
+    exists), and the number and shape of its cutouts (if given). """
+    fingerprint = {}
+    if library is not None and os.path.exists(library):
+        fingerprint.update({"LIBRARY_BYTES": os.path.getsize(library), "LIBRARY_MTIME": os.path.getmtime(library)})
+    if backgrounds is not None:
+        fingerprint.update({"LIBRARY_N": len(backgrounds), 
+                            "LIBRARY_SHAPE": list(np.shape(backgrounds[0])) if len(backgrounds) > 0 else []})
+    return fingerprint
+
+
+def library_filename(config):
+    """ The background library file of a config. """
+    return f'{config.get("FILE_DIR", "")}{config["FILES"]["BACKGROUNDS"]}'
+
+
+def sidecar_filename(config):
+    """ The sidecar file of the background library of a config, next to the library itself. """
+    return f"{os.path.splitext(library_filename(config))[0]}_sidecar.npz"
+
+
+_background_sidecar = None
+
+
+def get_background_sidecar(config, backgrounds=None, logger=None):
+    """ Get the per-process background sidecar, if enabled by BGSUB.PRECOMPUTE.
+
+    The sidecar is loaded from next to the background library if it exists and was computed with the
+    same settings from the same library (see library_fingerprint), and otherwise computed (from the 
+    given background cutouts, or from the background file of the config) and saved there.
+
+    Args:
+        config (dict): The GalPRIME config.
+        backgrounds (Cutouts, optional): The background cutouts, if already loaded. Defaults to None.
+        logger (logging.Logger, optional): Logger. Defaults to None.
+
+    Returns:
+        BackgroundSidecar or None: The sidecar, or None if it is disabled.
+    """
+    global _background_sidecar
+
+    if not config.get("BGSUB", {}).get("PRECOMPUTE", False):
+        return None
+
+    filename, library = sidecar_filename(config), library_filename(config)
+    cutouts = None if backgrounds is None else backgrounds.cutouts
+    settings = {**sidecar_settings(config), **library_fingerprint(library, cutouts)}
+    if (_background_sidecar is not None and _background_sidecar.filename == filename
+            and _background_sidecar.matches(settings, cutouts)):
+        return _background_sidecar
+
+    sidecar = None
+    if os.path.exists(filename):
+        sidecar = BackgroundSidecar.load(filename)
+        if not sidecar.matches(settings, cutouts):
+            sidecar = None
+
+    if sidecar is None:
+        if cutouts is None:
+            from .cutouts import Cutouts
+            cutouts = Cutouts.from_file(library).cutouts
+        sidecar = BackgroundSidecar.compute(cutouts, config, logger=logger, library=library)
+        sidecar.save(filename)
+        if logger is not None:
+            logger.info(f"Saved background sidecar to {filename}")
+
+    _background_sidecar = sidecar
+    return _background_sidecar
@@ -1,11 +1,18 @@
 from photutils.background import Background2D, MedianBackground, BkgZoomInterpolator
-from photutils.segmentation import detect_sources
 
-from astropy.stats import sigma_clipped_stats, SigmaClip, gaussian_fwhm_to_sigma
+from astropy.stats import SigmaClip, gaussian_fwhm_to_sigma
 from astropy.convolution import convolve, Tophat2DKernel, Gaussian2DKernel
 
 
 import numpy as np
+import time
+from functools import lru_cache
+
+from scipy import ndimage
+from scipy.spatial import cKDTree
+
+from .masking import SegmentationProduct
+from .sigclip import sigclip_stats, sigclip_subsample
 
 def dilate_mask(mask, tophat_size):
     area = np.pi * tophat_size ** 2
@@ -17,16 +24,15 @@ def dilate_mask(mask, tophat_size):
 # def bgsub_source_mask(data, config, tophat_sizes=[1,3]):
 def bgsub_source_mask(data, config, mask=None, filter_fwhm=None,
                      filter_size=3, kernel=None, sigclip_sigma=3.0,
-                     sigclip_iters=5, dilate_size=11):
+                     sigclip_iters=5, dilate_size=11, timings=None, segmentation=None):
     """
         Source mask generation (from photutils 1.4) 
-    """ 
-    from scipy import ndimage
-
-    nsigma = config.get("BGSUB", {}).get("NSIGMA", 1)
-    npixels = config.get("BGSUB", {}).get("NPIXELS", 10)
-    threshold = nsigma * sigma_clipped_stats(data)[2]
 
+        If a timings dictionary is given, the time in seconds spent on the detection threshold, 
+        the segmentation and the dilation is stored in it under "THRESHOLD", "SEGMENT" and "DILATE".
+        If a SegmentationProduct of the data is given, its segmentation is reused (and kept for 
+        any later contaminant mask of the same image, see gen_mask).
+    """ 
     if kernel is None and filter_fwhm is not None:
         kernel_sigma = filter_fwhm * gaussian_fwhm_to_sigma
         kernel = Gaussian2DKernel(kernel_sigma, x_size=filter_size,
@@ -34,18 +40,166 @@ def bgsub_source_mask(data, config, mask=None, filter_fwhm=None,
     if kernel is not None:
         kernel.normalize()
 
-    segm = detect_sources(data, threshold, npixels)
-    if segm is None:
-        return np.zeros(data.shape, dtype=bool)
+    if segmentation is None:
+        segmentation = SegmentationProduct(data, config, sigclip_sigma=sigclip_sigma, 
+                                           sigclip_iters=sigclip_iters)
+    return segmentation.source_mask(dilate_size=dilate_size, timings=timings)
 
-    selem = np.ones((dilate_size, dilate_size))
-    return ndimage.binary_dilation(segm.data.astype(bool), selem)
-    
+
+@lru_cache(maxsize=64)
+def _zoom_matrix(n, zoom, size):
+    # (size, n) matrix of the 1D cubic spline zoom (as in BkgZoomInterpolator) of an n-point mesh
+    matrix = ndimage.zoom(np.eye(n), (zoom, 1), order=3, mode="reflect", grid_mode=True)[:size]
+    matrix.flags.writeable = False
+    return matrix
+
+
+class BlockBackground:
+    """
+    A GalPRIME-native 2D background estimate, equivalent to photutils' Background2D with 
+    SigmaClip(sigma=3), MedianBackground, StdBackgroundRMS, a median-filtered mesh and 
+    BkgZoomInterpolator, for the way estimate_background_2D uses it.
+
+    The image is padded with NaN to a whole number of boxes and reshaped into a (ny, nx, box^2) 
+    array, which is sorted once along the last axis. Sigma clipping then only ever removes values 
+    from either end of each sorted box, so every clipping iteration is a vectorised update of the 
+    (lo, hi) range of each box, with medians read off by index and standard deviations from 
+    cumulative sums, instead of repeated nanmedian/nanstd passes over the masked data. Boxes with too few unmasked pixels (exclude_percentile) 
+    are filled by inverse distance weighting from their 10 nearest good boxes, the mesh is median 
+    filtered, and the full-size background is a cubic spline zoom of the mesh (as two cached 
+    interpolation matrices).
+
+    Attributes:
+        box_size (int): The box size in pixels.
+        filter_size (int): The size of the median filter applied to the mesh.
+        background_mesh (numpy.ndarray): The (ny, nx) filtered background mesh.
+        background_rms_mesh (numpy.ndarray): The (ny, nx) filtered background RMS mesh.
+    """
+
+    def __init__(self, data, box_size, filter_size=3, mask=None, exclude_percentile=10., sigma=3., 
+                 maxiters=5):
+        data = np.asarray(data, dtype=float)
+        self.shape = data.shape
+        self.box_size = int(box_size)
+        self.filter_size = int(filter_size)
+
+        invalid = ~np.isfinite(data) if mask is None else (mask | ~np.isfinite(data))
+        if np.all(invalid):
+            raise ValueError("All input pixels are masked. Cannot compute a background.")
+
+        # (ny, nx, box^2) view of the NaN-padded image
+        ny, nx = (-(-s // self.box_size) for s in data.shape)
+        boxes = np.full((ny * self.box_size, nx * self.box_size), np.nan)
+        boxes[:data.shape[0], :data.shape[1]] = np.where(invalid, np.nan, data)
+        boxes = boxes.reshape(ny, self.box_size, nx, self.box_size).swapaxes(1, 2).reshape(ny, nx, -1)
+
+        # NaNs sort to the end, so the unmasked values of each box are sorted[..., lo:hi]
+        boxes.sort(axis=-1)
+        lo = np.zeros(boxes.shape[:2], dtype=np.intp)
+        hi = np.count_nonzero(~np.isnan(boxes), axis=-1)
+
+        # Cumulative sums (about the first value, for precision) for the mean and variance of any range
+        offset = boxes[..., :1]
+        centred = np.nan_to_num(boxes - offset)
+        sums = np.concatenate([np.zeros((*boxes.shape[:2], 1)), np.cumsum(centred, axis=-1)], axis=-1)
+        squares = np.concatenate([np.zeros((*boxes.shape[:2], 1)), np.cumsum(centred ** 2, axis=-1)], axis=-1)
+
+        def box_stats(lo, hi):
+            n = np.maximum(hi - lo, 1)
+            take = lambda a, i: np.take_along_axis(a, i[..., None], axis=-1)[..., 0]
+            median = (take(boxes, lo + (n - 1) // 2) + take(boxes, lo + n // 2)) / 2
+            mean = (take(sums, hi) - take(sums, lo)) / n
+            var = np.maximum((take(squares, hi) - take(squares, lo)) / n - mean ** 2, 0)
+            return median, np.sqrt(var)
+
+        for _ in range(maxiters):
+            median, std = box_stats(lo, hi)
+            new_lo = np.maximum(lo, np.count_nonzero(boxes < (median - sigma * std)[..., None], axis=-1))
+            new_hi = np.minimum(hi, np.count_nonzero(boxes <= (median + sigma * std)[..., None], axis=-1))
+            if np.array_equal(new_lo, lo) and np.array_equal(new_hi, hi):
+                break
+            lo, hi = new_lo, new_hi
+
+        bkg, bkgrms = box_stats(lo, hi)
+        ngood = hi - lo
+        bad = ngood <= (1 - exclude_percentile / 100.) * self.box_size ** 2
+        bkg[bad], bkgrms[bad] = np.nan, np.nan
+
+        self.background_mesh = self._filter_mesh(self._fill_mesh(bkg))
+        self.background_rms_mesh = self._filter_mesh(self._fill_mesh(bkgrms))
+        self._background, self._background_rms = None, None
+
+    @staticmethod
+    def _fill_mesh(mesh, n_neighbors=10):
+        # Inverse distance weighting of the nearest good boxes into the bad (NaN) ones
+        good = ~np.isnan(mesh)
+        if np.all(good):
+            return mesh
+        if not np.any(good):
+            raise ValueError("No boxes with enough unmasked pixels. Cannot compute a background.")
+
+        # A k-d tree query, as in photutils, so that ties between equally distant boxes break the same way
+        good_yx, bad_yx = np.argwhere(good), np.argwhere(~good)
+        dist, nearest = cKDTree(good_yx, leafsize=10).query(bad_yx, k=min(n_neighbors, len(good_yx)))
+        dist, nearest = dist.reshape(len(bad_yx), -1), nearest.reshape(len(bad_yx), -1)
+        weights = 1 / dist
+
+        filled = mesh.copy()
+        filled[~good] = np.sum(weights * mesh[good][nearest], axis=1) / np.sum(weights, axis=1)
+        return filled
+
+    def _filter_mesh(self, mesh):
+        # NaN-aware median filter of the mesh, with NaN outside the edges
+        if self.filter_size <= 1:
+            return mesh
+        lo, hi = self.filter_size // 2, self.filter_size - 1 - self.filter_size // 2
+        padded = np.pad(mesh, ((lo, hi), (lo, hi)), constant_values=np.nan)
+        windows = np.lib.stride_tricks.sliding_window_view(padded, (self.filter_size, self.filter_size))
+        return np.nanmedian(windows, axis=(-2, -1))
+
+    def _zoom(self, mesh):
+        # The cubic spline zoom is linear and separable, so it is applied as W_y @ mesh @ W_x^T
+        if np.ptp(mesh) == 0:
+            return np.full(self.shape, np.min(mesh))
+        w_y = _zoom_matrix(mesh.shape[0], self.box_size, self.shape[0])
+        w_x = _zoom_matrix(mesh.shape[1], self.box_size, self.shape[1])
+        image = w_y @ mesh @ w_x.T
+        return np.clip(image, np.min(mesh), np.max(mesh), out=image)
+
+    @property
+    def background(self):
+        """ The full-size background image. """
+        if self._background is None:
+            self._background = self._zoom(self.background_mesh)
+        return self._background
+
+    @property
+    def background_rms(self):
+        """ The full-size background RMS image. """
+        if self._background_rms is None:
+            self._background_rms = self._zoom(self.background_rms_mesh)
+        return self._background_rms
+
+    @property
+    def background_median(self):
+        return np.median(self.background_mesh)
+
+    @property
+    def background_rms_median(self):
+        return np.median(self.background_rms_mesh)
 
 
 def estimate_background_2D(data, config={}, tophat_sizes=[3, 5, 7],
                            exclude_percentile=90, interp=None,
-                           plot_test=False):
+                           plot_test=False, source_mask=None):
+    """ Estimate the 2D background of an image, with its sources masked.
+
+    BGSUB.ESTIMATOR selects the vectorised BlockBackground ("block", the default) or the 
+    equivalent photutils Background2D ("photutils").
+
+    Returns:
+        tuple: The source mask and the background object (Background2D or BlockBackground).
+    """
 
     data = np.copy(data)
     data[np.isinf(data)] = np.nan
@@ -56,7 +210,13 @@ def estimate_background_2D(data, config={}, tophat_sizes=[3, 5, 7],
     nsigma = config.get("BGSUB", {}).get("NSIGMA", 3)
     npixels = config.get("BGSUB", {}).get("NPIXELS", 10)
     
-    source_mask = bgsub_source_mask(data, config)
+    if source_mask is None:
+        source_mask = bgsub_source_mask(data, config)
+
+    if config.get("BGSUB", {}).get("ESTIMATOR", "block") == "block":
+        bkg = BlockBackground(data, box_size, filter_size=filter_size, mask=source_mask, 
+                              exclude_percentile=exclude_percentile)
+        return source_mask, bkg
     
     if interp is None:
         interp = BkgZoomInterpolator()
@@ -74,9 +234,52 @@ def estimate_background_2D(data, config={}, tophat_sizes=[3, 5, 7],
 
 
 
-def estimate_background_sigclip(data, config):
-    source_mask = bgsub_source_mask(data, config)
+def estimate_background_sigclip(data, config, source_mask=None):
+    if source_mask is None:
+        source_mask = bgsub_source_mask(data, config)
 
-    bg_stats = sigma_clipped_stats(data, mask=source_mask, sigma=3)
+    bg_stats = sigclip_stats(data, mask=source_mask, sigma=3, subsample=sigclip_subsample(config))
 
     return bg_stats
+
+
+def estimate_background(data, config={}, exclude_percentile=90, interp=None, source_mask=None, 
+                        timings=None, segmentation=None):
+    """ Estimate the sigma-clipped background statistics and the 2D background of an image from a 
+    single source mask.
+
+    This is equivalent to calling estimate_background_sigclip and estimate_background_2D, but the 
+    source mask (detection threshold, segmentation and dilation) is only computed once and shared 
+    by both estimates.
+
+    Args:
+        data (numpy.ndarray): The image.
+        config (dict, optional): The GalPRIME config ([BGSUB] section). Defaults to {}.
+        exclude_percentile (float, optional): Passed to Background2D. Defaults to 90.
+        interp (optional): Background2D interpolator. Defaults to None (BkgZoomInterpolator).
+        source_mask (numpy.ndarray, optional): Precomputed source mask (e.g. from a 
+            BackgroundSidecar). Defaults to None.
+        timings (dict, optional): Timings of steps already done for the source mask, to include in 
+            the returned timings. Defaults to None.
+        segmentation (SegmentationProduct, optional): The segmentation of the data to derive the 
+            source mask from (see bgsub_source_mask). Defaults to None.
+
+    Returns:
+        tuple: The sigma-clipped (mean, median, std) of the unmasked pixels, the source mask, the 
+            Background2D object, and a dictionary of the time in seconds spent in each step 
+            ("THRESHOLD", "SEGMENT", "DILATE", "SIGCLIP", "BKG2D").
+    """
+    timings = {} if timings is None else dict(timings)
+    if source_mask is None:
+        source_mask = bgsub_source_mask(data, config, timings=timings, segmentation=segmentation)
+
+    t0 = time.perf_counter()
+    bg_stats = estimate_background_sigclip(data, config, source_mask=source_mask)
+    t1 = time.perf_counter()
+    timings["SIGCLIP"] = t1 - t0
+
+    _, bkg = estimate_background_2D(data, config, exclude_percentile=exclude_percentile, interp=interp, 
+                                    source_mask=source_mask)
+    timings["BKG2D"] = time.perf_counter() - t1
+
+    return bg_stats, source_mask, bkg, timings
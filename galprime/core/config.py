@@ -32,6 +32,10 @@ def default_config():
     config["PSFS"] = {}
     config["PSFS"]["PSF_RA"] = "RA"
     config["PSFS"]["PSF_DEC"] = "DEC"
+    config["PSFS"]["CONV_METHOD"] = "auto"
+    config["PSFS"]["REGISTRY"] = False
+    config["PSFS"]["ENERGY"] = 1.
+    config["PSFS"]["NORMALISE"] = True
 
     config["BINS"] = {}
     config["BINS"]["Z_BEST"] = [0.1, 0.3, 0.5, 0.7, 0.9]
@@ -44,9 +48,20 @@ def default_config():
     config["MODEL"]["SIZE"] = 451
     config["MODEL"]["ARCCONV"] = 0.168
     config["MODEL"]["ZPM"] = 27.0
+    config["MODEL"]["DTYPE"] = "float64"
+    config["MODEL"]["BATCH"] = False
+    config["MODEL"]["NORM"] = "10RE"
     config["KEYS"]["REFF_UNIT"] = "pix"
 
 
+    config["CACHE"] = {}
+    config["CACHE"]["ENABLED"] = False
+    config["CACHE"]["MAX_MB"] = 256
+    config["CACHE"]["REFF"] = 0.01
+    config["CACHE"]["N"] = 0.05
+    config["CACHE"]["ELLIP"] = 0.01
+    config["CACHE"]["PA"] = 0.0175
+
     config["MASKING"] = {}
     config["MASKING"]["METHOD"] = "exclude"
     config["MASKING"]["NSIGMA"] = 2
@@ -55,6 +70,9 @@ def default_config():
     config["MASKING"]["BG_BOXSIZE"] = 42
     config["MASKING"]["CONTRAST"] = 0.001
     config["MASKING"]["NLEVELS"] = 32
+    config["MASKING"]["DEBLEND"] = "central"
+    config["MASKING"]["INCREMENTAL"] = False
+    config["MASKING"]["INCREMENTAL_TOL"] = 0.02
 
     config["EXTRACTION"] = {}
     config["EXTRACTION"]["LINEAR"] = False
@@ -68,12 +86,25 @@ def default_config():
     config["EXTRACTION"]["MAXGERR"] = 0.5
     config["EXTRACTION"]["CONVER"] = 0.05
     config["EXTRACTION"]["INTEGRMODE"] = "bilinear"
+    config["EXTRACTION"]["WARM_START"] = True
+    config["EXTRACTION"]["MAX_ATTEMPTS"] = 24
+    config["EXTRACTION"]["FALLBACK_THREADS"] = 1
+    config["EXTRACTION"]["METHOD"] = "isophote"
+    config["EXTRACTION"]["ANNULUS_STATISTIC"] = "mean"
+    config["EXTRACTION"]["SHARED_GEOMETRY"] = False
+    config["EXTRACTION"]["ADAPTIVE_MAXSMA"] = False
+    config["EXTRACTION"]["CUT_NSIGMA"] = 3.
+    config["EXTRACTION"]["CUT_STEPS"] = 3
 
     config["BGSUB"] = {}
     config["BGSUB"]["BOX_SIZE"] = 42
     config["BGSUB"]["FILTER_SIZE"] = 7
     config["BGSUB"]["NSIGMA"] = 3
     config["BGSUB"]["NPIXELS"] = 10
+    config["BGSUB"]["ESTIMATOR"] = "block"
+    config["BGSUB"]["PRECOMPUTE"] = False
+    config["BGSUB"]["FOOTPRINT_NSIGMA"] = 0.1
+    config["BGSUB"]["SIGCLIP_SUBSAMPLE"] = 0
 
     return config
 
@@ -97,6 +128,14 @@ def galprime_configspec():
     # cspec["KEYS"]["DEC"] = "string(default='DEC_1')"
 
 
+    cspec["PSFS"] = {}
+    cspec["PSFS"]["CONV_METHOD"] = "option('direct', 'fft', 'oa', 'separable', 'mixture', 'auto', default='auto')"
+    cspec["PSFS"]["REGISTRY"] = "boolean(default=False)"
+    cspec["PSFS"]["ENERGY"] = "float(min=0, max=1, default=1)"
+    cspec["PSFS"]["NORMALISE"] = "boolean(default=True)"
+    cspec["PSFS"]["MAX_RESIDUAL"] = "float(min=0, max=1, default=None)"
+    cspec["PSFS"]["MIXTURE_TOL"] = "float(min=0, max=1, default=0.001)"
+
     cspec["BINS"] = {}
 
     cspec["MODEL"] = {}
@@ -106,10 +145,22 @@ def galprime_configspec():
     cspec["MODEL"]["ARCCONV"] = "float(default=0.168)"
     cspec["MODEL"]["ZPM"] = "float(default=27.0)"
     cspec["MODEL"]["REFF_UNIT"] = "string(default='pixel')"
+    cspec["MODEL"]["DTYPE"] = "option('float64', 'float32', default='float64')"
+    cspec["MODEL"]["BATCH"] = "boolean(default=False)"
+    cspec["MODEL"]["NORM"] = "option('10RE', 'ANALYTIC', default='10RE')"
+    cspec["MODEL"]["TRUNC_FRAC"] = "float(min=0, max=1, default=None)"
     
     cspec["DIRS"] = {}
     cspec["DIRS"]["OUTDIR"] = "string(default='gprime_out/')"
 
+    cspec["CACHE"] = {}
+    cspec["CACHE"]["ENABLED"] = "boolean(default=False)"
+    cspec["CACHE"]["MAX_MB"] = "float(default=256)"
+    cspec["CACHE"]["REFF"] = "float(default=0.01)"
+    cspec["CACHE"]["N"] = "float(default=0.05)"
+    cspec["CACHE"]["ELLIP"] = "float(default=0.01)"
+    cspec["CACHE"]["PA"] = "float(default=0.0175)"
+
     cspec["MASKING"] = {}
     cspec["MASKING"]["METHOD"] = "string(default='exclude')"
     cspec["MASKING"]["NSIGMA"] = "float(default=1)"
@@ -118,6 +169,9 @@ def galprime_configspec():
     cspec["MASKING"]["BG_BOXSIZE"] = "integer(default=50)"
     cspec["MASKING"]["CONTRAST"] = "float(default=0.001)"
     cspec["MASKING"]["NLEVELS"] = "integer(default=32)"
+    cspec["MASKING"]["DEBLEND"] = "option('full', 'central', default='central')"
+    cspec["MASKING"]["INCREMENTAL"] = "boolean(default=False)"
+    cspec["MASKING"]["INCREMENTAL_TOL"] = "float(min=0, default=0.02)"
 
     cspec["EXTRACTION"] = {}
     cspec["EXTRACTION"]["LINEAR"] = "boolean(default=False)"
@@ -128,12 +182,25 @@ def galprime_configspec():
     cspec["EXTRACTION"]["MINSMA"] = "integer(default=1)"
     cspec["EXTRACTION"]["CONVER"] = "float(default=0.05)"
     cspec["EXTRACTION"]["INTEGRMODE"] = "string(default='bilinear')"
+    cspec["EXTRACTION"]["WARM_START"] = "boolean(default=True)"
+    cspec["EXTRACTION"]["MAX_ATTEMPTS"] = "integer(min=1, default=24)"
+    cspec["EXTRACTION"]["FALLBACK_THREADS"] = "integer(min=1, default=1)"
+    cspec["EXTRACTION"]["METHOD"] = "option('isophote', 'annulus', default='isophote')"
+    cspec["EXTRACTION"]["ANNULUS_STATISTIC"] = "option('mean', 'median', default='mean')"
+    cspec["EXTRACTION"]["SHARED_GEOMETRY"] = "boolean(default=False)"
+    cspec["EXTRACTION"]["ADAPTIVE_MAXSMA"] = "boolean(default=False)"
+    cspec["EXTRACTION"]["CUT_NSIGMA"] = "float(min=0, default=3.)"
+    cspec["EXTRACTION"]["CUT_STEPS"] = "integer(min=1, default=3)"
 
     cspec["BGSUB"] = {}
     cspec["BGSUB"]["BOX_SIZE"] = "integer(default=42)"
     cspec["BGSUB"]["FILTER_SIZE"] = "integer(default=7)"
     cspec["BGSUB"]["NSIGMA"] = "float(default=3)"
     cspec["BGSUB"]["NPIXELS"] = "integer(default=10)"
+    cspec["BGSUB"]["ESTIMATOR"] = "option('block', 'photutils', default='block')"
+    cspec["BGSUB"]["PRECOMPUTE"] = "boolean(default=False)"
+    cspec["BGSUB"]["FOOTPRINT_NSIGMA"] = "float(min=0, default=0.1)"
+    cspec["BGSUB"]["SIGCLIP_SUBSAMPLE"] = "integer(min=0, default=0)"
 
     return cspec
 
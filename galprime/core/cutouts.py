@@ -4,8 +4,6 @@ import os
 from astropy.io import fits
 import numpy as np
 
-from scipy.signal import convolve2d
-
 from .. import plotting 
 
 import copy
@@ -63,11 +61,75 @@ class Cutouts:
 
         return out_cutouts
     
-    def convolve(self, psf):
+    def convolve(self, psf, method="auto", max_residual=None, chunk_size=None):
+        """
+        Convolves every cutout with a PSF (or with its own PSF, if a list is given). The output 
+        cutouts are the full convolution, as with scipy.signal.convolve2d.
+
+        FFT convolutions are batched: cutouts of the same shape (with PSFs of the same shape) are 
+        stacked into one (N, H, W) array and convolved with a single rfft2/irfft2 pair along the 
+        trailing axes (see galprime.models.utils.batch_fft_convolve). The cutout data, metadata and 
+        coordinates (ras, decs) are shared with (shallow copies of) this instance rather than deep-copied.
+        Parameters:
+            psf (numpy.ndarray or list): The PSF, or a list with one PSF per cutout.
+            method (str, optional): The convolution method, "direct", "fft", "oa", "separable" or "auto". 
+                Defaults to "auto", which picks the cheapest method per cutout (see 
+                galprime.models.utils.choose_convolution_method), with "fft" and "oa" both done in batch.
+            max_residual (float, optional): If given (or if method is "separable", with a default of 1e-4), 
+                each distinct PSF is decomposed once into a low-rank separable approximation within this 
+                residual energy, which "auto" uses whenever it is the cheapest method. The rank and 
+                residual of the PSF of each cutout are stored in the output metadata as PSF_RANKS and 
+                PSF_RESIDUALS (one entry per cutout).
+            chunk_size (int, optional): Maximum number of cutouts transformed at once in the batched 
+                FFT path, to bound its memory use. Defaults to None (no limit).
+        Returns:
+            Cutouts: A new `Cutouts` instance with the convolved cutouts.
+        """
+        from ..models.utils import (batch_fft_convolve, choose_convolution_method, convolve_model, 
+                                    separable_convolve, separable_decomposition)
 
         psfs = psf if isinstance(psf, list) else [psf for _ in range(len(self.cutouts))]
-        out_cutouts = self.copy()
-        out_cutouts.cutouts = [convolve2d(cutout, psf) for cutout, psf in zip(self.cutouts, psfs)]
+        out_cutouts = Cutouts(cutouts=[None] * len(self.cutouts), cutout_data=list(self.cutout_data), 
+                              metadata=dict(self.metadata), min_index=self.min_index)
+        out_cutouts.ras, out_cutouts.decs = list(self.ras), list(self.decs)
+
+        if max_residual is None and method == "separable":
+            max_residual = 1e-4
+        decompositions = {}
+        if max_residual is not None:
+            for p in psfs:
+                if id(p) not in decompositions:
+                    decompositions[id(p)] = separable_decomposition(p, max_residual=max_residual)
+            out_cutouts.metadata = {**out_cutouts.metadata, 
+                                    "PSF_RANKS": [len(decompositions[id(p)][0]) for p in psfs],
+                                    "PSF_RESIDUALS": [decompositions[id(p)][2] for p in psfs]}
+
+        batches = {}
+        for i, (cutout, p) in enumerate(zip(self.cutouts, psfs)):
+            cutout_method = method
+            if method == "auto":
+                rank = len(decompositions[id(p)][0]) if id(p) in decompositions else None
+                cutout_method = choose_convolution_method(cutout.shape, p.shape, rank=rank)
+                if cutout_method == "oa":
+                    cutout_method = "fft"
+            
+            if cutout_method == "fft":
+                batches.setdefault((np.shape(cutout), np.shape(p)), []).append(i)
+            elif cutout_method == "separable":
+                cols, rows, _ = decompositions[id(p)]
+                out_cutouts.cutouts[i] = separable_convolve(cutout, cols, rows, mode="full")
+            else:
+                out_cutouts.cutouts[i] = convolve_model(cutout, p, method=cutout_method, mode="full")
+
+        # One batched FFT convolution per group of equally shaped cutouts and PSFs
+        for indices in batches.values():
+            stack = np.stack([self.cutouts[i] for i in indices])
+            batch_psfs = [psfs[i] for i in indices]
+            if all(p is batch_psfs[0] for p in batch_psfs):
+                batch_psfs = batch_psfs[0]
+            convolved = batch_fft_convolve(stack, np.asarray(batch_psfs), mode="full", chunk_size=chunk_size)
+            for i, image in zip(indices, convolved):
+                out_cutouts.cutouts[i] = image
 
         return out_cutouts
     
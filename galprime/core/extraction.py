@@ -1,6 +1,10 @@
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import numpy as np
-from photutils.isophote import Ellipse, EllipseGeometry
+from astropy.table import Table
+from photutils.isophote import Ellipse, EllipseGeometry, IsophoteList
 
 from photutils.morphology import data_properties
 
@@ -10,11 +14,16 @@ def estimate_morphology(cutout, mask=None):
     Estimate the morphology of a galaxy.
     """
     try:
+        # data_properties does not take masked arrays, so their mask is passed separately
+        if np.ma.isMaskedArray(cutout):
+            cutout_mask = np.ma.getmaskarray(cutout)
+            mask = cutout_mask if mask is None else (mask | cutout_mask)
+            cutout = np.ma.getdata(cutout)
         morph = data_properties(cutout, mask=mask).to_table()
         x0, y0 = morph['xcentroid'][0], morph['ycentroid'][0]
         pa = morph['orientation'][0]
         a, b = morph['semimajor_sigma'][0], morph['semiminor_sigma'][0]
-        return EllipseGeometry(x0=x0, y0=y0,  sma=a.value, eps=1 - b/a, pa=np.deg2rad(pa.value))
+        return EllipseGeometry(x0=x0, y0=y0,  sma=a.value, eps=1 - (b / a).value, pa=np.deg2rad(pa.value))
     except Exception as e:
         print(f"Error: {e}")
         return None
@@ -25,9 +34,24 @@ class PoorFitException(Exception):
     pass
 
 
-def isophote_fitting(data, config, geo_init=None):
-    
+def isophote_fitting(data, config, geo_init=None, strategy=None, background=None):
+    """
+    Fit isophotes to an image, trying in turn the initial geometry (if given), and the candidates 
+    of a FallbackStrategy: the geometry estimated from the image morphology, and a grid of centred 
+    geometries. At most EXTRACTION.MAX_ATTEMPTS fits are made in total.
+
+    With EXTRACTION.ADAPTIVE_MAXSMA and a background (level, std), the isophotes stop growing 
+    before MAXSMA once they stay below the noise floor of the background (see NoiseFloorEllipse).
+
+    Returns:
+        dict: The isophote list (ISOLIST), the fit method (FIT_METHOD: 0 for the initial or estimated 
+            geometry, 1 for the grid), the geometry used (GEO), the number of fit attempts 
+            (ATTEMPTS), the time in seconds spent fitting (TIME) and the semi-major axis of the 
+            adaptive cut (CUT_SMA, None if there was none). None if no fit succeeded.
+    """
+    t0 = time.perf_counter()
     fail_count, max_fails = 0, 100
+    attempts = 0
     
     linear = config.get("EXTRACTION", {}).get("LINEAR", False)
     step = config.get("EXTRACTION", {}).get("STEP", 0.1)
@@ -44,11 +68,17 @@ def isophote_fitting(data, config, geo_init=None):
     conver = config.get("EXTRACTION", {}).get("CONVER", 0.05)
     
     integrmode = config.get("EXTRACTION", {}).get("INTEGRMODE", "bilinear")
+    cut_settings = noise_floor_settings(config) if background is not None else None
    
 
     def attempt_fit(geo):
         # Attempt to fit the ellipse with the given imput geometry
-        flux = Ellipse(data, geo )
+        nonlocal attempts
+        attempts += 1
+        if cut_settings is None:
+            flux = Ellipse(data, geo )
+        else:
+            flux = NoiseFloorEllipse(data, geo, background=background, nsigma=cut_settings[0], steps=cut_settings[1])
         try:
             fitting_list = flux.fit_image(minsma=minsma,
                                           maxsma=maxsma, 
@@ -74,35 +104,560 @@ def isophote_fitting(data, config, geo_init=None):
         try:
             fitting_list = attempt_fit(geo_init)
             if fitting_list is not None and len(fitting_list) > 0:
-                return {"ISOLIST": fitting_list, "FIT_METHOD": 0, "GEO": geo_init}
+                return {"ISOLIST": fitting_list, "FIT_METHOD": 0, "GEO": geo_init, 
+                        "ATTEMPTS": attempts, "TIME": time.perf_counter() - t0, 
+                        "CUT_SMA": fitting_list.cut_sma if cut_settings else None}
         except Exception:
             pass
 
-    # Else try to estimate the morphology directly
+    # Else search the fallback candidates, starting from the morphology of the image
+    if strategy is None:
+        strategy = get_fallback_strategy(config)
+    candidates = strategy.candidates(data, morphology=estimate_morphology(data))
+    n_initial = attempts
+    fitting_list, candidate, n_attempts = strategy.search(attempt_fit, candidates, 
+                                                         max_attempts=strategy.max_attempts - n_initial)
+    if fitting_list is not None:
+        key, geo = candidate
+        return {"ISOLIST": fitting_list, "FIT_METHOD": 0 if key[0] == "MORPH" else 1, "GEO": geo, 
+                "ATTEMPTS": n_initial + n_attempts, "TIME": time.perf_counter() - t0, 
+                "CUT_SMA": fitting_list.cut_sma if cut_settings else None}
+
+    return None
+
+
+class FallbackStrategy:
+    """
+    The search for a starting geometry of isophote_fitting, once its initial geometry failed.
+
+    The candidates are the geometry estimated from the image moments (see estimate_morphology), at 
+    one and two times its semi-major axis, followed by a centred grid of semi-major axes (10 pixels 
+    apart up to the image half-width), ellipticities and position angles. Grid candidates are 
+    ordered by their success rate so far in this process (with a uniform prior), and then by how 
+    close they are to the moment geometry (or by semi-major axis, without one). The search stops 
+    at the first success or after max_attempts fits. With n_threads > 1, candidates are fitted 
+    concurrently in a sliding window: a candidate is only started once every candidate at least 
+    n_threads places before it has finished, so fast failures cannot run far past a slow fit that 
+    may yet succeed. The first success stops the submission of candidates; the fits still running 
+    are waited for (so none outlives the search), but their outcomes are discarded and not recorded. 
+    photutils fits mostly hold the GIL, so concurrent fits share one core: threads only pay off 
+    when failing fits are slow, and the sequential search (n_threads = 1) is the default.
+
+    Attributes:
+        max_attempts (int): The maximum number of fits of one search.
+        n_threads (int): The number of concurrent fits.
+        stats (dict): The (successes, attempts) of each candidate key.
+    """
+
+    ELLIPTICITIES = (0.1, 0.5, 0.9)
+    POSITION_ANGLES = (0, 45, 90, 135)
+
+    def __init__(self, max_attempts=24, n_threads=1):
+        self.max_attempts = int(max_attempts)
+        self.n_threads = int(n_threads)
+        self.stats = {}
+
+    def success_rate(self, key):
+        successes, attempts = self.stats.get(key, (0, 0))
+        return (successes + 1) / (attempts + 2)
+
+    def record(self, key, success):
+        successes, attempts = self.stats.get(key, (0, 0))
+        self.stats[key] = (successes + int(success), attempts + 1)
+
+    def candidates(self, data, morphology=None):
+        """ The ordered (key, geometry) candidates for an image. """
+        x0, y0 = data.shape[1] // 2, data.shape[0] // 2
+        cutout_halfwidth = max((data.shape[0] // 2, data.shape[1] // 2))
+
+        candidates = []
+        if morphology is not None and np.isfinite(morphology.sma) and morphology.sma > 0:
+            for scale in (1, 2):
+                candidates.append((("MORPH", scale), 
+                                   EllipseGeometry(x0=morphology.x0, y0=morphology.y0, sma=scale * morphology.sma, 
+                                                   eps=morphology.eps, pa=morphology.pa)))
+
+        def distance(sma, eps, pa):
+            if morphology is None or not candidates:
+                return sma
+            dpa = abs((np.deg2rad(pa) - morphology.pa + np.pi / 2) % np.pi - np.pi / 2)
+            return abs(eps - morphology.eps) + dpa / (np.pi / 2) + abs(np.log(sma / (2 * morphology.sma)))
+
+        grid = [(sma, eps, pa) for sma in range(10, cutout_halfwidth, 10) 
+                for eps in self.ELLIPTICITIES for pa in self.POSITION_ANGLES]
+        grid.sort(key=lambda cell: (-self.success_rate(("GRID",) + cell), distance(*cell)))
+        candidates += [(("GRID", sma, eps, pa), 
+                        EllipseGeometry(x0=x0, y0=y0, sma=sma, eps=eps, pa=np.deg2rad(pa))) 
+                       for sma, eps, pa in grid]
+        return candidates
+
+    def search(self, fit, candidates, max_attempts=None):
+        """ Fit the candidates in order until one succeeds (fit returns a non-empty isophote list 
+        rather than None or raising), recording the outcome of every finished fit.
+
+        Returns:
+            tuple: The isophote list and the (key, geometry) candidate that succeeded (both None if 
+                none did), and the number of fits started.
+        """
+        max_attempts = self.max_attempts if max_attempts is None else max_attempts
+        candidates = candidates[:max(max_attempts, 0)]
+
+        def attempt(candidate):
+            try:
+                fitting_list = fit(candidate[1])
+            except Exception:
+                fitting_list = None
+            return fitting_list if fitting_list is not None and len(fitting_list) > 0 else None
+
+        if self.n_threads <= 1:
+            for n, candidate in enumerate(candidates, start=1):
+                fitting_list = attempt(candidate)
+                self.record(candidate[0], fitting_list is not None)
+                if fitting_list is not None:
+                    return fitting_list, candidate, n
+            return None, None, len(candidates)
+
+        # Candidates are started in order, within n_threads places of the first unfinished one. 
+        # Outcomes are recorded here rather than in the workers, so fits finishing after the first 
+        # success are not counted
+        with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+            futures, n_started = {}, 0
+
+            def refill():
+                nonlocal n_started
+                head = min((position for position, _ in futures.values()), default=n_started)
+                while n_started < len(candidates) and n_started < head + self.n_threads:
+                    futures[executor.submit(attempt, candidates[n_started])] = (n_started, candidates[n_started])
+                    n_started += 1
+
+            refill()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: futures[f][0]):
+                    _, candidate = futures.pop(future)
+                    fitting_list = future.result()
+                    self.record(candidate[0], fitting_list is not None)
+                    if fitting_list is not None:
+                        return fitting_list, candidate, n_started
+                refill()
+            return None, None, n_started
+
+
+_fallback_strategy = None
+
+
+def get_fallback_strategy(config):
+    """ Get the per-process fallback strategy of isophote_fitting, with the EXTRACTION.MAX_ATTEMPTS 
+    and EXTRACTION.FALLBACK_THREADS of the config. Its success statistics persist across objects 
+    for as long as the settings do not change. """
+    global _fallback_strategy
+
+    max_attempts = int(config.get("EXTRACTION", {}).get("MAX_ATTEMPTS", 24))
+    n_threads = int(config.get("EXTRACTION", {}).get("FALLBACK_THREADS", 1))
+    if (_fallback_strategy is None or _fallback_strategy.max_attempts != max_attempts 
+            or _fallback_strategy.n_threads != n_threads):
+        _fallback_strategy = FallbackStrategy(max_attempts=max_attempts, n_threads=n_threads)
+    return _fallback_strategy
+
+
+def _component_param(params, key, name):
+    # A parameter of a model component, as <NAME>_<KEY> (generated) or <KEY>_<NAME> (configured)
+    for component_key in (f"{name}_{key}", f"{key}_{name}"):
+        if params.get(component_key, None) is not None:
+            return params[component_key]
+    return None
+
+
+def geometry_from_params(params, min_sma=3., shape=None):
+    """
+    The initial isophote geometry of an injected model, from its X0, Y0, ELLIP, PA (in radians) and 
+    REFF parameters, with the semi-major axis at the effective radius (and at least min_sma). The 
+    ellipticity is kept within [0.05, 0.95], as the position angle of a circular isophote is undefined.
+
+    Multi-component models (see MultiComponentModel) are described by their largest component, from 
+    its <NAME>_<KEY> or <KEY>_<NAME> parameters. Without a centre, the model is taken to be centred 
+    in its SHAPE (or shape) as in gen_single_sersic.
+
+    Returns:
+        EllipseGeometry: The geometry, or None if the parameters do not describe one.
+    """
     try:
-        geo = estimate_morphology(data)
-        fitting_list = attempt_fit(geo)
-        if fitting_list is not None and len(fitting_list) > 0:
-            return {"ISOLIST": fitting_list, "FIT_METHOD": 0, "GEO": geo}
-    except Exception:
-        pass
-
-    # If that fails, try a range of possible ellipses
-    for sma in np.arange(10, cutout_halfwidth, 10):
-        for eps in [0.1, 0.5, 0.9]:
-            for pa in np.deg2rad([0, 45, 90, 135]):
-                geo = EllipseGeometry(x0=data.shape[1] // 2, y0=data.shape[0] // 2, sma=sma, eps=eps, pa=pa)
-                try:
-                    fitting_list = attempt_fit(geo)
-                    if fitting_list is not None and len(fitting_list) > 0:
-                        return {"ISOLIST": fitting_list, "FIT_METHOD": 1, "GEO": geo}
-                except Exception:
-                    continue
+        reff, name = params.get("REFF", None), None
+        if reff is None:
+            names = {str(key)[:-len("_REFF")] for key in params if str(key).endswith("_REFF")}
+            names |= {str(key)[len("REFF_"):] for key in params 
+                      if str(key).startswith("REFF_") and not str(key).startswith("REFF_UNIT")}
+            reff, name = max((float(_component_param(params, "REFF", component)), component) for component in names)
 
-    
+        def lookup(key, default=None):
+            value = params.get(key, None)
+            if value is None and name is not None:
+                value = _component_param(params, key, name)
+            return default if value is None else value
+
+        x0, y0 = lookup("X0"), lookup("Y0")
+        if x0 is None or y0 is None:
+            shape = np.atleast_1d(params.get("SHAPE", shape))
+            x0, y0 = shape[0] / 2, shape[-1] / 2
+        return EllipseGeometry(x0=float(x0), y0=float(y0), sma=max(float(reff), min_sma),
+                               eps=min(max(float(lookup("ELLIP", 0.)), 0.05), 0.95), pa=float(lookup("PA", 0.)))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def geometry_from_isolist(isolist, sma):
+    """ The geometry of the isophote of a fitted isophote list closest to a semi-major axis, as the 
+    initial geometry of another fit (or None if the list is empty). """
+    if isolist is None or len(isolist) == 0:
+        return None
+    iso = isolist.get_closest(sma)
+    return EllipseGeometry(x0=iso.x0, y0=iso.y0, sma=iso.sma, eps=iso.eps, pa=iso.pa)
+
+
+def noise_floor_settings(config):
+    """ The (nsigma, steps) of the adaptive outer-radius cut (EXTRACTION.CUT_NSIGMA and CUT_STEPS), 
+    or None if EXTRACTION.ADAPTIVE_MAXSMA is disabled. """
+    extraction_config = (config or {}).get("EXTRACTION", {})
+    if not extraction_config.get("ADAPTIVE_MAXSMA", False):
+        return None
+    return float(extraction_config.get("CUT_NSIGMA", 3.)), int(extraction_config.get("CUT_STEPS", 3))
+
+
+def noise_floor_cut(intens, ndata, background, nsigma=3., steps=3):
+    """
+    Where a profile sinks into the noise: the index of the last of the first steps consecutive 
+    ellipses whose intensity is below the noise floor of their mean, level + nsigma * std / sqrt(N), 
+    with N the number of pixels (or samples) of the ellipse. Ellipses without a finite intensity 
+    (failed fits) count as below the noise floor.
+
+    Args:
+        intens (numpy.ndarray): The intensities, from the inside out.
+        ndata (numpy.ndarray): The number of pixels of each ellipse.
+        background (tuple): The (level, std) of the background.
+
+    Returns:
+        int: The index, or None if the profile never stays below the noise floor.
+    """
+    level, std = background
+    below = ~(np.asarray(intens) >= level + nsigma * std / np.sqrt(np.maximum(ndata, 1)))
+    run = 0
+    for i, is_below in enumerate(below):
+        run = run + 1 if is_below else 0
+        if run >= steps:
+            return i
     return None
 
 
+class NoiseFloorEllipse(Ellipse):
+    """
+    A photutils Ellipse whose outward growth stops being fitted once the isophotes stay below the 
+    noise floor of the background (see noise_floor_cut).
+
+    photutils' fit_image only stops growing at maxsma, so past the cut the remaining outward 
+    isophotes are sampled once without iterating (which is cheap and cannot fail), and are then 
+    dropped by fit_image here. The cut is kept in cut_sma (None if the isophotes reached maxsma).
+    """
+
+    def __init__(self, image, geometry=None, background=(0., 0.), nsigma=3., steps=3):
+        super().__init__(image, geometry)
+        self.background = background
+        self.nsigma = nsigma
+        self.steps = steps
+        self.cut_sma = None
+        self._n_below = 0
+
+    def fit_isophote(self, sma, *args, going_inwards=False, noniterate=False, **kwargs):
+        outwards = sma > 0 and not going_inwards
+        if outwards and self.cut_sma is not None:
+            noniterate = True
+        isophote = super().fit_isophote(sma, *args, going_inwards=going_inwards, noniterate=noniterate, **kwargs)
+
+        if outwards and self.cut_sma is None:
+            below = noise_floor_cut([isophote.intens], [isophote.ndata], self.background, nsigma=self.nsigma, steps=1)
+            self._n_below = self._n_below + 1 if below is not None else 0
+            if self._n_below >= self.steps:
+                self.cut_sma = isophote.sma
+        return isophote
+
+    def fit_image(self, *args, **kwargs):
+        isolist = super().fit_image(*args, **kwargs)
+        if self.cut_sma is not None:
+            isolist = IsophoteList([iso for iso in isolist if iso.sma <= self.cut_sma])
+        isolist.cut_sma = self.cut_sma
+        return isolist
+
+
+class SamplingPlan:
+    """
+    The frozen bilinear sampling of the isophotes of a fitted isophote list, to measure the 
+    profiles of other images of the same pixels (with different backgrounds and masks) along the 
+    same ellipses without fitting them again.
+
+    The sample points of each isophote are the ones photutils' bilinear integrator walks along 
+    its ellipse (see EllipseSample), and are computed once, with their four pixel indices and 
+    bilinear weights. The profile of an image is then one gather of the pixel values and masks, 
+    and bincount reductions over the samples of each isophote, in which samples touching a masked 
+    (or non-finite) pixel are left out, as by photutils.
+
+    Attributes:
+        shape (tuple): The image shape.
+        geometries (list): The EllipseGeometry of each isophote.
+        sma (numpy.ndarray): The semi-major axis of each isophote.
+        total_points (numpy.ndarray): The number of sample points of each isophote, including the 
+            points outside the image.
+    """
+
+    def __init__(self, geometries, shape, phi_min=0.05):
+        self.shape = tuple(shape)
+        self.geometries = list(geometries)
+        self.sma = np.array([geo.sma for geo in self.geometries], dtype=float)
+
+        isophote, xs, ys, total_points = [], [], [], []
+        for k, geo in enumerate(self.geometries):
+            if geo.sma > 0:
+                radius, phi, points = geo.initial_polar_radius, geo.initial_polar_angle, []
+                while phi <= 2 * np.pi + phi_min:
+                    points.append((radius, phi))
+                    phi += min(1. / radius, 0.5)
+                    radius = geo.radius(phi)
+                radii, phis = np.array(points).T
+            else:
+                radii, phis = np.zeros(1), np.zeros(1)
+            xs.append(radii * np.cos(phis + geo.pa) + geo.x0)
+            ys.append(radii * np.sin(phis + geo.pa) + geo.y0)
+            isophote.append(np.full(len(radii), k))
+            total_points.append(len(radii))
+        xs, ys, isophote = np.concatenate(xs), np.concatenate(ys), np.concatenate(isophote)
+        self.total_points = np.array(total_points)
+
+        # Truncation towards zero and the bounds check are as in photutils' bilinear integrator
+        i, j = np.trunc(xs).astype(int), np.trunc(ys).astype(int)
+        inside = (i >= 0) & (i < self.shape[1] - 1) & (j >= 0) & (j < self.shape[0] - 1)
+        fx, fy = (xs - i)[inside], (ys - j)[inside]
+        i, j = i[inside], j[inside]
+
+        self.isophote = isophote[inside]
+        self.pixels = np.stack([j * self.shape[1] + i, (j + 1) * self.shape[1] + i,
+                                j * self.shape[1] + i + 1, (j + 1) * self.shape[1] + i + 1])
+        self.weights = np.stack([(1 - fx) * (1 - fy), (1 - fx) * fy, fx * (1 - fy), fx * fy])
+
+    @staticmethod
+    def from_isolist(isolist, shape):
+        """ The sampling plan of the converged isophotes of a photutils IsophoteList. """
+        return SamplingPlan([iso.sample.geometry for iso in isolist], shape)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def profile(self, data):
+        """ The profile of an image along the frozen isophotes.
+
+        Returns:
+            FixedGeometryProfile: The profile, without the isophotes that have no valid sample.
+        """
+        values = np.ma.getdata(data).astype(float, copy=False).ravel()
+        invalid = (np.ma.getmaskarray(data).ravel() | ~np.isfinite(values))[self.pixels]
+        good = ~np.any(invalid, axis=0)
+
+        samples = np.sum(values[self.pixels[:, good]] * self.weights[:, good], axis=0)
+        index = self.isophote[good]
+        n = len(self.geometries)
+
+        ndata = np.bincount(index, minlength=n)
+        sums = np.bincount(index, weights=samples, minlength=n)
+        squares = np.bincount(index, weights=samples ** 2, minlength=n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            intens = sums / ndata
+            int_err = np.sqrt(np.maximum(squares / ndata - intens ** 2, 0)) / np.sqrt(ndata)
+        int_err[self.sma == 0] = 0.
+
+        keep = ndata > 0
+        return FixedGeometryProfile(self.sma[keep], intens[keep], int_err[keep], ndata[keep], 
+                                    (self.total_points - ndata)[keep], 
+                                    [geo for geo, k in zip(self.geometries, keep) if k])
+
+
+def sampled_extraction(data, plan):
+    """ Extract the profile of an image along the frozen isophotes of a SamplingPlan, with the 
+    return value of isophote_fitting (a FIT_METHOD of 3, and no fit attempts). """
+    t0 = time.perf_counter()
+    profile = plan.profile(data)
+    return {"ISOLIST": profile, "FIT_METHOD": 3, "GEO": profile.get_closest(0) if len(profile) > 0 else None, 
+            "ATTEMPTS": 0, "TIME": time.perf_counter() - t0, "CUT_SMA": None}
+
+
+def annulus_smas(minsma, maxsma, step=0.1, linear=False, min_width=1.):
+    """ The semi-major axes of an annulus profile: from minsma to maxsma, either step pixels apart 
+    (linear) or growing by a factor (1 + step), but always at least min_width pixels apart. """
+    smas = [max(float(minsma), 0.)]
+    while True:
+        increment = step if linear else step * smas[-1]
+        sma = smas[-1] + max(increment, min_width)
+        if sma > maxsma:
+            return np.array(smas)
+        smas.append(sma)
+
+
+class FixedGeometryProfile:
+    """
+    A surface brightness profile measured along ellipses of a fixed geometry (elliptical annuli, 
+    see annulus_profile, or the frozen isophotes of a SamplingPlan), with the parts of the 
+    photutils IsophoteList interface that GalPRIME uses: the sma, intens and int_err arrays, len, 
+    get_closest and to_table (in the good_colnames layout of postprocessing, with zero geometry 
+    errors, iterations and stop codes).
+
+    Attributes:
+        sma (numpy.ndarray): The semi-major axis of each ellipse.
+        intens (numpy.ndarray): The mean (or median) intensity along each ellipse.
+        int_err (numpy.ndarray): The standard error of the mean intensity along each ellipse.
+        ndata (numpy.ndarray): The number of pixels (or samples) used for each ellipse.
+        nflag (numpy.ndarray): The number of masked pixels (or samples) of each ellipse.
+        x0, y0, eps, pa (numpy.ndarray): The geometry of each ellipse.
+    """
+
+    def __init__(self, sma, intens, int_err, ndata, nflag, geometry):
+        """ The geometry is either one EllipseGeometry shared by all ellipses, or one per ellipse. """
+        self.sma = sma
+        self.intens = intens
+        self.int_err = int_err
+        self.ndata = ndata
+        self.nflag = nflag
+
+        geometries = geometry if isinstance(geometry, (list, tuple)) else [geometry] * len(sma)
+        self.x0, self.y0, self.eps, self.pa = (np.array([getattr(geo, key) for geo in geometries], dtype=float)
+                                               for key in ("x0", "y0", "eps", "pa"))
+
+    def __len__(self):
+        return len(self.sma)
+
+    def get_closest(self, sma):
+        """ The geometry of the ellipse closest to a semi-major axis. """
+        i = np.argmin(np.abs(self.sma - sma))
+        return EllipseGeometry(x0=self.x0[i], y0=self.y0[i], sma=self.sma[i], eps=self.eps[i], pa=self.pa[i])
+
+    def to_table(self):
+        n, zeros = len(self.sma), np.zeros(len(self.sma))
+        table = Table()
+        table["sma"] = self.sma
+        table["intens"] = self.intens
+        table["intens_err"] = self.int_err
+        table["ellipticity"] = self.eps
+        table["ellipticity_err"] = zeros
+        table["pa"] = np.rad2deg(self.pa)
+        table["pa"].unit = "deg"
+        table["pa_err"] = zeros
+        table["pa_err"].unit = "deg"
+        table["x0"], table["x0_err"] = self.x0, zeros
+        table["y0"], table["y0_err"] = self.y0, zeros
+        table["ndata"] = self.ndata
+        table["nflag"] = self.nflag
+        table["niter"] = np.zeros(n, dtype=int)
+        table["stop_code"] = np.zeros(n, dtype=int)
+        return table
+
+
+def annulus_profile(data, geometry, smas, statistic="mean"):
+    """
+    Measure a surface brightness profile in elliptical annuli of a fixed geometry.
+
+    The elliptical radius of every pixel is computed once, each pixel is assigned to the annulus 
+    between the midpoints of the neighbouring semi-major axes, and the annulus statistics are 
+    reduced in one pass: the mean and its standard error with np.bincount, or the median from the 
+    pixels sorted by annulus and value. Masked (and non-finite) pixels are left out, and counted 
+    in nflag. Annuli without any unmasked pixel are dropped.
+
+    Args:
+        data (numpy.ndarray): The image, optionally a masked array.
+        geometry (EllipseGeometry): The centre, ellipticity and position angle of the annuli.
+        smas (numpy.ndarray): The increasing semi-major axes of the annuli.
+        statistic (str, optional): "mean" or "median". Defaults to "mean".
+
+    Returns:
+        FixedGeometryProfile: The profile.
+    """
+    values = np.ma.getdata(data).astype(float, copy=False)
+    valid = np.isfinite(values) & ~np.ma.getmaskarray(data)
+
+    ys, xs = np.indices(values.shape, dtype=float)
+    dx, dy = xs - geometry.x0, ys - geometry.y0
+    cos_t, sin_t = np.cos(geometry.pa), np.sin(geometry.pa)
+    radius = np.hypot(dx * cos_t + dy * sin_t, (dy * cos_t - dx * sin_t) / (1 - geometry.eps))
+
+    smas = np.asarray(smas, dtype=float)
+    widths = np.diff(smas) if len(smas) > 1 else np.ones(1)
+    edges = np.concatenate([[max(smas[0] - 0.5 * widths[0], 0.)], 0.5 * (smas[1:] + smas[:-1]), 
+                            [smas[-1] + 0.5 * widths[-1]]])
+    index = np.searchsorted(edges, radius.ravel(), side="right") - 1
+    inside = (index >= 0) & (index < len(smas))
+    good = inside & valid.ravel()
+
+    n_bins = len(smas)
+    ndata = np.bincount(index[good], minlength=n_bins)
+    nflag = np.bincount(index[inside & ~valid.ravel()], minlength=n_bins)
+    sums = np.bincount(index[good], weights=values.ravel()[good], minlength=n_bins)
+    squares = np.bincount(index[good], weights=values.ravel()[good] ** 2, minlength=n_bins)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / ndata
+        std = np.sqrt(np.maximum(squares / ndata - mean ** 2, 0))
+        int_err = std / np.sqrt(ndata)
+
+    if statistic == "median":
+        # Sort the pixels by annulus and value, and read off the middle of each annulus segment
+        order = np.lexsort((values.ravel()[good], index[good]))
+        sorted_values = values.ravel()[good][order]
+        starts = np.concatenate([[0], np.cumsum(ndata)[:-1]])
+        lo, hi = starts + (ndata - 1) // 2, starts + ndata // 2
+        filled = ndata > 0
+        intens = np.full(n_bins, np.nan)
+        intens[filled] = 0.5 * (sorted_values[lo[filled]] + sorted_values[hi[filled]])
+    elif statistic == "mean":
+        intens = mean
+    else:
+        raise ValueError(f"Unknown annulus statistic {statistic}, must be 'mean' or 'median'")
+
+    keep = ndata > 0
+    return FixedGeometryProfile(smas[keep], intens[keep], int_err[keep], ndata[keep], nflag[keep], geometry)
+
+
+def annulus_extraction(data, config, geo_init=None, background=None):
+    """
+    Extract a profile in elliptical annuli of a fixed geometry (see annulus_profile), as the 
+    EXTRACTION.METHOD = "annulus" alternative to isophote_fitting.
+
+    The geometry is geo_init (such as the injected model geometry, see geometry_from_params), or 
+    else the one estimated from the image morphology, or else a circle about the image centre. The 
+    annuli run from EXTRACTION.MINSMA to MAXSMA, spaced as the isophotes of isophote_fitting 
+    (STEP, LINEAR), and are reduced with EXTRACTION.ANNULUS_STATISTIC ("mean" or "median"). With 
+    EXTRACTION.ADAPTIVE_MAXSMA and a background (level, std), the profile is cut where it sinks into 
+    the noise floor of the background, as in isophote_fitting (see noise_floor_cut).
+
+    Returns:
+        dict: As isophote_fitting, with the FixedGeometryProfile as ISOLIST and a FIT_METHOD of 2.
+    """
+    t0 = time.perf_counter()
+    extraction_config = config.get("EXTRACTION", {})
+    cutout_halfwidth = max((data.shape[0] // 2, data.shape[1] // 2))
+
+    geo = geo_init if geo_init is not None else estimate_morphology(data)
+    if geo is None or not np.all(np.isfinite([geo.x0, geo.y0, geo.eps, geo.pa])):
+        geo = EllipseGeometry(x0=data.shape[1] // 2, y0=data.shape[0] // 2, sma=10, eps=0., pa=0.)
+
+    smas = annulus_smas(extraction_config.get("MINSMA", 1), extraction_config.get("MAXSMA", cutout_halfwidth), 
+                        step=extraction_config.get("STEP", 0.1), linear=extraction_config.get("LINEAR", False))
+    profile = annulus_profile(data, geo, smas, statistic=extraction_config.get("ANNULUS_STATISTIC", "mean"))
+
+    cut_sma, cut_settings = None, noise_floor_settings(config)
+    if background is not None and cut_settings is not None:
+        cut = noise_floor_cut(profile.intens, profile.ndata, background, nsigma=cut_settings[0], steps=cut_settings[1])
+        if cut is not None:
+            cut_sma = float(profile.sma[cut])
+            profile = FixedGeometryProfile(profile.sma[:cut + 1], profile.intens[:cut + 1], profile.int_err[:cut + 1], 
+                                           profile.ndata[:cut + 1], profile.nflag[:cut + 1], geo)
+    return {"ISOLIST": profile, "FIT_METHOD": 2, "GEO": geo, "ATTEMPTS": 1, "TIME": time.perf_counter() - t0, 
+            "CUT_SMA": cut_sma}
+
+
 class IsophoteFitter:
     def __init__(self, data, config={}, mask=None, centre=None, **kwargs):
         self.data = data
@@ -50,6 +50,10 @@ def update_required(params, config):
 
     params["SHAPE"] = config["MODEL"]["SIZE"]   # Update the size of the model
     params["M0"] = config["MODEL"]["ZPM"]       # Update the zero-point magnitude
+    params["DTYPE"] = config["MODEL"].get("DTYPE", "float64")   # Floating point type of the rendered model
+    params["NORM"] = config["MODEL"].get("NORM", "10RE")        # Flux normalisation method of the model
+    if config["MODEL"].get("TRUNC_FRAC", None) is not None:
+        params["TRUNC_FRAC"] = config["MODEL"]["TRUNC_FRAC"]    # Only render the bounded model footprint
     if config["MODEL"]["REFF_UNIT"].lower() == "arcsec":
         params["REFF"] /= config["MODEL"]["ARCCONV"]    # Update the effective radius to pixels
 
@@ -1,26 +1,92 @@
+import time
+
 import numpy as np
 from astropy.convolution import convolve
-from astropy.stats import sigma_clipped_stats
 from photutils import segmentation
+from scipy import ndimage
 
 import maskfill
 
+from .sigclip import sigclip_stats, sigclip_subsample
+
 
-def mask_image_fill(data, mask):
+def mask_image_fill(data, mask, regions=True):
     """ Use maskfill (van Dokkum & Pasha) to fill in the masked values.
     
 
     Args:
         data (Array-like): Input image data
         mask (Array-like): Mask array indicating which pixels to fill
+        regions (bool, optional): Fill each connected masked region within its own padded bounding 
+            box (see fill_regions) rather than the full frame. Defaults to True.
 
     Returns:
         _type_: Filled image data
     """
+    if regions:
+        return fill_regions(data, mask)
     return maskfill.maskfill(np.copy(data), mask=mask)[0]
 
 
-def gen_mask(data, config=None, omit=[], omit_central=True):
+def fill_regions(data, mask, size=3, smooth=True):
+    """ Fill the masked pixels of an image with maskfill, one connected region at a time.
+
+    Each 8-connected region of masked pixels is filled within its bounding box, padded by the 
+    maskfill window (so that every window of the fill sees the same pixels as in a full-frame 
+    fill), with any other masked pixels in the box also treated as masked. The cost therefore 
+    scales with the masked area rather than the image area, and regions further apart than the 
+    window are filled exactly as by a full-frame maskfill.
+
+    Args:
+        data (numpy.ndarray): The image.
+        mask (numpy.ndarray): Boolean mask of the pixels to fill.
+        size (int, optional): The maskfill window size. Defaults to 3.
+        smooth (bool, optional): Whether maskfill smooths the filled pixels. Defaults to True.
+
+    Returns:
+        numpy.ndarray: The filled image.
+    """
+    filled = np.array(data, dtype=float)
+    mask = np.asarray(mask, dtype=bool)
+    labels, _ = ndimage.label(mask, structure=np.ones((3, 3)))
+    pad = size // 2
+
+    for label, (ys, xs) in enumerate(ndimage.find_objects(labels), start=1):
+        box = (slice(max(ys.start - pad, 0), min(ys.stop + pad, mask.shape[0])),
+               slice(max(xs.start - pad, 0), min(xs.stop + pad, mask.shape[1])))
+        region = labels[box] == label
+        box_filled = maskfill.maskfill(np.array(data[box], dtype=float), mask=mask[box], size=size, 
+                                       smooth=smooth)[0]
+        filled[box][region] = box_filled[region]
+    return filled
+
+
+def mask_image_fill_derived(data, mask, reference_filled, reference_mask, offset):
+    """ Fill an image that differs from an already filled reference image by a smooth offset 
+    (data = reference - offset, such as the background-subtracted and background-added images).
+
+    Pixels masked in both images take the reference fill minus the offset, and only the pixels 
+    masked in this image alone are filled (see fill_regions).
+
+    Args:
+        data (numpy.ndarray): The image.
+        mask (numpy.ndarray): Boolean mask of the pixels to fill.
+        reference_filled (numpy.ndarray): The filled reference image.
+        reference_mask (numpy.ndarray): The mask the reference image was filled with.
+        offset (numpy.ndarray or float): The offset between the reference image and this one.
+
+    Returns:
+        numpy.ndarray: The filled image.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    shared = mask & np.asarray(reference_mask, dtype=bool)
+
+    filled = np.array(data, dtype=float)
+    filled[shared] = (reference_filled - offset)[shared]
+    return fill_regions(filled, mask & ~shared)
+
+
+def gen_mask(data, config=None, omit=[], omit_central=True, segmentation=None):
     """
     Generate a mask based on the input data.
 
@@ -31,6 +97,9 @@ def gen_mask(data, config=None, omit=[], omit_central=True):
         Configuration parameters for masking. If not provided, default values will be used.
     - omit: list, optional
        List of values to be omitted from the mask. Mainly to be used for manual masking.
+    - segmentation: SegmentationProduct, optional
+        The (possibly already computed) segmentation of the data, to reuse. If not provided, the 
+        data are segmented here.
 
     Returns:
     - mask: numpy.ndarray
@@ -38,44 +107,259 @@ def gen_mask(data, config=None, omit=[], omit_central=True):
 
     """
     metadata = {}
-    data_masked = np.copy(data)
-    if config is not None:
-        nsigma = float(config["MASKING"]["NSIGMA"])
-        gauss_width = float(config["MASKING"]["GAUSS_WIDTH"])
-        npix = int(config["MASKING"]["NPIX"])
-        contrast = float(config["MASKING"]["CONTRAST"])
-        n_levels = int(config["MASKING"]["NLEVELS"])
-    else:
-        nsigma, gauss_width, npix = 2., 5., 5
-        bg_boxsize = 50
-        contrast = 0.001
-        n_levels = 32
-    
-    bg_mean, bg_median, bg_std = sigma_clipped_stats(data)
-    threshold = bg_median + nsigma * bg_std 
+    if segmentation is None:
+        segmentation = SegmentationProduct(data, config)
+    return segmentation.contaminant_mask(omit=omit, omit_central=omit_central), metadata
 
-    kernel = segmentation.make_2dgaussian_kernel(gauss_width, size=5)  # FWHM = 3.0
-    convolved_data = convolve(data_masked, kernel)
 
-    segment_map = segmentation.detect_sources(convolved_data, threshold, n_pixels=10)
-    segm_deblend = segmentation.deblend_sources(convolved_data, segment_map,
-                                                n_pixels=npix, n_levels=n_levels, contrast=contrast,
-                                                progress_bar=False)
+def gen_mask_incremental(data, reference, config=None, omit_central=True, tolerance=None, segmentation=None):
+    """
+    Generate the mask of an image from the segmentation of a reference image that differs from it 
+    by a smooth background (such as the background-added and background-subtracted images), 
+    instead of segmenting and deblending it again.
 
-    central_pix = (data.shape[0] // 2, data.shape[1] // 2)
-    central_value = segm_deblend.data[central_pix]
-    
-    mask = np.zeros_like(data, dtype=bool)
-    if omit_central:
-        mask[np.logical_and(segm_deblend.data != central_value, segm_deblend.data != 0)] = True
-    else:
-        mask[segm_deblend.data != 0] = True
-    for n in omit:
-        mask[segm_deblend.data == n] = False
+    The image is only re-thresholded (in its Gaussian-convolved copy, at its own threshold, as in 
+    gen_mask). Pixels detected in both images keep the contaminant mask of the reference, pixels 
+    no longer detected are unmasked, and newly detected pixels are masked unless they are connected 
+    to the central segment. If the detected pixels differ by more than a fraction tolerance of the 
+    pixels detected in the reference, the image is segmented in full instead (as gen_mask).
+
+    Parameters:
+    - data: numpy.ndarray
+        The input data array.
+    - reference: SegmentationProduct
+        The segmentation of the reference image.
+    - config: dict, optional
+        Configuration parameters for masking. If not provided, default values will be used.
+    - tolerance: float, optional
+        The fallback tolerance. Defaults to MASKING.INCREMENTAL_TOL (or 0.02).
+    - segmentation: SegmentationProduct, optional
+        The (lazily computed) segmentation of the data, to reuse for the thresholds and the fallback.
 
+    Returns:
+    - mask: numpy.ndarray
+        The generated mask array.
+    - metadata: dict
+        The fraction of changed detections (INCREMENTAL_DIFF) and whether the full segmentation 
+        was used (INCREMENTAL_FALLBACK).
+    """
+    if tolerance is None:
+        tolerance = float((config or {}).get("MASKING", {}).get("INCREMENTAL_TOL", 0.02))
+    if segmentation is None:
+        segmentation = SegmentationProduct(data, config)
+
+    ref_detected = reference.convolved > reference.mask_threshold
+    detected = segmentation.convolved > segmentation.mask_threshold
+    diff = np.count_nonzero(detected ^ ref_detected) / max(np.count_nonzero(ref_detected), 1)
+    metadata = {"INCREMENTAL_DIFF": float(diff), "INCREMENTAL_FALLBACK": bool(diff > tolerance)}
+    if metadata["INCREMENTAL_FALLBACK"]:
+        return segmentation.contaminant_mask(omit_central=omit_central), metadata
+
+    mask = reference.contaminant_mask(omit_central=omit_central) & detected
+    new = detected & ~ref_detected
+    if new.any():
+        central_pix = (data.shape[0] // 2, data.shape[1] // 2)
+        central = np.zeros(data.shape, dtype=bool)
+        if omit_central:
+            if reference.deblended is not None and reference.deblended.data[central_pix] != 0:
+                central = reference.deblended.data == reference.deblended.data[central_pix]
+            central[central_pix] |= detected[central_pix]
+            central = ndimage.binary_propagation(central, structure=np.ones((3, 3)), mask=central | new)
+        mask |= new & ~central
     return mask, metadata
 
 
+class SegmentationProduct:
+    """
+    The segmentation of one image, shared by the background source mask (see bgsub_source_mask) 
+    and the contaminant mask (see gen_mask), so that an image used for both is only segmented once.
+
+    Every product is computed on first use and kept: the sigma-clipped statistics of the image, 
+    the detection thresholds, the segmentation of the raw image (thresholded at BGSUB.NSIGMA 
+    standard deviations, for the source mask) and of its Gaussian-convolved copy (thresholded at 
+    MASKING.NSIGMA standard deviations above the median), and the deblended segmentation.
+
+    Attributes:
+        data (numpy.ndarray): The image.
+        config (dict): The GalPRIME config, or None for the default parameters.
+        params (dict): The [MASKING] parameters (see masking_params).
+        deblend (str): "full" to deblend every segment, or "central" (MASKING.DEBLEND) to only 
+            deblend the segment containing the central pixel and the segments whose bounding boxes 
+            touch its own. The contaminant mask is the same either way, since every segment other 
+            than the central one is masked whether or not it is deblended, but segment labels 
+            (as used by the omit argument of gen_mask) differ.
+    """
+
+    def __init__(self, data, config=None, bg_stats=None, sigclip_sigma=3., sigclip_iters=5, deblend=None):
+        self.data = data
+        self.config = config
+        self.params = masking_params(config)
+        if deblend is None:
+            deblend = (config or {}).get("MASKING", {}).get("DEBLEND", "central")
+        self.deblend = deblend
+        self.sigclip_sigma = sigclip_sigma
+        self.sigclip_iters = sigclip_iters
+
+        self._bg_stats = bg_stats
+        self._convolved = None
+        self._segm = None
+        self._segm_convolved = None
+        self._deblended = None
+        self._source_masks = {}
+
+    @property
+    def bg_stats(self):
+        """ The sigma-clipped (mean, median, std) of the image. """
+        if self._bg_stats is None:
+            self._bg_stats = sigclip_stats(self.data, sigma=self.sigclip_sigma, maxiters=self.sigclip_iters,
+                                           subsample=sigclip_subsample(self.config))
+        return self._bg_stats
+
+    @property
+    def source_threshold(self):
+        """ The detection threshold of the source mask. """
+        return (self.config or {}).get("BGSUB", {}).get("NSIGMA", 1) * self.bg_stats[2]
+
+    @property
+    def mask_threshold(self):
+        """ The detection threshold of the contaminant mask, in the convolved image. """
+        return self.bg_stats[1] + self.params["NSIGMA"] * self.bg_stats[2]
+
+    @property
+    def convolved(self):
+        """ The image convolved with the Gaussian detection kernel. """
+        if self._convolved is None:
+            kernel = segmentation.make_2dgaussian_kernel(self.params["GAUSS_WIDTH"], size=5)  # FWHM = 3.0
+            self._convolved = convolve(np.copy(self.data), kernel)
+        return self._convolved
+
+    @property
+    def segm(self):
+        """ The segmentation of the raw image (or None if nothing was detected). """
+        if self._segm is None:
+            npixels = (self.config or {}).get("BGSUB", {}).get("NPIXELS", 10)
+            self._segm = segmentation.detect_sources(self.data, self.source_threshold, npixels)
+        return self._segm
+
+    @property
+    def segm_convolved(self):
+        """ The segmentation of the convolved image (or None if nothing was detected). """
+        if self._segm_convolved is None:
+            self._segm_convolved = segmentation.detect_sources(self.convolved, self.mask_threshold, n_pixels=10)
+        return self._segm_convolved
+
+    def central_labels(self):
+        """ The label of the segment of the convolved image containing the central pixel, and of the 
+        segments whose bounding boxes touch its bounding box (empty if the central pixel is not in 
+        any segment). """
+        segm = self.segm_convolved
+        central_value = 0 if segm is None else segm.data[self.data.shape[0] // 2, self.data.shape[1] // 2]
+        if central_value == 0:
+            return np.array([], dtype=int)
+
+        bounds = np.array([[sl[0].start, sl[0].stop, sl[1].start, sl[1].stop] for sl in segm.slices])
+        y0, y1, x0, x1 = bounds[segm.get_index(central_value)]
+        touching = ((bounds[:, 0] <= y1) & (bounds[:, 1] >= y0) & (bounds[:, 2] <= x1) & (bounds[:, 3] >= x0))
+        return segm.labels[touching]
+
+    @property
+    def deblended(self):
+        """ The deblended segmentation of the convolved image (or None if nothing was detected). """
+        if self._deblended is None and self.segm_convolved is not None:
+            labels = None
+            if self.deblend == "central":
+                labels = self.central_labels()
+                if len(labels) == 0:
+                    self._deblended = self.segm_convolved
+                    return self._deblended
+            self._deblended = segmentation.deblend_sources(self.convolved, self.segm_convolved, labels=labels,
+                                                           n_pixels=self.params["NPIX"], 
+                                                           n_levels=self.params["NLEVELS"], 
+                                                           contrast=self.params["CONTRAST"], 
+                                                           progress_bar=False)
+        return self._deblended
+
+    def source_mask(self, dilate_size=11, timings=None):
+        """ The segmentation of the raw image, dilated by a dilate_size box (as bgsub_source_mask).
+
+        If a timings dictionary is given, the time in seconds spent on the detection threshold, 
+        the segmentation and the dilation is stored in it under "THRESHOLD", "SEGMENT" and "DILATE".
+        """
+        timings = {} if timings is None else timings
+        t0 = time.perf_counter()
+        self.bg_stats
+        t1 = time.perf_counter()
+        segm = self.segm
+        t2 = time.perf_counter()
+
+        if dilate_size not in self._source_masks:
+            if segm is None:
+                self._source_masks[dilate_size] = np.zeros(self.data.shape, dtype=bool)
+            else:
+                self._source_masks[dilate_size] = ndimage.binary_dilation(
+                    segm.data.astype(bool), np.ones((dilate_size, dilate_size)))
+        timings["THRESHOLD"], timings["SEGMENT"] = t1 - t0, t2 - t1
+        timings["DILATE"] = time.perf_counter() - t2
+        return self._source_masks[dilate_size]
+
+    def contaminant_mask(self, omit=[], omit_central=True):
+        """ The mask of the deblended segments (as gen_mask), except the central one if omit_central 
+        is set, and any segment label listed in omit. """
+        segm_deblend = self.deblended
+        if segm_deblend is None:
+            return np.zeros_like(self.data, dtype=bool)
+
+        central_pix = (self.data.shape[0] // 2, self.data.shape[1] // 2)
+        central_value = segm_deblend.data[central_pix]
+
+        mask = np.zeros_like(self.data, dtype=bool)
+        if omit_central:
+            mask[np.logical_and(segm_deblend.data != central_value, segm_deblend.data != 0)] = True
+        else:
+            mask[segm_deblend.data != 0] = True
+        for n in omit:
+            mask[segm_deblend.data == n] = False
+        return mask
+
+
+def masking_params(config=None):
+    """ The segmentation parameters of the [MASKING] section of a config (or the defaults).
+
+    Returns:
+        dict: NSIGMA, GAUSS_WIDTH, NPIX, CONTRAST and NLEVELS.
+    """
+    if config is None:
+        return {"NSIGMA": 2., "GAUSS_WIDTH": 5., "NPIX": 5, "CONTRAST": 0.001, "NLEVELS": 32}
+    return {"NSIGMA": float(config["MASKING"]["NSIGMA"]),
+            "GAUSS_WIDTH": float(config["MASKING"]["GAUSS_WIDTH"]),
+            "NPIX": int(config["MASKING"]["NPIX"]),
+            "CONTRAST": float(config["MASKING"]["CONTRAST"]),
+            "NLEVELS": int(config["MASKING"]["NLEVELS"])}
+
+
+def segment_image(data, config=None, bg_stats=None):
+    """
+    Detect and deblend the sources in an image, as used by gen_mask.
+
+    The image is smoothed with a Gaussian kernel, thresholded at NSIGMA standard deviations above 
+    the sigma-clipped median, and the detected segments are deblended.
+
+    Parameters:
+    - data: numpy.ndarray
+        The input data array.
+    - config: dict, optional
+        Configuration parameters for masking. If not provided, default values will be used.
+    - bg_stats: tuple, optional
+        Precomputed (mean, median, std) background statistics for the threshold. If not provided, 
+        they are the sigma-clipped statistics of the data.
+
+    Returns:
+    - segm_deblend: photutils.segmentation.SegmentationImage
+        The deblended segmentation image, or None if no sources were detected.
+    """
+    return SegmentationProduct(data, config, bg_stats=bg_stats).deblended
+
+
 def mask_image(data, config):
     """
     Masks the input data array based on the provided parameters.
@@ -0,0 +1,116 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+
+_memo = threading.local()
+
+
+def _partition_median(values):
+    """ The median of a 1D array, partitioning it in place. """
+    n = len(values)
+    k = n // 2
+    if n % 2 == 1:
+        values.partition(k)
+        return float(values[k])
+    values.partition((k - 1, k))
+    return 0.5 * (float(values[k - 1]) + float(values[k]))
+
+
+def _clip(values, sigma=3., maxiters=5):
+    """ Iteratively sigma-clip a 1D float64 array about its median, compacting the kept values into
+    the front of the array (in place).
+
+    Returns:
+        tuple: The (mean, median, std) of the kept values.
+    """
+    n_iter = 0
+    while True:
+        median = _partition_median(values)
+        std = values.std()
+        if maxiters is not None and n_iter >= maxiters:
+            break
+
+        keep = np.abs(values - median) <= sigma * std
+        n_keep = np.count_nonzero(keep)
+        if n_keep == len(values) or n_keep == 0:
+            break
+        values[:n_keep] = values[keep]
+        values = values[:n_keep]
+        n_iter += 1
+
+    return float(values.mean()), median, float(std)
+
+
+def sigclip_stats(data, mask=None, sigma=3., maxiters=5, subsample=None, seed=0):
+    """
+    Sigma-clipped statistics of an array, as astropy.stats.sigma_clipped_stats with its default
+    median centre and standard deviation.
+
+    The finite, unmasked pixels are copied once into a float64 buffer which is clipped in place:
+    medians are found with np.partition rather than a full sort, and each iteration compacts the
+    kept pixels into the front of the buffer. If a subsample size is given, the statistics are
+    estimated from that many randomly drawn pixels instead (without replacement, from a generator
+    seeded with seed, so the estimate is reproducible).
+
+    Within a sigclip_memo context (as during GPrimeSingle.process), results are memoised per array
+    identity, so repeated calls on the same array (and mask) are only computed once. Arrays must
+    therefore not be modified in place within the context.
+
+    Args:
+        data (numpy.ndarray): The data. Masked arrays have their mask applied.
+        mask (numpy.ndarray, optional): Boolean mask of the pixels to ignore. Defaults to None.
+        sigma (float, optional): The clipping threshold, in standard deviations. Defaults to 3.
+        maxiters (int, optional): The maximum number of clipping iterations (None to iterate until
+            convergence). Defaults to 5.
+        subsample (int, optional): The number of pixels to estimate the statistics from. Defaults
+            to None (all pixels).
+        seed (int, optional): Seed of the pixel subsample. Defaults to 0.
+
+    Returns:
+        tuple: The sigma-clipped (mean, median, std).
+    """
+    memo = getattr(_memo, "results", None)
+    if memo is not None:
+        key = (id(data), id(mask), sigma, maxiters, subsample, seed)
+        entry = memo.get(key)
+        if entry is not None and entry[0] is data and entry[1] is mask:
+            return entry[2]
+
+    values = np.ma.getdata(data)
+    invalid = ~np.isfinite(values) | np.ma.getmaskarray(data)
+    if mask is not None:
+        invalid |= np.asarray(mask, dtype=bool)
+    values = values[~invalid] if invalid.any() else values.ravel()
+
+    if subsample is not None and 0 < subsample < values.size:
+        rng = np.random.default_rng(seed)
+        values = values[rng.choice(values.size, size=int(subsample), replace=False)]
+    values = values.astype(np.float64)
+
+    stats = (np.nan, np.nan, np.nan) if values.size == 0 else _clip(values, sigma=sigma, maxiters=maxiters)
+
+    if memo is not None:
+        # The arrays are kept alive with the result so their ids cannot be reused within the context
+        memo[key] = (data, mask, stats)
+    return stats
+
+
+def sigclip_subsample(config=None):
+    """ The pixel subsample size of the sigma-clipped statistics (BGSUB.SIGCLIP_SUBSAMPLE), or None
+    to use all pixels. """
+    subsample = (config or {}).get("BGSUB", {}).get("SIGCLIP_SUBSAMPLE", 0)
+    return int(subsample) if subsample else None
+
+
+@contextmanager
+def sigclip_memo():
+    """ Memoise sigclip_stats per array identity within the context (or function, when used as a
+    decorator). Nested contexts share the outermost memo. """
+    outer = getattr(_memo, "results", None)
+    _memo.results = {} if outer is None else outer
+    try:
+        yield _memo.results
+    finally:
+        _memo.results = outer
@@ -7,6 +7,8 @@ import matplotlib.pyplot as plt
 
 import warnings
 
+from .sigclip import sigclip_memo
+
 
 def load_mag_kde(config):
     """Load the magnitude KDE if specified in the config."""
@@ -31,11 +33,16 @@ class GPrimeSingle:
     """ A single instance of a GalPRIME iteration. """
     
     def __init__(self, config, model, params, bg=None, psf=None, 
-                 logger=None, id=None, save_output=False, metadata={}):
+                 logger=None, id=None, save_output=False, metadata={},
+                 model_image=None, model_params=None):
         self.config = config
         self.model = model
         self.params = params
 
+        # Models can be pre-rendered in a batch (see GalaxyModel.generate_batch)
+        self.model_image = model_image
+        self.model_params = model_params
+
         self.save_output = save_output
 
         self.id = id if id is not None else np.random.randint(1e9, 1e10)
@@ -47,24 +54,59 @@ class GPrimeSingle:
 
         self.stop_code = 0
         self.isophote_lists = []
+        self.segmentations = []
+        self.filled_bgadded = self.filled_bgsub = None
 
         self.metadata = metadata
         self.metadata["ID"] = self.id
 
 
+    @sigclip_memo()
     def process(self):
         """
         Executes the full simulation processing pipeline for a single object.
         The processing steps include:
-            1. Model generation and PSF convolution.
-            2. Addition of model to background, background estimation, and subtraction.
-            3. Mask generation for both background-added and background-subtracted images.
+            1. Model generation (skipped if a pre-rendered model_image was given) and PSF convolution.
+                If the [CACHE] section of the config is enabled, both go through the stamp cache. 
+                With CONV_METHOD = "mixture", the convolved model is instead evaluated analytically 
+                from Gaussian-mixture fits of the model and the PSF (see gen_mixture_model).
+            2. Addition of model to background, background estimation (sigma-clipped statistics and 
+                the 2D background, from a single source mask), and subtraction. The time spent in each 
+                background step is stored in the metadata as BG_T_<STEP>. If BGSUB.PRECOMPUTE is 
+                set, the cached segmentation of the background (see BackgroundSidecar) is reused 
+                here and for the masks, and only the model footprint is segmented.
+                Sigma-clipped statistics are memoised per array for the duration of the call (see 
+                sigclip_stats), so the image statistics are shared by the source mask and gen_mask.
+            3. Mask generation for both background-added and background-subtracted images. Each image 
+                is segmented once (see segmentation), so the background-added image shares its 
+                segmentation between the source mask of step 2 and its contaminant mask.
+                With MASKING.INCREMENTAL, the background-subtracted mask is derived from the 
+                background-added segmentation (see gen_mask_incremental), falling back to a full 
+                segmentation beyond MASKING.INCREMENTAL_TOL. The fraction of changed detections and 
+                whether the fallback was used are stored in the metadata as MASK_INCREMENTAL_DIFF and 
+                MASK_FALLBACK.
             4. Extraction of isophotal profiles from the convolved model, background-added, and 
                 background-subtracted images.
+                With EXTRACTION.WARM_START (the default), the model fit starts from the injected 
+                geometry (X0, Y0, ELLIP, PA, REFF) and the other two from the converged model 
+                geometry. The number of fit attempts and the time spent on each extraction are 
+                stored in the metadata as EXTRACT_ATTEMPTS_<IMAGE> and EXTRACT_T_<IMAGE>.
+                With EXTRACTION.METHOD = "annulus", profiles are instead measured in elliptical 
+                annuli of that fixed geometry (see annulus_extraction).
+                With EXTRACTION.SHARED_GEOMETRY, only the model is fitted, and the other two profiles 
+                are measured along its converged isophotes, from a sampling plan computed once (see 
+                SamplingPlan and sampled_extraction).
+                With EXTRACTION.ADAPTIVE_MAXSMA, the background-added and background-subtracted 
+                profiles stop growing before MAXSMA once they stay below the noise floor of the 
+                background (BG_STD, about BG_MED for the background-added image), for 
+                EXTRACTION.CUT_STEPS consecutive isophotes (see noise_floor_cut). The noiseless model 
+                profile is never cut. Whether each profile was cut, and its outermost semi-major axis 
+                (NaN if it has no isophotes), are stored in the metadata as EXTRACT_CUT_<IMAGE> and 
+                EXTRACT_MAXSMA_<IMAGE>.
         At each stage, updates internal state and handles errors by raising RuntimeError with 
                 informative messages.
         The following attributes are updated during processing:
-            - self.model_image: Generated model image.
+            - self.model_image: Generated model image (None with CONV_METHOD = "mixture", see render_model).
             - self.model_params: Parameters used for model generation.
             - self.convolved_model: Model image after PSF convolution.
             - self.bg_added_model: Model image with background added.
@@ -76,6 +118,9 @@ class GPrimeSingle:
             - self.bgsub: Background-subtracted image.
             - self.mask_bgadded, self.mask_data_bgadded: Masks for background-added image.
             - self.mask_bgsub, self.mask_data_bgsub: Masks for background-subtracted image.
+            - self.segmentations: The segmentation products of the segmented images.
+            - self.filled_bgadded, self.filled_bgsub: The filled images, if MASKING.METHOD is "fill" 
+                (profiles are then extracted from them, unmasked).
             - self.isophote_lists: List of isophotal profile results for each processed image.
             - self.stop_code: Integer code indicating the current processing stage or completion.
         Raises:
@@ -85,8 +130,44 @@ class GPrimeSingle:
         # Generate model and convolve with PSF
         try:
             self.stop_code = 1
-            self.model_image, self.model_params = self.model.generate(self.params)
-            self.convolved_model = gp.convolve_model(self.model_image, self.psf)
+            cache = gp.get_stamp_cache(self.config)
+            conv_method = self.config.get("PSFS", {}).get("CONV_METHOD", "auto")
+
+            # With a PSF registry, convolve by looking up the prepared PSF and its cached transform
+            registry = gp.get_psf_registry(self.config)
+            psf_index = self.metadata.get("PSF_INDEX", None)
+            if registry is not None and psf_index is not None:
+                self.psf = registry.kernel(psf_index)
+                convolve = lambda model_image: registry.convolve(model_image, psf_index, method=conv_method)
+            else:
+                convolve = lambda model_image: gp.convolve_model(model_image, self.psf, method=conv_method)
+
+            if conv_method == "mixture":
+                # Only the convolved model is evaluated. The pixel model is not needed, and is only 
+                # rendered on request (see render_model)
+                if registry is not None and psf_index is not None:
+                    psf_mixture = registry.mixture(psf_index)
+                else:
+                    psf_mixture = gp.fit_psf_mixture(gp.prepare_psf(self.psf))
+                self.metadata["PSF_MIX_RESIDUAL"] = psf_mixture[2]
+
+                params = dict(self.params)
+                if self.model_params is not None and "PA" in self.model_params:
+                    params["PA"] = self.model_params["PA"]
+                self.convolved_model, mixture_params = self.model.generate_mixture(
+                    psf_mixture, params, tolerance=self.config.get("PSFS", {}).get("MIXTURE_TOL", 1e-3))
+                self.model_params = {**mixture_params, **(self.model_params or {})}
+            elif self.model_image is None and cache is not None:
+                hits = cache.hits
+                self.model_image, self.convolved_model, self.model_params = cache.generate(
+                    self.model, self.params, psf=self.psf, psf_index=psf_index, 
+                    convolve=convolve)
+                self.model.params.update(self.model_params)
+                self.metadata["CACHE_HIT"] = cache.hits > hits
+            else:
+                if self.model_image is None:
+                    self.model_image, self.model_params = self.model.generate(self.params)
+                self.convolved_model = convolve(self.model_image)
         except Exception as e:
             raise RuntimeError(f'{self.id} failed convolution: {e}')
 
@@ -95,10 +176,20 @@ class GPrimeSingle:
             self.stop_code = 2
             self.bg_added_model = self.convolved_model + self.bg
 
-            self.bg_params = gp.estimate_background_sigclip(self.bg_added_model, self.config)
+            # One source mask is shared by the sigma-clipped statistics and the 2D background. With a
+            # background sidecar, only the model footprint is segmented and merged with the cached mask
+            sidecar = gp.get_background_sidecar(self.config)
+            bg_index = self.metadata.get("BG_INDEX", None)
+            use_sidecar = sidecar is not None and bg_index is not None
+            self.metadata["BG_SIDECAR"] = use_sidecar
+            if use_sidecar:
+                self.bg_params, self.source_mask, self.background, bg_timings = sidecar.estimate_background(
+                    self.bg_added_model, bg_index, self.convolved_model, self.config)
+            else:
+                self.bg_params, self.source_mask, self.background, bg_timings = gp.estimate_background(
+                    self.bg_added_model, self.config, segmentation=self.segmentation(self.bg_added_model))
             self.params["BG_MEAN"], self.params["BG_MED"], self.params["BG_STD"] =  self.bg_params
-
-            self.source_mask, self.background = gp.estimate_background_2D(self.bg_added_model, self.config)
+            self.metadata.update({f"BG_T_{step}": t for step, t in bg_timings.items()})
             
             self.bg_model = self.background.background
             self.bgsub = self.bg_added_model - self.bg_model
@@ -108,16 +199,34 @@ class GPrimeSingle:
         # Mask image(s)
         try:    
             self.stop_code = 3
-            self.mask_bgadded, self.mask_data_bgadded = gp.gen_mask(self.bg_added_model, config=self.config)
-            self.mask_bgsub, self.mask_data_bgsub = gp.gen_mask(self.bgsub, config=self.config)
-
-            # If we want to fill in images with MaskFill, we fill in the values then set the masks to zeros
+            if use_sidecar:
+                self.mask_bgadded, self.mask_data_bgadded = sidecar.gen_mask(
+                    self.bg_added_model, bg_index, self.convolved_model, config=self.config)
+                self.mask_bgsub, self.mask_data_bgsub = sidecar.gen_mask(
+                    self.bgsub, bg_index, self.convolved_model, config=self.config)
+            else:
+                self.mask_bgadded, self.mask_data_bgadded = gp.gen_mask(
+                    self.bg_added_model, config=self.config, segmentation=self.segmentation(self.bg_added_model))
+                if self.config["MASKING"].get("INCREMENTAL", False):
+                    # Re-threshold the bgsub image against the bg-added segmentation (see gen_mask_incremental)
+                    self.mask_bgsub, self.mask_data_bgsub = gp.gen_mask_incremental(
+                        self.bgsub, self.segmentation(self.bg_added_model), config=self.config, 
+                        segmentation=self.segmentation(self.bgsub))
+                    self.metadata["MASK_INCREMENTAL_DIFF"] = self.mask_data_bgsub["INCREMENTAL_DIFF"]
+                    self.metadata["MASK_FALLBACK"] = self.mask_data_bgsub["INCREMENTAL_FALLBACK"]
+                else:
+                    self.mask_bgsub, self.mask_data_bgsub = gp.gen_mask(
+                        self.bgsub, config=self.config, segmentation=self.segmentation(self.bgsub))
+
+            # If we want to fill in images with MaskFill, we fill in the values then set the masks to zeros.
+            # The bgsub fill reuses the bg-added fill wherever both are masked
             if self.config["MASKING"]["METHOD"] == "fill":
-                self.mask_bgadded = gp.mask_image_fill(self.bg_added_model, self.mask_bgadded)
-                self.mask_bgsub = gp.mask_image_fill(self.bgsub, self.mask_bgsub)
+                self.filled_bgadded = gp.mask_image_fill(self.bg_added_model, self.mask_bgadded)
+                self.filled_bgsub = gp.mask_image_fill_derived(self.bgsub, self.mask_bgsub, self.filled_bgadded, 
+                                                               self.mask_bgadded, self.bg_model)
 
                 self.mask_bgadded = self.mask_bgsub = np.zeros(self.bg_added_model.shape, dtype=bool)
-            
+
 
         except Exception as e:
             raise RuntimeError(f'{self.id} failed masking: {e}')
@@ -125,20 +234,74 @@ class GPrimeSingle:
         # Extract profiles
         try:
             self.stop_code = 4
-            # Extract profiles
-            for dataset in [self.convolved_model, 
-                            np.ma.array(self.bg_added_model, mask=self.mask_bgadded), 
-                            np.ma.array(self.bgsub, mask=self.mask_bgsub)]:
+            # Extract profiles. The model fit starts from the injected geometry, and the coadd and bgsub 
+            # fits from the converged model geometry at the same semi-major axis
+            bg_added_model = self.bg_added_model if self.filled_bgadded is None else self.filled_bgadded
+            bgsub = self.bgsub if self.filled_bgsub is None else self.filled_bgsub
+            warm_start = self.config.get("EXTRACTION", {}).get("WARM_START", True)
+            geo_init = gp.geometry_from_params(self.model_params, shape=np.shape(self.convolved_model)) \
+                if warm_start else None
+            shared_geometry = self.config.get("EXTRACTION", {}).get("SHARED_GEOMETRY", False)
+            if self.config.get("EXTRACTION", {}).get("METHOD", "isophote") == "annulus":
+                extract = gp.annulus_extraction
+                shared_geometry = False
+            else:
+                extract = gp.isophote_fitting
+            plan = None
+            bg_std = self.params["BG_STD"]
+            # The noise-floor cut only applies to the noisy profiles, the noiseless model profile is 
+            # the reference they are judged against out to its full extent
+            for name, dataset, background in [("MODEL", self.convolved_model, None), 
+                                              ("BGADDED", np.ma.array(bg_added_model, mask=self.mask_bgadded), 
+                                               (self.params["BG_MED"], bg_std)), 
+                                              ("BGSUB", np.ma.array(bgsub, mask=self.mask_bgsub), (0., bg_std))]:
                 with warnings.catch_warnings():     # Suppress warnings from astropy fitting
                     warnings.simplefilter("ignore")
-                    isolist = gp.isophote_fitting(dataset, self.config)
+                    if plan is not None:
+                        isolist = gp.sampled_extraction(dataset, plan)
+                    else:
+                        isolist = extract(dataset, self.config, geo_init=geo_init, background=background)
                     self.isophote_lists.append(isolist)
 
+                if name == "MODEL":
+                    # The other profiles are only sampled along the model isophotes if the model fit succeeded
+                    if shared_geometry and isolist is not None and len(isolist["ISOLIST"]) > 0:
+                        plan = gp.SamplingPlan.from_isolist(isolist["ISOLIST"], np.shape(dataset))
+
+                # Written for every object (NaN without isophotes), so that all rows share the same columns
+                has_isophotes = isolist is not None and len(isolist["ISOLIST"]) > 0
+                self.metadata[f"EXTRACT_MAXSMA_{name}"] = float(np.max(isolist["ISOLIST"].sma)) if has_isophotes else np.nan
+                if isolist is not None:
+                    self.metadata[f"EXTRACT_ATTEMPTS_{name}"] = isolist["ATTEMPTS"]
+                    self.metadata[f"EXTRACT_T_{name}"] = isolist["TIME"]
+                    self.metadata[f"EXTRACT_CUT_{name}"] = isolist["CUT_SMA"] is not None
+                    if warm_start and name == "MODEL" and has_isophotes:
+                        # Seeded at the injected semi-major axis, or the median model isophote
+                        sma = geo_init.sma if geo_init is not None else float(np.median(isolist["ISOLIST"].sma))
+                        geo_init = gp.geometry_from_isolist(isolist["ISOLIST"], sma)
+
         except Exception as e:
             raise RuntimeError(f'{self.id} failed extraction: {e}')
         
         self.stop_code = 10
 
+    def render_model(self):
+        """ The (unconvolved) model image, rendered from the model parameters on first use if 
+        process() did not need it (as with CONV_METHOD = "mixture"). """
+        if self.model_image is None:
+            self.model_image, _ = self.model.generate({**self.params, **(self.model_params or {})})
+        return self.model_image
+
+    def segmentation(self, data):
+        """ The segmentation product of one of the images of this instance, computed on first use 
+        and cached (see SegmentationProduct). """
+        for product in self.segmentations:
+            if product.data is data:
+                return product
+        product = gp.SegmentationProduct(data, self.config)
+        self.segmentations.append(product)
+        return product
+
     def condensed_output(self):
         """
         Generate a condensed dictionary output containing key simulation results and metadata.
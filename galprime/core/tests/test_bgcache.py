@@ -0,0 +1,56 @@
+import warnings
+
+import numpy as np
+
+from .. import bgcache, bgsub, config, cutouts, masking
+from ...models import backgrounds, galaxies
+
+
+def test_sidecar_matches_full_pipeline(tmp_path):
+    np.random.seed(1)
+    c = config.default_config()
+    field = backgrounds.GaussianField()
+    field.populate(2, size=151, n_objects=15)
+    bgs = [bg + np.random.normal(0, 0.2, bg.shape) for bg in field.cutouts]
+    model, _ = galaxies.gen_single_sersic(MAG=18, REFF=5, N=1, ELLIP=0.3, PA=0.5, SHAPE=151)
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore')
+        sidecar = bgcache.BackgroundSidecar.compute(bgs, c)
+        sidecar.save(tmp_path / "bgs_sidecar.npz")
+        sidecar = bgcache.BackgroundSidecar.load(tmp_path / "bgs_sidecar.npz")
+        assert len(sidecar) == 2 and sidecar.matches(bgcache.sidecar_settings(c), bgs)
+        assert sidecar.settings["LIBRARY_N"] == 2 and sidecar.settings["LIBRARY_SHAPE"] == [151, 151]
+
+        for i, bg in enumerate(bgs):
+            data = bg + model
+            bg_stats, source_mask, _, _ = bgsub.estimate_background(data, c)
+            cached_stats, cached_source_mask, _, _ = sidecar.estimate_background(data, i, model, c)
+            mask, _ = masking.gen_mask(data, c)
+            cached_mask, _ = sidecar.gen_mask(data, i, model, c)
+
+            assert np.mean(source_mask == cached_source_mask) > 0.99
+            assert np.mean(mask == cached_mask) > 0.99
+            assert not cached_mask[75, 75]
+            assert np.allclose(bg_stats, cached_stats, atol=0.01)
+
+
+def test_sidecar_tracks_library(tmp_path):
+    np.random.seed(2)
+    c = config.default_config()
+    c["FILE_DIR"] = f"{tmp_path}/"
+    c["BGSUB"]["PRECOMPUTE"] = True
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore')
+        cutouts.Cutouts(cutouts=[np.random.normal(0, 1, (51, 51)) for _ in range(2)], 
+                        cutout_data=[{}] * 2).save(str(tmp_path / "backgrounds.fits"))
+        sidecar = bgcache.get_background_sidecar(c)
+        assert len(sidecar) == 2 and sidecar.filename == bgcache.sidecar_filename(c)
+        assert bgcache.get_background_sidecar(c) is sidecar
+
+        # A regenerated library under the same name is not served the old sidecar
+        bgs = cutouts.Cutouts(cutouts=[np.random.normal(0, 1, (51, 51)) for _ in range(3)], cutout_data=[{}] * 3)
+        bgs.save(str(tmp_path / "backgrounds.fits"), overwrite=True)
+        assert len(bgcache.get_background_sidecar(c)) == 3
+        assert not sidecar.matches(bgcache.sidecar_settings(c), bgs.cutouts)
@@ -43,3 +43,45 @@ def test_bg_sigclip_std():
 
             assert isclose(bg_stats[2], std, atol=1e-1, rtol=1e-1)
 
+
+
+def test_estimate_background_combined():
+    test_background = normal(loc=1, size=(100, 100))
+    test_background[40:50, 40:50] += 20
+    c = config.default_config()
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore')
+        bg_stats, source_mask, bkg, timings = bgsub.estimate_background(test_background, c)
+        separate_mask, separate_bkg = bgsub.estimate_background_2D(test_background, c)
+
+        assert isclose(bg_stats, bgsub.estimate_background_sigclip(test_background, c)).all()
+        assert (source_mask == separate_mask).all()
+        assert source_mask[45, 45] and not source_mask[5, 5]
+        assert isclose(bkg.background, separate_bkg.background).all()
+        assert set(timings) == {"THRESHOLD", "SEGMENT", "DILATE", "SIGCLIP", "BKG2D"}
+
+
+def test_block_background_matches_photutils():
+    from numpy import allclose, linspace, random
+    from ...models.backgrounds import GaussianField
+
+    random.seed(3)
+    field = GaussianField()
+    field.populate(3, size=301, n_objects=30)
+    c = config.default_config()
+    c_photutils = {**c, "BGSUB": {**c["BGSUB"], "ESTIMATOR": "photutils"}}
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore')
+        for bg in field.cutouts:
+            data = bg + normal(scale=0.3, size=bg.shape) + linspace(0, 1, bg.shape[1])[None, :]
+            source_mask = bgsub.bgsub_source_mask(data, c)
+            _, block = bgsub.estimate_background_2D(data, c, source_mask=source_mask)
+            _, reference = bgsub.estimate_background_2D(data, c_photutils, source_mask=source_mask)
+
+            assert isinstance(block, bgsub.BlockBackground)
+            assert allclose(block.background_mesh, reference.background_mesh, rtol=1e-10, atol=1e-12)
+            assert allclose(block.background_rms_mesh, reference.background_rms_mesh, rtol=1e-10, atol=1e-12)
+            assert allclose(block.background, reference.background, rtol=1e-8, atol=1e-10)
+
@@ -1,6 +1,7 @@
 from .. import config
 
 from configobj import ConfigObj
+import validate
 
 
 def test_default_config():
@@ -13,4 +14,17 @@ def test_dump_default_config_file(tmpdir):
     config.dump_default_config_file(outname=filename)
 
     test_read_config = config.read_config_file(filename)
-    assert isinstance(test_read_config, ConfigObj)
\ No newline at end of file
+    assert isinstance(test_read_config, ConfigObj)
+
+
+def test_conv_methods_validate():
+    for method in ("direct", "fft", "oa", "separable", "mixture", "auto"):
+        test_config = ConfigObj({"PSFS": {"CONV_METHOD": method}}, configspec=config.galprime_configspec())
+        results = test_config.validate(validate.Validator(), preserve_errors=True)
+        # A section whose values all pass is collapsed to True in the results
+        assert results["PSFS"] is True
+
+    test_config = ConfigObj({"PSFS": {"CONV_METHOD": "bogus"}}, configspec=config.galprime_configspec())
+    results = test_config.validate(validate.Validator(), preserve_errors=True)
+    assert isinstance(results["PSFS"]["CONV_METHOD"], validate.VdtValueError)
+    assert results["PSFS"]["MIXTURE_TOL"] is True
@@ -0,0 +1,162 @@
+from .. import config, extraction
+from ...models import galaxies
+
+import numpy as np
+import threading
+import warnings
+
+
+def elliptical_exponential(shape=(61, 61), x0=30, y0=30, reff=4, ellip=0.4, pa=0.5):
+    yy, xx = np.mgrid[:shape[0], :shape[1]]
+    dx, dy = xx - x0, yy - y0
+    u = dx * np.cos(pa) + dy * np.sin(pa)
+    v = -dx * np.sin(pa) + dy * np.cos(pa)
+    return 100 * np.exp(-np.hypot(u, v / (1 - ellip)) / reff)
+
+
+def test_warm_started_fitting():
+    params = {"X0": 30, "Y0": 30, "REFF": 4, "ELLIP": 0.4, "PA": 0.5}
+    image = elliptical_exponential(**{key.lower(): val for key, val in params.items()})
+    test_config = config.default_config()
+    test_config["EXTRACTION"]["MAXSMA"] = 20
+
+    geo = extraction.geometry_from_params(params)
+    assert geo.sma == 4 and np.isclose(geo.eps, 0.4)
+    assert extraction.geometry_from_params({"REFF": 4}) is None
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        result = extraction.isophote_fitting(image, test_config, geo_init=geo)
+    assert result["ATTEMPTS"] == 1 and result["TIME"] > 0
+
+    seeded = extraction.geometry_from_isolist(result["ISOLIST"], geo.sma)
+    assert np.isclose(seeded.sma, geo.sma, rtol=0.1)
+    assert np.isclose(seeded.eps, 0.4, atol=0.05) and np.isclose(seeded.x0, 30, atol=0.5)
+
+
+def test_multi_component_geometry():
+    _, params = galaxies.BulgeDiskSersicModel().generate({"REFF_BULGE": 2, "REFF_DISK": 6, "ELLIP_BULGE": 0.1, 
+                                                          "ELLIP_DISK": 0.4, "PA": 0.5})
+    geo = extraction.geometry_from_params(params)
+    assert geo.sma == 6 and np.isclose(geo.eps, 0.4) and geo.pa == 0.5
+    assert geo.x0 == params["DISK_X0"] and geo.y0 == params["DISK_Y0"]
+
+    # Without the generated component centres, the model is centred in its image
+    configured = {key: val for key, val in params.items() if not key.startswith(("BULGE_", "DISK_"))}
+    geo = extraction.geometry_from_params(configured, shape=(81, 81))
+    assert geo.sma == 6 and np.isclose(geo.eps, 0.4) and geo.x0 == geo.y0 == 40.5
+
+
+def test_fallback_strategy():
+    strategy = extraction.FallbackStrategy(max_attempts=5)
+    image = np.zeros((101, 101))
+
+    # Without a morphology estimate, the grid starts at the smallest semi-major axis
+    candidates = strategy.candidates(image)
+    assert len(candidates) == 4 * 3 * 4 and candidates[0][0][1] == 10
+
+    # Only fits at sma = 30 succeed: the search is capped, and successes move to the front
+    fit = lambda geo: [geo] if np.isclose(geo.sma, 30) else None
+    assert strategy.search(fit, candidates)[0] is None
+    fitting_list, candidate, n_attempts = strategy.search(fit, candidates, max_attempts=100)
+    assert candidate[0][1] == 30 and n_attempts == 25
+    assert strategy.candidates(image)[0][0] == candidate[0]
+    assert strategy.search(fit, strategy.candidates(image))[2] == 1
+
+    # Concurrent search: at most n_threads fits run past the first success, none outlives the 
+    # search, and only the outcomes consumed before it returned are recorded
+    threaded = extraction.FallbackStrategy(max_attempts=48, n_threads=4)
+    n_threads = threading.active_count()
+    fitting_list, candidate, n_attempts = threaded.search(fit, threaded.candidates(image))
+    assert np.isclose(candidate[1].sma, 30) and 25 <= n_attempts <= 28
+    assert threading.active_count() == n_threads
+    assert sum(attempts for _, attempts in threaded.stats.values()) <= n_attempts
+
+    # Morphology candidates come first
+    morphology = extraction.EllipseGeometry(x0=50, y0=50, sma=8, eps=0.5, pa=np.deg2rad(45))
+    candidates = extraction.FallbackStrategy().candidates(image, morphology=morphology)
+    assert [c[0][0] for c in candidates[:3]] == ["MORPH", "MORPH", "GRID"]
+    assert candidates[2][0][1:] == (20, 0.5, 45)
+
+
+def test_annulus_profile():
+    geometry = extraction.EllipseGeometry(x0=30, y0=30, sma=4, eps=0.4, pa=0.5)
+    image = elliptical_exponential()
+    smas = extraction.annulus_smas(1, 25, step=0.1)
+    assert np.all(np.diff(smas) >= 1)
+
+    profile = extraction.annulus_profile(image, geometry, smas)
+    assert np.allclose(profile.intens[3:], 100 * np.exp(-profile.sma[3:] / 4), rtol=0.05)
+    assert np.all(np.diff(profile.intens) < 0)
+
+    # Masked pixels are left out and counted, and the median agrees for a smooth profile
+    mask = np.zeros(image.shape, dtype=bool)
+    mask[30:, :] = True
+    masked = extraction.annulus_profile(np.ma.array(image, mask=mask), geometry, smas)
+    kept = np.isin(profile.sma, masked.sma)
+    assert np.all(masked.ndata + masked.nflag == profile.ndata[kept]) and np.all(masked.nflag > 0)
+    median = extraction.annulus_profile(image, geometry, smas, statistic="median")
+    assert np.allclose(median.intens[3:], profile.intens[3:], rtol=0.05)
+
+    table = profile.to_table()
+    from ..postprocessing import good_colnames
+    assert table.colnames == good_colnames and len(table) == len(profile)
+
+    test_config = config.default_config()
+    test_config["EXTRACTION"]["MAXSMA"] = 25
+    result = extraction.annulus_extraction(image, test_config, geo_init=geometry)
+    assert result["FIT_METHOD"] == 2 and np.allclose(result["ISOLIST"].intens, profile.intens)
+
+
+def test_sampling_plan():
+    rng = np.random.default_rng(0)
+    image = elliptical_exponential() + rng.normal(0, 0.05, (61, 61))
+    test_config = config.default_config()
+    test_config["EXTRACTION"]["MAXSMA"] = 25
+    geometry = extraction.EllipseGeometry(x0=30, y0=30, sma=4, eps=0.4, pa=0.5)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        isolist = extraction.isophote_fitting(image, test_config, geo_init=geometry)["ISOLIST"]
+
+    # The plan reproduces photutils' bilinear sampling of the converged isophotes
+    plan = extraction.SamplingPlan.from_isolist(isolist, image.shape)
+    profile = plan.profile(image)
+    assert len(plan) == len(isolist) == len(profile)
+    assert np.allclose(profile.intens, isolist.intens) and np.allclose(profile.int_err, isolist.int_err)
+    assert np.all(profile.ndata == isolist.to_table()["n_data"])
+
+    # Masked samples are left out and flagged
+    mask = np.zeros(image.shape, dtype=bool)
+    mask[35:, :] = True
+    masked = plan.profile(np.ma.array(image + 1, mask=mask))
+    kept = np.isin(profile.sma, masked.sma)
+    assert np.all(masked.ndata + masked.nflag == profile.ndata[kept] + profile.nflag[kept])
+    assert np.all(masked.nflag[masked.sma > 6] > 0)
+    assert np.allclose(masked.intens[:3], profile.intens[:3] + 1)
+
+    result = extraction.sampled_extraction(image, plan)
+    assert result["FIT_METHOD"] == 3 and result["ATTEMPTS"] == 0
+
+
+def test_noise_floor_cut():
+    intens, ndata = np.array([10., 1., 0.1, 0.5, 0.1, 0.2, 0.1, 0.]), np.full(8, 100)
+    assert extraction.noise_floor_cut(intens, ndata, (0., 1.), nsigma=3, steps=3) == 6
+    assert extraction.noise_floor_cut(intens, ndata, (0., 1.), nsigma=3, steps=5) is None
+    assert extraction.noise_floor_cut(intens + 5, ndata, (5., 1.), nsigma=3, steps=1) == 2
+
+    rng = np.random.default_rng(0)
+    image = elliptical_exponential(shape=(101, 101), x0=50, y0=50, reff=3) + rng.normal(0, 0.05, (101, 101))
+    geometry = extraction.EllipseGeometry(x0=50, y0=50, sma=4, eps=0.4, pa=0.5)
+    test_config = config.default_config()
+    test_config["EXTRACTION"]["MAXSMA"] = 50
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        full = extraction.isophote_fitting(image, test_config, geo_init=geometry, background=(0., 0.05))
+        test_config["EXTRACTION"]["ADAPTIVE_MAXSMA"], test_config["EXTRACTION"]["CUT_STEPS"] = True, 2
+        cut = extraction.isophote_fitting(image, test_config, geo_init=geometry, background=(0., 0.05))
+    assert full["CUT_SMA"] is None and cut["CUT_SMA"] is not None
+    assert np.max(cut["ISOLIST"].sma) == cut["CUT_SMA"] < np.max(full["ISOLIST"].sma)
+    assert np.allclose(cut["ISOLIST"].intens[:10], full["ISOLIST"].intens[:10])
+
+    annulus = extraction.annulus_extraction(image, test_config, geo_init=geometry, background=(0., 0.05))
+    assert annulus["CUT_SMA"] is not None and np.max(annulus["ISOLIST"].sma) == annulus["CUT_SMA"] < 50
@@ -0,0 +1,75 @@
+from .. import bgsub, config, masking
+
+import maskfill
+import numpy as np
+
+
+def blob_image(blobs=(), shape=(101, 101), noise=0.05, seed=0):
+    """ Gaussian noise with circular Gaussian blobs, given as (y, x, amplitude). """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[:shape[0], :shape[1]]
+    image = rng.normal(scale=noise, size=shape)
+    for y, x, amp in blobs:
+        image += amp * np.exp(-((xx - x) ** 2 + (yy - y) ** 2) / 8)
+    return image
+
+
+def test_segmentation_product_shared():
+    image = blob_image([(50, 50, 10), (12, 72, 10)], noise=1, seed=3)
+    test_config = config.default_config()
+
+    product = masking.SegmentationProduct(image, test_config)
+    timings = {}
+    source_mask = bgsub.bgsub_source_mask(image, test_config, segmentation=product, timings=timings)
+    assert set(timings) == {"THRESHOLD", "SEGMENT", "DILATE"}
+    assert np.array_equal(source_mask, bgsub.bgsub_source_mask(image, test_config))
+    assert product._deblended is None           # Only deblended when a contaminant mask is needed
+
+    mask, _ = masking.gen_mask(image, test_config, segmentation=product)
+    assert np.array_equal(mask, masking.gen_mask(image, test_config)[0])
+    assert mask[12, 72] and not mask[50, 50]
+    assert product.source_mask() is source_mask
+
+
+def test_central_deblending_mask():
+    image = blob_image([(50, 50, 3), (50, 58, 2), (20, 20, 2), (80, 30, 1), (23, 26, 1)], seed=4)
+    test_config = config.default_config()
+
+    full = masking.SegmentationProduct(image, test_config, deblend="full")
+    central = masking.SegmentationProduct(image, test_config, deblend="central")
+    assert np.array_equal(full.contaminant_mask(), central.contaminant_mask())
+    assert central.contaminant_mask()[50, 58] and not central.contaminant_mask()[50, 50]
+    assert len(central.central_labels()) == 1
+
+
+def test_gen_mask_incremental():
+    image = blob_image([(50, 50, 3), (50, 58, 2), (20, 20, 2), (80, 30, 1)], seed=5)
+    test_config = config.default_config()
+    gradient = 0.0002 * np.mgrid[:101, :101][1]
+    reference = masking.SegmentationProduct(image + 0.5 + gradient, test_config)
+
+    mask, metadata = masking.gen_mask_incremental(image, reference, test_config, tolerance=0.05)
+    assert not metadata["INCREMENTAL_FALLBACK"]
+    assert np.mean(mask != masking.gen_mask(image, test_config)[0]) < 1e-3
+
+    mask, metadata = masking.gen_mask_incremental(image, reference, test_config, tolerance=-1)
+    assert metadata["INCREMENTAL_FALLBACK"]
+    assert np.array_equal(mask, masking.gen_mask(image, test_config)[0])
+
+
+def test_fill_regions():
+    image = blob_image(noise=1, seed=6)
+    mask = np.zeros(image.shape, dtype=bool)
+    mask[10:15, 10:14] = mask[60:64, 70:80] = mask[0:3, 95:101] = True
+
+    filled = masking.fill_regions(image, mask)
+    assert np.allclose(filled, maskfill.maskfill(np.copy(image), mask=mask)[0])
+    assert np.array_equal(filled[~mask], image[~mask])
+
+    # Derived fill of an image offset from the reference, with one extra masked region
+    offset = 0.5
+    bgsub_mask = mask.copy()
+    bgsub_mask[40:43, 40:43] = True
+    derived = masking.mask_image_fill_derived(image - offset, bgsub_mask, filled, mask, offset)
+    assert np.allclose(derived[mask], filled[mask] - offset)
+    assert np.all(np.isfinite(derived)) and not np.allclose(derived[40:43, 40:43], image[40:43, 40:43] - offset)
@@ -0,0 +1,39 @@
+from .. import sigclip
+
+import numpy as np
+from astropy.stats import sigma_clipped_stats
+
+
+def test_sigclip_stats_matches_astropy():
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=(101, 101))
+    data[40:50, 40:50] += 20                    # A bright source to clip
+    data[0, :5] = np.nan
+    mask = np.zeros(data.shape, dtype=bool)
+    mask[60:70, 10:30] = True
+
+    for kwargs in [{}, {"mask": mask}, {"sigma": 2.5, "maxiters": None}]:
+        expected = sigma_clipped_stats(data, **kwargs)
+        assert np.allclose(sigclip.sigclip_stats(data, **kwargs), expected, rtol=1e-5, atol=1e-6)
+
+    # Subsampled estimates are reproducible and close to the full estimate
+    subsampled = sigclip.sigclip_stats(data, subsample=2000)
+    assert subsampled == sigclip.sigclip_stats(data, subsample=2000)
+    assert np.allclose(subsampled, sigma_clipped_stats(data), atol=0.1)
+
+
+def test_sigclip_memo():
+    data = np.random.default_rng(2).normal(size=(50, 50))
+    with sigclip.sigclip_memo() as memo:
+        first = sigclip.sigclip_stats(data)
+        assert sigclip.sigclip_stats(data) is first
+        assert sigclip.sigclip_stats(data.copy()) is not first
+        assert len(memo) == 2
+
+    assert sigclip.sigclip_stats(data) is not first
+
+
+def test_sigclip_precision():
+    # A faint background fluctuation about a large level is not lost to rounding
+    data = 1e4 + np.random.default_rng(3).normal(scale=0.01, size=(101, 101))
+    assert np.allclose(sigclip.sigclip_stats(data), sigma_clipped_stats(data), rtol=1e-12, atol=1e-12)
@@ -1,7 +1,10 @@
 from .backgrounds import *      # Synthetic background models
+from .cache import *            # Model stamp cache
 from .galaxies import *         # Galaxy models
 from ..core.kdes import *
 from .kde_models import *             # Synthetic KDE distributions
+from .mixtures import *         # Gaussian-mixture models
 from .psfs import *             # PSF models
+from .rendering import *        # Native profile renderers
 from .utils import *            # Utility functions
 from .verifiers import *        # Parameter verifiers
\ No newline at end of file
@@ -0,0 +1,302 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from .. import utils
+from .utils import convolve_model
+
+
+# Default quantisation steps. REFF is quantised in log10 (dex), the rest linearly.
+default_quantisation = {
+    "REFF": 0.01,
+    "N": 0.05,
+    "ELLIP": 0.01,
+    "PA": np.deg2rad(1),
+}
+
+# Parameters that only set the normalisation (or bookkeeping) and are never part of the cache key
+unkeyed_params = ("MAG", "M0")
+
+
+def _is_magnitude(key):
+    # Total (MAG), component (MAG_<NAME>) and generated component (<NAME>_MAG) magnitudes
+    key = str(key)
+    return key == "MAG" or key.startswith("MAG_") or key.endswith("_MAG")
+
+
+def total_magnitude(params):
+    """ The total magnitude of a parameter set: its MAG, or the summed flux of its component 
+    magnitudes (MAG_<NAME>) for models without one (see MultiComponentModel). """
+    if "MAG" in params:
+        return params["MAG"]
+    m0 = params.get("M0", 27)
+    fluxes = [utils.Ltot(val, m0=m0) for key, val in params.items() if str(key).startswith("MAG_")]
+    return m0 - 2.5 * np.log10(np.sum(fluxes)) if len(fluxes) > 0 else 22
+
+
+def shift_magnitudes(params, offset):
+    """ A copy of a parameter set with every magnitude shifted by the same offset, which scales the 
+    flux of all components by the same factor. """
+    return {key: val + offset if _is_magnitude(key) else val for key, val in params.items()}
+
+
+class ModelStampCache:
+    """
+    An LRU cache of unit-flux model stamps, keyed on quantised structural parameters.
+
+    KDE draws within a bin cluster tightly in (REFF, N, ELLIP, PA), so rendering (and convolving) each
+    object from scratch repeats a lot of work. The cache renders the model at the centre of the
+    quantisation cell with unit total flux, convolves it with the PSF, and stores both. Any object
+    falling into the same cell with the same PSF and SHAPE is served by rescaling the stored stamps
+    by Ltot(MAG). Models without a total MAG are rendered with all their component magnitudes 
+    (MAG_<NAME>) shifted to unit total flux, and keyed on these relative magnitudes.
+
+    Parameters are matched to quantisation steps by name, or by the part before the first underscore
+    (so REFF_BULGE and REFF_DISK use the REFF step). REFF-type parameters are quantised in log10.
+    Numeric parameters without a step are keyed on their exact value. Objects whose cell centre 
+    fails the model verifier (e.g. ELLIP = 0.996 snapping to 1) bypass the cache and are rendered 
+    from their exact parameters.
+
+    Attributes:
+        quantisation (dict): Quantisation step for each structural parameter.
+        max_bytes (int): Memory bound on the stored stamps.
+        hits, misses, evictions, bypasses (int): Cache statistics.
+        nbytes (int): Memory currently used by the stored stamps.
+    """
+
+    def __init__(self, quantisation=None, max_bytes=256 * 2**20):
+        self.quantisation = {**default_quantisation, **(quantisation or {})}
+        self.max_bytes = int(max_bytes)
+
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits, self.misses, self.evictions, self.bypasses = 0, 0, 0, 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _step(self, key):
+        if key in self.quantisation:
+            return key, self.quantisation[key]
+        base = key.split("_")[0]
+        return base, self.quantisation.get(base, None)
+
+    def quantise(self, params):
+        """ Snap the structural parameters to the centres of their quantisation cells.
+
+        Args:
+            params (dict): The model parameters.
+
+        Returns:
+            tuple: The quantised parameter dict, and the hashable cell index used in the cache key.
+        """
+        quantised, cell = dict(params), []
+        for key in sorted(params):
+            val = params[key]
+            if key in unkeyed_params or not isinstance(val, (int, float, np.number)):
+                if key not in unkeyed_params:
+                    cell.append((key, str(val)))
+                continue
+
+            base, step = self._step(key)
+            if step is None:
+                cell.append((key, float(val)))
+                continue
+
+            if base == "REFF":
+                index = int(np.round(np.log10(val) / step))
+                quantised[key] = 10 ** (index * step)
+            elif base == "PA":
+                index = int(np.round((val % np.pi) / step))
+                quantised[key] = index * step
+            else:
+                index = int(np.round(val / step))
+                quantised[key] = index * step
+            cell.append((key, index))
+        return quantised, tuple(cell)
+
+    def key(self, params, psf_index=None):
+        """ The cache key of a parameter set: its quantisation cell, the PSF index and the model SHAPE. """
+        _, cell = self.quantise(params)
+        return (cell, psf_index, str(params.get("SHAPE", None)))
+
+    def get(self, key, mag, m0=27):
+        """ Look up a key, rescaling the stored unit-flux stamps to the given magnitude.
+
+        Returns:
+            tuple or None: (model, convolved model, model params) on a hit, None on a miss.
+        """
+        entry = self._entries.get(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        model, convolved, model_params = entry
+        scale = utils.Ltot(mag, m0=m0)
+        return model * scale, None if convolved is None else convolved * scale, dict(model_params)
+
+    def put(self, key, model, convolved, model_params):
+        """ Store unit-flux stamps under a key, evicting the least recently used entries as needed. """
+        size = model.nbytes + (0 if convolved is None else convolved.nbytes)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            old_model, old_convolved, _ = self._entries.pop(key)
+            self.nbytes -= old_model.nbytes + (0 if old_convolved is None else old_convolved.nbytes)
+
+        for arr in (model, convolved):
+            if arr is not None:
+                arr.flags.writeable = False
+        self._entries[key] = (model, convolved, dict(model_params))
+        self.nbytes += size
+
+        while self.nbytes > self.max_bytes:
+            _, (old_model, old_convolved, _) = self._entries.popitem(last=False)
+            self.nbytes -= old_model.nbytes + (0 if old_convolved is None else old_convolved.nbytes)
+            self.evictions += 1
+
+    def generate(self, model, params, psf=None, psf_index=None, method="auto", convolve=None):
+        """ Generate (and optionally convolve) a model through the cache.
+
+        Defaults are filled in as in GalaxyModel.generate, and a random PA is drawn up front if none
+        was given so that it can be quantised. The returned parameters are the quantised values that
+        were actually rendered, with the requested magnitudes.
+
+        Args:
+            model (GalaxyModel): The model to generate.
+            params (dict): The model parameters.
+            psf (numpy.ndarray, optional): PSF to convolve with. Defaults to None.
+            psf_index (int, optional): Index of the PSF in the PSF library, used in the cache key.
+                Defaults to None.
+            method (str, optional): Convolution method, see convolve_model. Defaults to "auto".
+            convolve (callable, optional): Function convolving a model with the PSF (e.g. a PSF registry 
+                lookup), used instead of convolve_model. Defaults to None.
+
+        Returns:
+            tuple: The model image, the convolved model image (None if no PSF) and the model params.
+        """
+        params = {**model.defaults, **params}
+        params["PA"] = params.get("PA", np.random.uniform(0, np.pi))
+        if not model.verifier.verify(params):
+            raise ValueError("Invalid parameters")
+
+        mag, m0 = total_magnitude(params), params.get("M0", 27)
+        quantised, cell = self.quantise(shift_magnitudes(params, m0 - mag))
+        if not model.verifier.verify(shift_magnitudes(quantised, mag - m0)):
+            # The cell centre is outside the valid parameter range, so the exact parameters are rendered
+            self.bypasses += 1
+            model_image, model_params = model._generate(**params)
+            if convolve is not None:
+                convolved = convolve(model_image)
+            else:
+                convolved = None if psf is None else convolve_model(model_image, psf, method=method)
+            return model_image, convolved, model_params
+
+        key = (cell, psf_index, str(params.get("SHAPE", None)))
+        cached = self.get(key, mag, m0=m0)
+        if cached is not None:
+            model_image, convolved, model_params = cached
+        else:
+            unit_image, model_params = model._generate(**quantised)
+            if convolve is not None:
+                unit_convolved = convolve(unit_image)
+            else:
+                unit_convolved = None if psf is None else convolve_model(unit_image, psf, method=method)
+            self.put(key, unit_image, unit_convolved, model_params)
+
+            scale = utils.Ltot(mag, m0=m0)
+            model_image = unit_image * scale
+            convolved = None if unit_convolved is None else unit_convolved * scale
+
+        model_params = shift_magnitudes(model_params, mag - m0)
+        model_params.update({key: val for key, val in params.items() if _is_magnitude(key)})
+        return model_image, convolved, model_params
+
+    def quantisation_error(self, model, params, psf=None):
+        """ Measure the profile error introduced by quantising a parameter set.
+
+        The exact and quantised models are rendered with the same magnitude (and convolved with the same
+        PSF, if given) and compared through their azimuthally averaged profiles about the frame centre,
+        out to the radius where the exact profile falls to 1e-3 of its peak.
+
+        Args:
+            model (GalaxyModel): The model to test.
+            params (dict): The model parameters.
+            psf (numpy.ndarray, optional): PSF to convolve with. Defaults to None.
+
+        Returns:
+            dict: "PROFILE_ERR", the maximum relative error of the radial profile, "PEAK_ERR", the maximum
+                absolute pixel difference relative to the peak, and "FLUX_ERR", the relative error of
+                the total flux.
+        """
+        params = {**model.defaults, **params}
+        params["PA"] = params.get("PA", np.random.uniform(0, np.pi))
+        quantised, _ = self.quantise(params)
+
+        exact, _ = model._generate(**dict(params))
+        approx, _ = model._generate(**quantised)
+        if psf is not None:
+            exact, approx = convolve_model(exact, psf), convolve_model(approx, psf)
+
+        ys, xs = np.indices(exact.shape)
+        rs = np.hypot(xs - exact.shape[1] / 2, ys - exact.shape[0] / 2).astype(int).ravel()
+        counts = np.bincount(rs)
+        prof_exact = np.bincount(rs, weights=exact.ravel()) / np.maximum(counts, 1)
+        prof_approx = np.bincount(rs, weights=approx.ravel()) / np.maximum(counts, 1)
+
+        good = prof_exact > 1e-3 * prof_exact.max()
+        return {
+            "PROFILE_ERR": float(np.max(np.abs(prof_approx[good] / prof_exact[good] - 1))),
+            "PEAK_ERR": float(np.max(np.abs(approx - exact)) / np.max(exact)),
+            "FLUX_ERR": float(np.sum(approx) / np.sum(exact) - 1),
+        }
+
+    def stats(self):
+        """ Cache statistics, as a flat dict (suitable for logging or FITS headers). """
+        lookups = self.hits + self.misses
+        return {
+            "CACHE_HITS": self.hits,
+            "CACHE_MISSES": self.misses,
+            "CACHE_EVICTIONS": self.evictions,
+            "CACHE_BYPASSES": self.bypasses,
+            "CACHE_ENTRIES": len(self._entries),
+            "CACHE_MB": self.nbytes / 2**20,
+            "CACHE_HIT_RATE": self.hits / lookups if lookups > 0 else 0.,
+        }
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+
+_stamp_cache = None
+
+
+def get_stamp_cache(config):
+    """ Get the per-process stamp cache configured by the [CACHE] section of a config.
+
+    Worker processes keep the cache between objects, so it is only built once per process.
+
+    Args:
+        config (dict): The GalPRIME config.
+
+    Returns:
+        ModelStampCache or None: The cache, or None if caching is disabled.
+    """
+    global _stamp_cache
+
+    cache_config = config.get("CACHE", {})
+    if not cache_config.get("ENABLED", False):
+        return None
+
+    quantisation = {key: float(cache_config[key]) for key in default_quantisation if key in cache_config}
+    max_bytes = float(cache_config.get("MAX_MB", 256)) * 2**20
+
+    if (_stamp_cache is None or _stamp_cache.max_bytes != int(max_bytes)
+            or _stamp_cache.quantisation != {**default_quantisation, **quantisation}):
+        _stamp_cache = ModelStampCache(quantisation=quantisation, max_bytes=max_bytes)
+    return _stamp_cache
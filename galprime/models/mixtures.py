@@ -0,0 +1,194 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy.optimize import nnls
+
+from .. import utils
+from . import rendering
+
+
+@lru_cache(maxsize=1024)
+def _sersic_mixture(n, tolerance, r_min):
+    bn = rendering.sersic_bn(n)
+    if n == 0.5:
+        # exp(-bn (r^2 - 1)) is a single Gaussian
+        return np.array([np.exp(bn)]), np.array([1 / np.sqrt(2 * bn)]), 0.
+
+    r_max = rendering.sersic_truncation_radius(1, n, 1 - 1e-4)
+    for n_candidates in (16, 24, 32, 48, 64):
+        rs = np.geomspace(r_min, r_max, 4 * n_candidates + 50)
+        profile = np.exp(-bn * (rs ** (1 / n) - 1))
+        sigmas = np.geomspace(r_min / 2, r_max, n_candidates)
+
+        # Fit the relative profile error, with normalised columns to keep NNLS well conditioned
+        gaussians = np.exp(-0.5 * (rs[:, None] / sigmas[None, :]) ** 2)
+        design = gaussians / profile[:, None]
+        norms = np.linalg.norm(design, axis=0)
+        amplitudes, _ = nnls(design / norms, np.ones_like(rs), maxiter=100 * n_candidates)
+        amplitudes /= norms
+
+        error = float(np.max(np.abs(gaussians @ amplitudes / profile - 1)))
+        if error <= tolerance:
+            break
+
+    keep = amplitudes > 0
+    return amplitudes[keep], sigmas[keep], error
+
+
+def sersic_mixture(n, tolerance=1e-3, r_min=1e-2):
+    """ Approximate a Sersic profile by a sum of concentric Gaussians.
+
+    The profile (unit surface brightness at r_eff, radii in units of r_eff) is fitted by non-negative
+    least squares on the relative error over r_min < r < r_99.99 (the radius enclosing 99.99% of the
+    light), with a log-spaced set of candidate widths that is refined until the maximum relative
+    error is below the tolerance. Fits are cached per Sersic index. n = 0.5 is an exact single
+    Gaussian, and profiles with n < 0.5 (more sharply truncated than a Gaussian) can not be
+    represented.
+
+    Args:
+        n (float): Sersic index, at least 0.5.
+        tolerance (float, optional): Maximum relative error of the fit. Defaults to 1e-3.
+        r_min (float, optional): Innermost fitted radius in units of r_eff. Defaults to 1e-2.
+
+    Returns:
+        tuple: The amplitudes and standard deviations (in units of r_eff) of the Gaussians, and the
+            maximum relative error of the fit.
+    """
+    if n < 0.5:
+        raise ValueError(f"Sersic index {n} < 0.5 can not be represented as a Gaussian mixture")
+    return _sersic_mixture(round(float(n), 4), float(tolerance), float(r_min))
+
+
+def fit_psf_mixture(psf, min_sigma=0.7, n_candidates=24):
+    """ Fit a PSF with a sum of concentric, circular Gaussians.
+
+    The PSF is fitted at its pixel centres, about the central pixel, with non-negative least squares
+    over a log-spaced set of candidate widths between min_sigma and half the stamp size. Narrower
+    Gaussians are not used, since pixel-centre samples no longer sum to their flux. The weights
+    are normalised to unit total flux.
+
+    Args:
+        psf (numpy.ndarray): The PSF, with an odd size and its peak at the central pixel
+            (see prepare_psf).
+        min_sigma (float, optional): Narrowest candidate width in pixels. Defaults to 0.7.
+        n_candidates (int, optional): Number of candidate widths. Defaults to 24.
+
+    Returns:
+        tuple: The flux weights and standard deviations (in pixels) of the Gaussians, and the
+            residual energy of the fit (fraction of sum(psf^2)).
+    """
+    psf = np.asarray(psf, dtype=float)
+    ys, xs = np.indices(psf.shape)
+    r2 = ((ys - psf.shape[0] // 2) ** 2 + (xs - psf.shape[1] // 2) ** 2).ravel()
+
+    sigmas = np.geomspace(min_sigma, max(min(psf.shape) / 2, 2 * min_sigma), n_candidates)
+    design = np.exp(-0.5 * r2[:, None] / sigmas[None, :] ** 2) / (2 * np.pi * sigmas[None, :] ** 2)
+    weights, _ = nnls(design, psf.ravel(), maxiter=100 * n_candidates)
+
+    residual = float(np.sum((design @ weights - psf.ravel()) ** 2) / np.sum(psf ** 2))
+    keep = weights > 0
+    return weights[keep] / np.sum(weights), sigmas[keep], residual
+
+
+def convolve_mixture(amplitudes, x_stddevs, y_stddevs, psf_mixture, merge_ratio=10):
+    """ Analytically convolve a mixture of aligned elliptical Gaussians with a circular PSF mixture.
+
+    Each pair of Gaussians convolves to a Gaussian with summed variances and the product of the
+    fluxes. To keep the number of output Gaussians down, widths that differ by more than 
+    merge_ratio are not convolved pair by pair: model Gaussians much wider than the widest PSF 
+    component are convolved with a single Gaussian of the same second moment as the PSF mixture, 
+    and model Gaussians much narrower than the narrowest PSF component are first merged into one 
+    Gaussian of the same flux and second moments. Both are accurate to order (sigma_small / 
+    sigma_large)^4.
+
+    Args:
+        amplitudes (array-like): Peak values of the model Gaussians.
+        x_stddevs (array-like): Major-axis standard deviations of the model Gaussians.
+        y_stddevs (array-like): Minor-axis standard deviations of the model Gaussians.
+        psf_mixture (tuple): PSF flux weights and standard deviations, as from fit_psf_mixture.
+        merge_ratio (float, optional): Width ratio above which the PSF is moment-matched.
+            Defaults to 10.
+
+    Returns:
+        tuple: The amplitudes, major-axis and minor-axis standard deviations of the convolved mixture.
+    """
+    weights, psf_sigmas = np.asarray(psf_mixture[0]), np.asarray(psf_mixture[1])
+    moment = np.sum(weights * psf_sigmas ** 2) / np.sum(weights)
+
+    amplitudes, x_stddevs, y_stddevs = (np.asarray(a, dtype=float) for a in (amplitudes, x_stddevs, y_stddevs))
+    narrow = x_stddevs * merge_ratio < np.min(psf_sigmas)
+    if np.count_nonzero(narrow) > 1:
+        fluxes = amplitudes[narrow] * x_stddevs[narrow] * y_stddevs[narrow]
+        var_x = np.sum(fluxes * x_stddevs[narrow] ** 2) / np.sum(fluxes)
+        var_y = np.sum(fluxes * y_stddevs[narrow] ** 2) / np.sum(fluxes)
+        amplitudes = np.append(amplitudes[~narrow], np.sum(fluxes) / np.sqrt(var_x * var_y))
+        x_stddevs = np.append(x_stddevs[~narrow], np.sqrt(var_x))
+        y_stddevs = np.append(y_stddevs[~narrow], np.sqrt(var_y))
+
+    out_amps, out_x, out_y = [], [], []
+    for amp, sx, sy in zip(amplitudes, x_stddevs, y_stddevs):
+        if min(sx, sy) > merge_ratio * np.max(psf_sigmas):
+            ws, vs = np.array([np.sum(weights)]), np.array([moment])
+        else:
+            ws, vs = weights, psf_sigmas ** 2
+        cx, cy = np.sqrt(sx ** 2 + vs), np.sqrt(sy ** 2 + vs)
+        out_amps.append(amp * ws * sx * sy / (cx * cy))
+        out_x.append(cx)
+        out_y.append(cy)
+
+    return np.concatenate(out_amps), np.concatenate(out_x), np.concatenate(out_y)
+
+
+def gen_mixture_model(components, psf_mixture=None, out=None, tolerance=1e-3, **kwargs):
+    """
+    Render a (multi-component) model, optionally already convolved with a PSF, as a sum of Gaussians.
+
+    Sersic components are expanded with sersic_mixture and Gaussian components are used as they are.
+    With a PSF mixture, every Gaussian is convolved analytically (convolve_mixture), so the convolved
+    model is evaluated directly, with no numerical convolution and with the continuous (sub-pixel)
+    profile core rather than a pixel-sampled one. Sersic components are normalised with the analytic
+    flux within 10 * REFF (as with NORM = "ANALYTIC"), and Gaussian components to their total flux.
+
+    Args:
+        components (list): Component dictionaries, as accepted by gen_multi_component.
+        psf_mixture (tuple, optional): PSF flux weights and standard deviations (see fit_psf_mixture).
+            Defaults to None (no convolution).
+        out (numpy.ndarray, optional): Preallocated array to render into. Defaults to None.
+        tolerance (float, optional): Relative accuracy of the Sersic mixtures. Defaults to 1e-3.
+        **kwargs: Shared model parameters ("SHAPE", "x_0", "y_0", "PA", "M0", "DTYPE").
+
+    Returns:
+        numpy.ndarray: The rendered model.
+    """
+    shape = kwargs.get("SHAPE", (101, 101))
+    shape = tuple(shape) if isinstance(shape, (tuple, list)) else (shape, shape)
+    x_0 = kwargs.get("x_0", shape[0] / 2)
+    y_0 = kwargs.get("y_0", shape[1] / 2)
+    m0 = kwargs.get("M0", 27)
+    PA = kwargs.get("PA", np.random.uniform(0, np.pi))
+    dtype = np.dtype(kwargs.get("DTYPE", "float64"))
+
+    amplitudes, x_stddevs, y_stddevs = [], [], []
+    for comp in components:
+        ellip = comp.get("ELLIP", 0.3)
+        ltot = utils.Ltot(comp.get("MAG", 22), m0=m0)
+
+        if comp.get("PROFILE", "SERSIC").upper() == "GAUSSIAN":
+            sigma = comp.get("STDDEV", 5)
+            amps, sigmas = np.array([ltot / (2 * np.pi * sigma ** 2 * (1 - ellip))]), np.array([sigma])
+        else:
+            reff, n = comp.get("REFF", 1), comp.get("N", 1)
+            amps, sigmas, _ = sersic_mixture(n, tolerance=tolerance)
+            amps = amps * ltot / utils.sersic_flux_in_circle(10 * reff, reff, n, ellip)
+            sigmas = sigmas * reff
+
+        amplitudes.append(amps)
+        x_stddevs.append(sigmas)
+        y_stddevs.append(sigmas * (1 - ellip))
+
+    amplitudes, x_stddevs, y_stddevs = (np.concatenate(a) for a in (amplitudes, x_stddevs, y_stddevs))
+    if psf_mixture is not None:
+        amplitudes, x_stddevs, y_stddevs = convolve_mixture(amplitudes, x_stddevs, y_stddevs, psf_mixture)
+
+    return rendering.render_gaussian_mixture(shape, x_0, y_0, PA, amplitudes, x_stddevs, y_stddevs,
+                                             dtype=dtype, out=out)
@@ -1,4 +1,10 @@
 from astropy.modeling import models
+import numpy as np
+
+from scipy.fft import irfft2, next_fast_len, rfft2
+
+from .mixtures import fit_psf_mixture
+from .utils import convolution_costs, convolve_model, separable_convolve, separable_decomposition
 
 
 class PSFModel:
@@ -7,13 +13,214 @@ class PSFModel:
 
     def generate(self):
         raise NotImplementedError("Abstract class")
-    
+
 
 class SingleGaussianPSF(PSFModel):
-    
+
     def __init__(self, params={}, **kwargs):
         super().__init__(params, **kwargs)
 
     def generate(self):
         return models.Gaussian2D(**self.params)
 
+
+def prepare_psf(psf, energy=1., normalise=True):
+    """ Clean up a PSF stamp for convolution.
+
+    Non-finite pixels are zeroed, the stamp is recentred by cropping it to the largest odd-sized box
+    centred on its peak, and then trimmed to the smallest centred box holding the requested fraction
+    of the (absolute) PSF energy. The result is optionally normalised to unit sum.
+
+    Args:
+        psf (numpy.ndarray): The PSF stamp.
+        energy (float, optional): Fraction of the PSF energy to keep when trimming. Defaults to 1
+            (no trimming).
+        normalise (bool, optional): Normalise the PSF to unit sum. Defaults to True.
+
+    Returns:
+        numpy.ndarray: The prepared PSF, with an odd size and the peak at the central pixel.
+    """
+    psf = np.nan_to_num(np.asarray(psf, dtype=float), nan=0., posinf=0., neginf=0.)
+
+    # Recentre on the peak
+    cy, cx = np.unravel_index(np.argmax(psf), psf.shape)
+    half = min(cy, psf.shape[0] - 1 - cy, cx, psf.shape[1] - 1 - cx)
+    psf = psf[cy - half:cy + half + 1, cx - half:cx + half + 1]
+
+    # Trim to the smallest centred box holding the requested energy
+    if energy < 1:
+        abs_psf = np.abs(psf)
+        total = np.sum(abs_psf)
+        for h in range(half + 1):
+            if np.sum(abs_psf[half - h:half + h + 1, half - h:half + h + 1]) >= energy * total:
+                psf = psf[half - h:half + h + 1, half - h:half + h + 1]
+                break
+
+    if normalise:
+        psf = psf / np.sum(psf)
+    return np.ascontiguousarray(psf)
+
+
+class PSFRegistry:
+    """
+    A fixed library of prepared PSFs, with their Fourier transforms cached for a given model shape.
+
+    The PSF library is small and fixed for a whole run, so each PSF is prepared (see prepare_psf)
+    once, and the real FFT of each PSF, zero-padded to the linear convolution size of the model
+    shape, is computed on first use and kept. Convolving a model is then a lookup plus one forward
+    and one inverse FFT of the model. The transforms are not pickled: each process rebuilds the
+    ones it needs.
+
+    If max_residual is given, each PSF is also decomposed into its lowest-rank separable 
+    approximation within that residual energy (see separable_decomposition), and PSFs whose 
+    separable convolution is cheaper than the cached FFT path are convolved that way.
+
+    Gaussian-mixture fits of the PSFs (see fit_psf_mixture), used by the analytic "mixture" 
+    convolution mode, are also computed on first use and kept.
+
+    Attributes:
+        kernels (list): The prepared PSFs.
+        shape (tuple): The model shape the transforms are padded for.
+        energy (float): Fraction of the PSF energy kept when trimming.
+        normalise (bool): Whether the PSFs were normalised to unit sum.
+        max_residual (float): Residual energy threshold of the separable decompositions, or None.
+        decompositions (list): (column kernels, row kernels, residual) of each PSF, or None.
+    """
+
+    def __init__(self, psfs, shape, energy=1., normalise=True, max_residual=None):
+        self.shape = tuple(shape) if isinstance(shape, (tuple, list)) else (int(shape), int(shape))
+        self.energy = energy
+        self.normalise = normalise
+        self.kernels = [prepare_psf(psf, energy=energy, normalise=normalise) for psf in psfs]
+        self._transforms = {}
+        self._mixtures = {}
+
+        self.max_residual = max_residual
+        self.decompositions = None
+        if max_residual is not None:
+            self.decompositions = [separable_decomposition(kernel, max_residual=max_residual) 
+                                   for kernel in self.kernels]
+
+    @staticmethod
+    def from_cutouts(cutouts, shape, energy=1., normalise=True, max_residual=None):
+        """ Build a registry from a Cutouts instance of PSFs (e.g. the PSF file of a run). 
+        
+        The ranks and residuals of the separable decompositions (if any) are recorded in the 
+        cutouts metadata as PSF_RANKS and PSF_RESIDUALS.
+        """
+        registry = PSFRegistry(cutouts.cutouts, shape, energy=energy, normalise=normalise, 
+                               max_residual=max_residual)
+        if registry.decompositions is not None:
+            cutouts.metadata = {**cutouts.metadata, 
+                                "PSF_RANKS": [len(d[0]) for d in registry.decompositions],
+                                "PSF_RESIDUALS": [d[2] for d in registry.decompositions]}
+        return registry
+
+    def __len__(self):
+        return len(self.kernels)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_transforms"] = {}
+        return state
+
+    def kernel(self, index):
+        return self.kernels[index]
+
+    def fft_shape(self, index):
+        """ The padded FFT shape for convolving a model of the registry shape with a given PSF. """
+        return tuple(next_fast_len(n + k - 1, real=True) for n, k in zip(self.shape, self.kernels[index].shape))
+
+    def transform(self, index):
+        """ The cached real FFT of a PSF, padded to fft_shape(index). """
+        if index not in self._transforms:
+            self._transforms[index] = rfft2(self.kernels[index], s=self.fft_shape(index))
+        return self._transforms[index]
+
+    def mixture(self, index):
+        """ The cached Gaussian-mixture fit of a PSF (weights, standard deviations, residual). """
+        if index not in self._mixtures:
+            self._mixtures[index] = fit_psf_mixture(self.kernels[index])
+        return self._mixtures[index]
+
+    def use_separable(self, index, method="auto"):
+        """ Whether a PSF is convolved through its separable decomposition with a given method. """
+        if self.decompositions is None or method not in ("separable", "auto"):
+            return False
+        if method == "separable":
+            return True
+        
+        # The cached transform saves one of the three FFTs of the fft path
+        costs = convolution_costs(self.shape, self.kernels[index].shape, rank=len(self.decompositions[index][0]))
+        return costs["separable"] < 2 / 3 * costs["fft"]
+
+    def convolve(self, model, index, method="fft"):
+        """ Convolve a model with a PSF from the registry, returning an image of the model shape.
+
+        Models of the registry shape are convolved with the cached PSF transform, or with the 
+        separable decomposition of the PSF if there is one and it is cheaper ("auto") or requested 
+        ("separable"). Any other shape or method falls back to convolve_model with the prepared PSF.
+
+        Args:
+            model (numpy.ndarray): The model image.
+            index (int): Index of the PSF in the registry.
+            method (str, optional): Convolution method. Defaults to "fft".
+
+        Returns:
+            numpy.ndarray: The convolved model.
+        """
+        if self.use_separable(index, method):
+            cols, rows, _ = self.decompositions[index]
+            return separable_convolve(model, cols, rows)
+
+        if model.shape != self.shape or method not in ("fft", "auto"):
+            max_residual = 1e-4 if self.max_residual is None else self.max_residual
+            return convolve_model(model, self.kernels[index], method=method, max_residual=max_residual)
+
+        fshape = self.fft_shape(index)
+        full = irfft2(rfft2(model, s=fshape) * self.transform(index), s=fshape)
+
+        # Crop the centre of the full convolution, as in mode="same"
+        ky, kx = self.kernels[index].shape
+        y_lo, x_lo = (ky - 1) // 2, (kx - 1) // 2
+        return full[y_lo:y_lo + self.shape[0], x_lo:x_lo + self.shape[1]].astype(model.dtype, copy=False)
+
+
+_psf_registry = None
+
+
+def get_psf_registry(config, psfs=None):
+    """ Get the per-process PSF registry configured by the [PSFS] section of a config.
+
+    The registry is built once per process (or once in the parent before the worker pool is forked),
+    from the given PSF cutouts or from the PSF file of the config.
+
+    Args:
+        config (dict): The GalPRIME config.
+        psfs (Cutouts, optional): The PSF cutouts, if already loaded. Defaults to None.
+
+    Returns:
+        PSFRegistry or None: The registry, or None if it is disabled.
+    """
+    global _psf_registry
+
+    psf_config = config.get("PSFS", {})
+    if not psf_config.get("REGISTRY", False):
+        return None
+
+    shape = config["MODEL"]["SIZE"]
+    energy = float(psf_config.get("ENERGY", 1.))
+    normalise = bool(psf_config.get("NORMALISE", True))
+    max_residual = psf_config.get("MAX_RESIDUAL", None)
+    max_residual = None if max_residual is None else float(max_residual)
+    filename = f'{config.get("FILE_DIR", "")}{config["FILES"]["PSFS"]}'
+
+    settings = (filename, shape, energy, normalise, max_residual)
+    if _psf_registry is None or getattr(_psf_registry, "settings", None) != settings:
+        if psfs is None:
+            from ..core.cutouts import Cutouts
+            psfs = Cutouts.from_file(filename)
+        _psf_registry = PSFRegistry.from_cutouts(psfs, shape, energy=energy, normalise=normalise, 
+                                                 max_residual=max_residual)
+        _psf_registry.settings = settings
+    return _psf_registry
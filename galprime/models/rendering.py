@@ -0,0 +1,481 @@
+import threading
+from functools import lru_cache
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+from scipy.special import gammaincinv
+
+from .. import utils
+
+
+@lru_cache(maxsize=4096)
+def sersic_bn(n):
+    """ Cached Sersic b(n) coefficient, so repeated renders at the same index skip gammaincinv.
+
+    Args:
+        n (float): Sersic index.
+
+    Returns:
+        float: b(n), such that half of the total light lies within r_eff.
+    """
+    return float(utils.b(n))
+
+
+class SersicBnTable:
+    """ Precomputed table of the Sersic b(n) coefficient for vectorized lookups.
+
+    scipy's gammaincinv costs ~0.7 us per element, which adds up when drawing b(n) for many objects
+    at once (model batches, contaminant populations). b(n) is smooth in log-log space, so the table 
+    stores log b(n) on a uniform grid in log n and interpolates with a cubic spline. The grid is 
+    refined until the relative interpolation error at the grid midpoints is below the tolerance. 
+    Indices outside of the table range are computed exactly.
+
+    Attributes:
+        n_range (tuple): The range of Sersic indices covered by the table.
+        tolerance (float): Maximum relative interpolation error.
+        n_points (int): Number of grid points in the final table.
+    """
+
+    def __init__(self, n_range=(0.05, 20), tolerance=1e-7, max_points=2**14):
+        self.n_range = n_range
+        self.tolerance = tolerance
+
+        n_points = 64
+        while True:
+            log_n = np.linspace(np.log(n_range[0]), np.log(n_range[1]), n_points)
+            spline = CubicSpline(log_n, np.log(utils.b(np.exp(log_n))))
+
+            mid = (log_n[1:] + log_n[:-1]) / 2
+            error = np.max(np.abs(np.exp(spline(mid)) / utils.b(np.exp(mid)) - 1))
+            if error <= tolerance or n_points >= max_points:
+                break
+            n_points *= 2
+
+        self.n_points, self.max_error = n_points, error
+        self._spline = spline
+
+    def __call__(self, n):
+        n = np.asarray(n, dtype=float)
+        in_range = (n >= self.n_range[0]) & (n <= self.n_range[1])
+        if np.all(in_range):
+            return np.exp(self._spline(np.log(n)))
+        
+        out = np.empty_like(n)
+        out[in_range] = np.exp(self._spline(np.log(n[in_range])))
+        out[~in_range] = utils.b(n[~in_range])
+        return out
+
+
+_bn_table = None
+
+
+def bn_table():
+    """ The per-process b(n) table, built on first use. """
+    global _bn_table
+    if _bn_table is None:
+        _bn_table = SersicBnTable()
+    return _bn_table
+
+
+@lru_cache(maxsize=32)
+def pixel_axes(shape, dtype=np.float64):
+    """ Cached pixel-index vectors for a given output shape.
+
+    The renderers broadcast these 1D axes against each other instead of allocating full
+    np.mgrid grids, so the only full-frame arrays are the ones holding the model itself.
+    The returned arrays are read-only since they are shared between calls.
+
+    Args:
+        shape (tuple): The (ny, nx) shape of the output image.
+        dtype (type, optional): Floating point type of the axes. Defaults to np.float64.
+
+    Returns:
+        tuple: (ys, xs) pixel index vectors of length ny and nx.
+    """
+    ys = np.arange(shape[0], dtype=dtype)
+    xs = np.arange(shape[1], dtype=dtype)
+    ys.flags.writeable = False
+    xs.flags.writeable = False
+    return ys, xs
+
+
+def elliptical_radius(shape, x_0, y_0, r_eff, ellip, theta, dtype=np.float64, out=None, squared=False):
+    """ Compute the elliptical radius (in units of r_eff) of every pixel in a frame.
+
+    Follows the astropy Sersic2D convention: theta is the angle of the major axis
+    measured counter-clockwise from the positive x-axis, and ellip = 1 - b/a.
+
+    Args:
+        shape (tuple): The (ny, nx) shape of the output image.
+        x_0 (float): X-coordinate of the centre.
+        y_0 (float): Y-coordinate of the centre.
+        r_eff (float): Semi-major effective radius.
+        ellip (float): Ellipticity.
+        theta (float): Position angle in radians.
+        dtype (type, optional): Floating point type of the output. Defaults to np.float64.
+        out (numpy.ndarray, optional): Preallocated array to write into. Defaults to None.
+        squared (bool, optional): Return (r / r_eff)^2 and skip the square root. Defaults to False.
+
+    Returns:
+        numpy.ndarray: The elliptical radius map, r / r_eff.
+    """
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    ys, xs = pixel_axes(tuple(int(s) for s in shape), out.dtype.type)
+    cos_t, sin_t = float(np.cos(theta)), float(np.sin(theta))
+    inv_a = 1. / float(r_eff)
+    inv_b = 1. / ((1. - float(ellip)) * float(r_eff))
+
+    dx = xs - float(x_0)
+    dy = ys - float(y_0)
+
+    x_maj = np.multiply(dy[:, None], sin_t * inv_a, out=out)
+    x_maj += dx[None, :] * (cos_t * inv_a)
+    x_min = dy[:, None] * (cos_t * inv_b) - dx[None, :] * (sin_t * inv_b)
+
+    np.square(x_maj, out=x_maj)
+    np.square(x_min, out=x_min)
+    x_maj += x_min
+    if squared:
+        return x_maj
+    return np.sqrt(x_maj, out=x_maj)
+
+
+def render_sersic(shape, x_0, y_0, r_eff, n, ellip, theta, amplitude=1., dtype=np.float64, out=None, bn=None):
+    """ Render a 2D Sersic profile with NumPy, without going through astropy.modeling.
+
+    Matches astropy's Sersic2D to within floating point precision (relative differences of
+    ~1e-12 in float64, ~1e-5 in float32), while avoiding its parameter validation, unit
+    handling and full coordinate grids.
+
+    Args:
+        shape (tuple): The (ny, nx) shape of the output image.
+        x_0 (float): X-coordinate of the centre.
+        y_0 (float): Y-coordinate of the centre.
+        r_eff (float): Semi-major effective radius.
+        n (float): Sersic index.
+        ellip (float): Ellipticity.
+        theta (float): Position angle in radians.
+        amplitude (float, optional): Surface brightness at r_eff. Defaults to 1.
+        dtype (type, optional): Floating point type of the output. Defaults to np.float64.
+        out (numpy.ndarray, optional): Preallocated array (e.g. a slice of a model stack) to 
+            render into. Defaults to None.
+        bn (float, optional): Precomputed b(n) (e.g. from bn_table). Defaults to None.
+
+    Returns:
+        numpy.ndarray: The rendered model.
+    """
+    z = elliptical_radius(shape, x_0, y_0, r_eff, ellip, theta, dtype=dtype, out=out, squared=True)
+    return sersic_profile(z, n, amplitude=amplitude, squared=True, bn=bn)
+
+
+def render_gaussian(shape, x_0, y_0, x_stddev, y_stddev, theta, amplitude=1., dtype=np.float64, out=None):
+    """ Render a 2D elliptical Gaussian with NumPy, following the astropy Gaussian2D convention.
+
+    Args:
+        shape (tuple): The (ny, nx) shape of the output image.
+        x_0 (float): X-coordinate of the centre.
+        y_0 (float): Y-coordinate of the centre.
+        x_stddev (float): Standard deviation along the major axis.
+        y_stddev (float): Standard deviation along the minor axis.
+        theta (float): Rotation angle of the major axis in radians.
+        amplitude (float, optional): Peak value. Defaults to 1.
+        dtype (type, optional): Floating point type of the output. Defaults to np.float64.
+        out (numpy.ndarray, optional): Preallocated array to render into. Defaults to None.
+
+    Returns:
+        numpy.ndarray: The rendered model.
+    """
+    z = elliptical_radius(shape, x_0, y_0, x_stddev, 1. - float(y_stddev) / float(x_stddev), theta, 
+                          dtype=dtype, out=out, squared=True)
+    return gaussian_profile(z, amplitude=amplitude)
+
+
+_scratch = threading.local()
+
+
+def scratch_buffers(shape, dtype=np.float64, count=1):
+    """ Per-thread scratch frames for temporaries that do not outlive a single render.
+
+    Allocating several full frames per model is dominated by page faults once the frames are 
+    too large for the allocator to recycle, so temporaries (rotated offsets, work buffers) are 
+    kept and reused between renders of the same shape. Callers must not return these arrays.
+
+    Args:
+        shape (tuple): The (ny, nx) shape of the frames.
+        dtype (type, optional): Floating point type of the frames. Defaults to np.float64.
+        count (int, optional): Number of frames. Defaults to 1.
+
+    Returns:
+        list: count arrays of the given shape and dtype, with undefined contents.
+    """
+    key = (tuple(int(s) for s in shape), np.dtype(dtype))
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None or buffers[0] != key:
+        buffers = (key, [])
+        _scratch.buffers = buffers
+    frames = buffers[1]
+    while len(frames) < count:
+        frames.append(np.empty(key[0], dtype=key[1]))
+    return frames[:count]
+
+
+def rotated_offsets(shape, x_0, y_0, theta, dtype=np.float64, out=None):
+    """ Squared pixel offsets from a centre along a rotated major and minor axis.
+
+    These are the only full-frame coordinate arrays needed to render any number of concentric 
+    components sharing a position angle: each component then only needs its own scaling 
+    (scaled_radius) and profile, instead of rebuilding and rotating the coordinates.
+
+    Args:
+        shape (tuple): The (ny, nx) shape of the output image.
+        x_0 (float): X-coordinate of the centre.
+        y_0 (float): Y-coordinate of the centre.
+        theta (float): Position angle of the major axis in radians.
+        dtype (type, optional): Floating point type of the output. Defaults to np.float64.
+        out (tuple, optional): Two preallocated arrays to write (u2, v2) into. Defaults to None.
+
+    Returns:
+        tuple: (u2, v2), the squared offsets along the major and minor axes.
+    """
+    ys, xs = pixel_axes(tuple(int(s) for s in shape), np.dtype(dtype).type)
+    cos_t, sin_t = float(np.cos(theta)), float(np.sin(theta))
+
+    dx = xs - float(x_0)
+    dy = ys - float(y_0)
+
+    u2, v2 = (None, None) if out is None else out
+    u2 = np.add((dy * sin_t)[:, None], (dx * cos_t)[None, :], out=u2)
+    v2 = np.subtract((dy * cos_t)[:, None], (dx * sin_t)[None, :], out=v2)
+    np.square(u2, out=u2)
+    np.square(v2, out=v2)
+    return u2, v2
+
+
+def scaled_radius(u2, v2, a, b, out=None, squared=False):
+    """ Elliptical radius r / a of every pixel, from the squared offsets of rotated_offsets.
+
+    Args:
+        u2 (numpy.ndarray): Squared offsets along the major axis.
+        v2 (numpy.ndarray): Squared offsets along the minor axis.
+        a (float): Semi-major scale (e.g. r_eff, or the major-axis standard deviation).
+        b (float): Semi-minor scale.
+        out (numpy.ndarray, optional): Preallocated array to write into. Defaults to None.
+        squared (bool, optional): Return (r / a)^2 and skip the square root. Defaults to False.
+
+    Returns:
+        numpy.ndarray: The elliptical radius map.
+    """
+    # (u / a)^2 + (v / b)^2 = ((b / a)^2 u^2 + v^2) / b^2, without a temporary frame
+    out = np.multiply(u2, (float(b) / float(a)) ** 2, out=out)
+    out += v2
+    out *= 1. / float(b) ** 2
+    if squared:
+        return out
+    return np.sqrt(out, out=out)
+
+
+def sersic_profile(r, n, amplitude=1., squared=False, bn=None):
+    """ Evaluate a Sersic profile in place on an elliptical radius map (in units of r_eff).
+
+    Working from the squared radius folds the square root into the power law, and for the common 
+    n = 1 and n = 0.5 profiles the power reduces to a square root or nothing at all.
+
+    Args:
+        r (numpy.ndarray): The elliptical radius map, overwritten with the profile.
+        n (float): Sersic index.
+        amplitude (float, optional): Surface brightness at r_eff. Defaults to 1.
+        squared (bool, optional): Whether r holds the squared radius. Defaults to False.
+        bn (float, optional): Precomputed b(n). Defaults to None (sersic_bn).
+
+    Returns:
+        numpy.ndarray: The profile (the same array as r).
+    """
+    exponent = (0.5 if squared else 1.) / float(n)
+    if exponent == 0.5:
+        np.sqrt(r, out=r)
+    elif exponent != 1:
+        np.power(r, exponent, out=r)
+    r -= 1.
+    r *= -(sersic_bn(float(n)) if bn is None else float(bn))
+    np.exp(r, out=r)
+    if amplitude != 1:
+        r *= float(amplitude)
+    return r
+
+
+def gaussian_profile(r2, amplitude=1.):
+    """ Evaluate a Gaussian profile in place on a squared elliptical radius map (in units of sigma).
+
+    Args:
+        r2 (numpy.ndarray): The squared elliptical radius map, overwritten with the profile.
+        amplitude (float, optional): Peak value. Defaults to 1.
+
+    Returns:
+        numpy.ndarray: The profile (the same array as r2).
+    """
+    r2 *= -0.5
+    np.exp(r2, out=r2)
+    if amplitude != 1:
+        r2 *= float(amplitude)
+    return r2
+
+
+def sersic_truncation_radius(r_eff, n, light_fraction, bn=None):
+    """ Semi-major radius enclosing a given fraction of the total light of a Sersic profile.
+
+    Args:
+        r_eff (float): Effective radius.
+        n (float): Sersic index.
+        light_fraction (float): Fraction of the total light to enclose, between 0 and 1.
+        bn (float, optional): Precomputed b(n). Defaults to None (sersic_bn).
+
+    Returns:
+        float: The truncation radius.
+    """
+    bn = sersic_bn(float(n)) if bn is None else float(bn)
+    return float(r_eff) * (gammaincinv(2 * n, light_fraction) / bn) ** n
+
+
+def gaussian_truncation_radius(light_fraction):
+    """ Radius, in units of the standard deviation, enclosing a given light fraction of a 2D Gaussian. """
+    return np.sqrt(-2 * np.log(1 - light_fraction))
+
+
+def footprint_box(shape, x_0, y_0, a, b, theta):
+    """ Pixel bounds of the axis-aligned box enclosing an ellipse, clipped to the frame.
+
+    Args:
+        shape (tuple): The (ny, nx) shape of the full frame.
+        x_0 (float): X-coordinate of the ellipse centre.
+        y_0 (float): Y-coordinate of the ellipse centre.
+        a (float): Semi-major axis.
+        b (float): Semi-minor axis.
+        theta (float): Position angle of the major axis in radians.
+
+    Returns:
+        tuple: (y_lo, y_hi, x_lo, x_hi) so that frame[y_lo:y_hi, x_lo:x_hi] covers the ellipse.
+            Always contains at least the pixel nearest the centre.
+    """
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    half_x = np.sqrt((a * cos_t) ** 2 + (b * sin_t) ** 2)
+    half_y = np.sqrt((a * sin_t) ** 2 + (b * cos_t) ** 2)
+
+    yc = min(max(int(round(y_0)), 0), shape[0] - 1)
+    xc = min(max(int(round(x_0)), 0), shape[1] - 1)
+    y_lo = min(max(int(np.floor(y_0 - half_y)), 0), yc)
+    x_lo = min(max(int(np.floor(x_0 - half_x)), 0), xc)
+    y_hi = max(min(int(np.ceil(y_0 + half_y)) + 1, shape[0]), yc + 1)
+    x_hi = max(min(int(np.ceil(x_0 + half_x)) + 1, shape[1]), xc + 1)
+    return y_lo, y_hi, x_lo, x_hi
+
+
+def render_sersic_stamp(shape, x_0, y_0, r_eff, n, ellip, theta, light_fraction=0.999, 
+                        amplitude=1., dtype=np.float64, bn=None):
+    """ Render a Sersic profile only within its truncation footprint.
+
+    The profile is evaluated on the box enclosing the ellipse that holds light_fraction of the total 
+    light, instead of the full frame. For compact objects this is one to two orders of magnitude 
+    fewer pixels.
+
+    Args:
+        shape (tuple): The (ny, nx) shape of the full frame.
+        x_0 (float): X-coordinate of the centre (in full-frame pixels).
+        y_0 (float): Y-coordinate of the centre (in full-frame pixels).
+        r_eff (float): Semi-major effective radius.
+        n (float): Sersic index.
+        ellip (float): Ellipticity.
+        theta (float): Position angle in radians.
+        light_fraction (float, optional): Light fraction setting the truncation radius. Defaults to 0.999.
+        amplitude (float, optional): Surface brightness at r_eff. Defaults to 1.
+        dtype (type, optional): Floating point type of the output. Defaults to np.float64.
+        bn (float, optional): Precomputed b(n). Defaults to None (sersic_bn).
+
+    Returns:
+        tuple: The rendered stamp and its (y, x) offset in the full frame.
+    """
+    a = sersic_truncation_radius(r_eff, n, light_fraction, bn=bn)
+    y_lo, y_hi, x_lo, x_hi = footprint_box(shape, x_0, y_0, a, a * abs(1 - ellip), theta)
+
+    stamp = render_sersic((y_hi - y_lo, x_hi - x_lo), x_0 - x_lo, y_0 - y_lo, r_eff, n, ellip, theta,
+                          amplitude=amplitude, dtype=dtype, bn=bn)
+    return stamp, (y_lo, x_lo)
+
+
+def render_gaussian_stamp(shape, x_0, y_0, x_stddev, y_stddev, theta, light_fraction=0.999, 
+                          amplitude=1., dtype=np.float64):
+    """ Render a 2D Gaussian only within its truncation footprint (see render_sersic_stamp).
+
+    Returns:
+        tuple: The rendered stamp and its (y, x) offset in the full frame.
+    """
+    r = gaussian_truncation_radius(light_fraction)
+    y_lo, y_hi, x_lo, x_hi = footprint_box(shape, x_0, y_0, r * x_stddev, r * y_stddev, theta)
+
+    stamp = render_gaussian((y_hi - y_lo, x_hi - x_lo), x_0 - x_lo, y_0 - y_lo, x_stddev, y_stddev, theta,
+                            amplitude=amplitude, dtype=dtype)
+    return stamp, (y_lo, x_lo)
+
+
+def paste_stamp(stamp, offset, shape, out=None):
+    """ Write a stamp into a zeroed full frame at the given (y, x) offset.
+
+    Args:
+        stamp (numpy.ndarray): The rendered stamp.
+        offset (tuple): The (y, x) offset of the stamp in the full frame.
+        shape (tuple): The (ny, nx) shape of the full frame.
+        out (numpy.ndarray, optional): Preallocated frame to write into. Defaults to None.
+
+    Returns:
+        numpy.ndarray: The full frame.
+    """
+    if out is None:
+        out = np.zeros(shape, dtype=stamp.dtype)
+    else:
+        out.fill(0)
+    out[offset[0]:offset[0] + stamp.shape[0], offset[1]:offset[1] + stamp.shape[1]] = stamp
+    return out
+
+
+def render_gaussian_mixture(shape, x_0, y_0, theta, amplitudes, x_stddevs, y_stddevs, floor=1e-10, 
+                            dtype=np.float64, out=None):
+    """ Render a sum of concentric Gaussians sharing a position angle.
+
+    The rotated offsets are computed once for all components, and each Gaussian is only evaluated 
+    within the box where it is above floor times the central value of the whole mixture, so narrow 
+    components cost next to nothing.
+
+    Args:
+        shape (tuple): The (ny, nx) shape of the output image.
+        x_0 (float): X-coordinate of the centre.
+        y_0 (float): Y-coordinate of the centre.
+        theta (float): Position angle of the major axis in radians.
+        amplitudes (array-like): Peak value of each Gaussian.
+        x_stddevs (array-like): Standard deviation of each Gaussian along the major axis.
+        y_stddevs (array-like): Standard deviation of each Gaussian along the minor axis.
+        floor (float, optional): Truncation level, relative to the central value of the mixture. 
+            Defaults to 1e-10.
+        dtype (type, optional): Floating point type of the output. Defaults to np.float64.
+        out (numpy.ndarray, optional): Preallocated array to render into. Defaults to None.
+
+    Returns:
+        numpy.ndarray: The rendered mixture.
+    """
+    if out is None:
+        out = np.zeros(shape, dtype=dtype)
+    else:
+        out.fill(0)
+
+    u2, v2, work = scratch_buffers(shape, dtype=out.dtype, count=3)
+    rotated_offsets(shape, x_0, y_0, theta, dtype=out.dtype, out=(u2, v2))
+
+    amplitudes = np.asarray(amplitudes, dtype=float)
+    cutoffs = np.sqrt(2 * np.log(np.maximum(amplitudes / (floor * np.sum(amplitudes)), 1.)))
+    for amplitude, x_stddev, y_stddev, cutoff in zip(amplitudes, x_stddevs, y_stddevs, cutoffs):
+        y_lo, y_hi, x_lo, x_hi = footprint_box(shape, x_0, y_0, cutoff * x_stddev, cutoff * y_stddev, theta)
+        box = (slice(y_lo, y_hi), slice(x_lo, x_hi))
+
+        z = scaled_radius(u2[box], v2[box], x_stddev, y_stddev, out=work[:y_hi - y_lo, :x_hi - x_lo], 
+                          squared=True)
+        out[box] += gaussian_profile(z, amplitude=amplitude)
+    return out
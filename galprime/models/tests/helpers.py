@@ -68,6 +68,20 @@ class ModelTestBase:
         for i in range(1, len(model_mags)):
             assert np.sum(model_mags[i]) < np.sum(model_mags[i-1])
     
+    def test_generate_batch(self):
+        # Test that a batch of models is returned as one contiguous stack with a parameter table
+        mod = self.model()
+        param_list = [{**mod.defaults, "MAG": mag, "SHAPE": 51, "PA": 0.5} for mag in [20, 21, 22]]
+        models, param_table = mod.generate_batch(param_list)
+
+        assert models.shape == (3, 51, 51)
+        assert models.flags.c_contiguous
+        assert len(param_table) == 3
+
+        # Each slice should match the single-object generation
+        single, _ = self.model().generate(params=dict(param_list[1]))
+        assert np.allclose(models[1], single)
+
     def test_verifier_exists(self):
         # Test that the model has a verifier connected to it
         assert self.model().verifier is not None
@@ -96,6 +110,12 @@ class ModelTestBase:
         params = {**mod.defaults, "ELLIP": 2}
         assert not mod.verifier.verify(params)
 
+    def test_verify_batch(self):
+        # Test that batch verification flags exactly the bad parameter sets
+        mod = self.model()
+        param_list = [{**mod.defaults, "MAG": 20}, {**mod.defaults, "MAG": -1}, {**mod.defaults, "MAG": 22}]
+        assert mod.verifier.verify_batch(param_list).tolist() == [True, False, True]
+
 
 class KDETestBase:
     """
@@ -60,4 +60,31 @@ def test_gen_single_sersic():
 
         for key, val in pset.items():
             assert mod_params[key] == val
-        
\ No newline at end of file
+        
+
+def test_bulge_disk_matches_components():
+    params = {"MAG": 18, "FBULGE": 0.3, "REFF_BULGE": 2, "N_BULGE": 4, "REFF_DISK": 6, 
+              "ELLIP_BULGE": 0.1, "ELLIP_DISK": 0.5, "PA": 0.8, "SHAPE": 151}
+    model, model_params = galaxies.BulgeDiskSersicModel().generate(params=dict(params))
+
+    bulge, _ = galaxies.gen_single_sersic(MAG=18 - 2.5 * np.log10(0.3), REFF=2, N=4, ELLIP=0.1, PA=0.8, SHAPE=151)
+    disk, _ = galaxies.gen_single_sersic(MAG=18 - 2.5 * np.log10(0.7), REFF=6, N=1, ELLIP=0.5, PA=0.8, SHAPE=151)
+
+    assert np.allclose(model, bulge + disk, rtol=1e-10, atol=0)
+    assert model_params["DISK_N"] == 1 and model_params["BULGE_N"] == 4
+
+
+def test_multi_component_model():
+    mod = galaxies.MultiComponentModel({"BULGE": "SERSIC", "DISK": "SERSIC", "HALO": "GAUSSIAN"})
+    params = {**mod.defaults, "MAG_HALO": 23, "STDDEV_HALO": 15, "N_BULGE": 3, "PA": 0.3, "SHAPE": 151}
+    model, model_params = mod.generate(params=dict(params))
+
+    bulge, _ = galaxies.gen_single_sersic(MAG=22, REFF=1, N=3, ELLIP=0.3, PA=0.3, SHAPE=151)
+    disk, _ = galaxies.gen_single_sersic(MAG=22, REFF=1, N=1, ELLIP=0.3, PA=0.3, SHAPE=151)
+    halo, _ = galaxies.gen_gaussian(MAG=23, STDDEV=15, ELLIP=0.3, PA=0.3, SHAPE=151)
+
+    assert np.allclose(model, bulge + disk + halo, rtol=1e-10, atol=0)
+    assert model_params["HALO_REFF"] == 15
+
+    assert not mod.verifier.verify({**params, "N_BULGE": 12})
+    assert not mod.verifier.verify({**params, "STDDEV_HALO": -1})
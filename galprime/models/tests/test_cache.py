@@ -0,0 +1,84 @@
+import numpy as np
+
+from .. import cache, galaxies
+
+
+def test_cache_hit_rescales():
+    stamp_cache = cache.ModelStampCache()
+    model = galaxies.SingleSersicModel()
+    params = {"MAG": 20, "REFF": 3., "N": 1.5, "ELLIP": 0.3, "PA": 1., "SHAPE": 51}
+
+    mod_1, _, _ = stamp_cache.generate(model, params)
+    mod_2, _, mod_params = stamp_cache.generate(model, {**params, "MAG": 21, "REFF": 3.001})
+
+    assert stamp_cache.hits == 1 and stamp_cache.misses == 1
+    assert mod_params["MAG"] == 21
+    assert np.isclose(np.sum(mod_1) / np.sum(mod_2), 10 ** 0.4)
+
+
+def test_cache_psf_key():
+    stamp_cache = cache.ModelStampCache()
+    model = galaxies.SingleSersicModel()
+    params = {"MAG": 20, "REFF": 3., "N": 1.5, "ELLIP": 0.3, "PA": 1., "SHAPE": 51}
+    psf = np.ones((3, 3)) / 9
+
+    _, conv_1, _ = stamp_cache.generate(model, params, psf=psf, psf_index=0)
+    _, conv_2, _ = stamp_cache.generate(model, params, psf=psf, psf_index=1)
+
+    assert stamp_cache.misses == 2
+    assert np.allclose(conv_1, conv_2)
+
+
+def test_cache_memory_bound():
+    stamp_cache = cache.ModelStampCache(max_bytes=3 * 51 * 51 * 8)
+    model = galaxies.SingleSersicModel()
+    for reff in [2, 3, 4, 5, 6]:
+        stamp_cache.generate(model, {"MAG": 20, "REFF": reff, "N": 1, "ELLIP": 0.3, "PA": 1., "SHAPE": 51})
+
+    assert len(stamp_cache) == 3
+    assert stamp_cache.evictions == 2
+    assert stamp_cache.nbytes <= stamp_cache.max_bytes
+
+
+def test_quantisation_error():
+    stamp_cache = cache.ModelStampCache()
+    params = {"MAG": 20, "REFF": 3.04, "N": 1.52, "ELLIP": 0.304, "PA": 1.004, "SHAPE": 51}
+    errors = stamp_cache.quantisation_error(galaxies.SingleSersicModel(), params)
+
+    assert 0 < errors["PROFILE_ERR"] < 0.05
+    assert abs(errors["FLUX_ERR"]) < 0.01
+
+
+def test_cache_bypasses_invalid_cells():
+    stamp_cache = cache.ModelStampCache()
+    model = galaxies.SingleSersicModel()
+    params = {"MAG": 20, "REFF": 3., "N": 1.5, "ELLIP": 0.996, "PA": 1., "SHAPE": 51}
+
+    for invalid in ({"ELLIP": 0.996}, {"N": 0.02}):
+        quantised, _ = stamp_cache.quantise({**params, **invalid})
+        assert model.verifier.verify({**params, **invalid}) and not model.verifier.verify(quantised)
+
+    mod, _, mod_params = stamp_cache.generate(model, params)
+    assert stamp_cache.bypasses == 1 and len(stamp_cache) == 0
+    assert mod_params["ELLIP"] == 0.996 and np.all(np.isfinite(mod))
+
+
+def test_cache_flux_parity():
+    stamp_cache = cache.ModelStampCache()
+    for model, params in [(galaxies.SingleSersicModel(), {"MAG": 20, "REFF": 3., "N": 1.5, "ELLIP": 0.3}), 
+                          (galaxies.BulgeDiskSersicModel(), {"MAG": 20, "FBULGE": 0.3, "REFF_BULGE": 2., 
+                                                              "REFF_DISK": 5.}), 
+                          (galaxies.MultiComponentModel(), {"MAG_BULGE": 21, "MAG_DISK": 20.5, "REFF_BULGE": 2., 
+                                                            "REFF_DISK": 5.})]:
+        params = {**params, "PA": 1., "SHAPE": 51}
+        exact, _ = model.generate(dict(params))
+        cached, _, cached_params = stamp_cache.generate(model, params)
+        assert np.isclose(np.sum(cached), np.sum(exact), rtol=1e-2)
+        assert ("MAG" in cached_params) == ("MAG" in params)
+
+        # Hits are rescaled to the magnitudes of the requested object
+        brighter = cache.shift_magnitudes(params, -1)
+        cached, _, cached_params = stamp_cache.generate(model, brighter)
+        assert np.isclose(np.sum(cached), np.sum(exact) * 10 ** 0.4, rtol=1e-2)
+        assert all(cached_params[key] == brighter[key] for key in brighter if key.startswith("MAG"))
+    assert stamp_cache.hits == 3
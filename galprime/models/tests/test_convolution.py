@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from scipy.signal import convolve2d
+
+from ...core.cutouts import Cutouts
+from ..utils import (batch_fft_convolve, choose_convolution_method, convolve_model, separable_convolve, 
+                     separable_decomposition)
+
+
+def test_convolution_methods_agree():
+    image, psf = np.random.rand(101, 90), np.random.rand(11, 8)
+    ref_same, ref_full = convolve2d(image, psf, mode="same"), convolve2d(image, psf)
+
+    for method in ["direct", "fft", "oa", "auto"]:
+        assert np.allclose(convolve_model(image, psf, method=method), ref_same, rtol=1e-10, atol=1e-10)
+        assert np.allclose(convolve_model(image, psf, method=method, mode="full"), ref_full, 
+                           rtol=1e-10, atol=1e-10)
+    
+    with pytest.raises(ValueError):
+        convolve_model(image, psf, method="bad")
+
+
+def test_separable_convolution():
+    image = np.random.rand(101, 90)
+    ys, xs = np.mgrid[-10:11, -10:11]
+    psf = np.exp(-0.5 * (xs ** 2 / 9 + ys ** 2 / 4)) + 0.01 * np.exp(-0.5 * (xs ** 2 + ys ** 2) / 25)
+    psf /= np.sum(psf)
+
+    cols, rows, residual = separable_decomposition(psf, max_residual=1e-6)
+    assert len(cols) < 21 and residual <= 1e-6
+
+    for mode in ["same", "full"]:
+        ref = convolve2d(image, psf, mode=mode)
+        assert np.allclose(separable_convolve(image, cols, rows, mode=mode), ref, atol=1e-3 * np.max(ref))
+        assert np.allclose(convolve_model(image, psf, method="separable", mode=mode, max_residual=0), ref)
+
+
+def test_choose_convolution_method():
+    assert choose_convolution_method((451, 451), (3, 3)) == "direct"
+    assert choose_convolution_method((451, 451), (41, 41)) == "fft"
+    assert choose_convolution_method((451, 451), (11, 11), rank=1) == "separable"
+
+
+def test_cutouts_convolve():
+    cutouts = Cutouts(cutouts=[np.random.rand(50, 50) for _ in range(3)], cutout_data=[{}, {}, {}])
+    psf = np.random.rand(7, 7)
+    convolved = cutouts.convolve(psf, method="fft")
+
+    assert len(convolved.cutouts) == 3
+    assert np.allclose(convolved.cutouts[1], convolve2d(cutouts.cutouts[1], psf))
+
+
+def test_batch_fft_convolve():
+    stack, psfs = np.random.rand(5, 40, 36), np.random.rand(5, 9, 6)
+    
+    for mode in ["same", "full"]:
+        shared = batch_fft_convolve(stack, psfs[0], mode=mode, chunk_size=2)
+        own = batch_fft_convolve(stack, psfs, mode=mode)
+        for i in range(len(stack)):
+            assert np.allclose(shared[i], convolve2d(stack[i], psfs[0], mode=mode))
+            assert np.allclose(own[i], convolve2d(stack[i], psfs[i], mode=mode))
+
+
+def test_cutouts_convolve_psf_list():
+    shapes = [(50, 50), (50, 50), (40, 60), (50, 50)]
+    cutouts = Cutouts(cutouts=[np.random.rand(*shape) for shape in shapes], cutout_data=[{"I": i} for i in range(4)])
+    psf_list = [np.random.rand(7, 7), np.random.rand(7, 7), np.random.rand(5, 5), np.random.rand(9, 9)]
+    convolved = cutouts.convolve(psf_list, method="fft", chunk_size=1)
+
+    for cutout, p, out in zip(cutouts.cutouts, psf_list, convolved.cutouts):
+        assert np.allclose(out, convolve2d(cutout, p))
+    assert convolved.cutout_data[2]["I"] == 2
+    assert convolved.cutout_data is not cutouts.cutout_data
+
+
+def test_cutouts_convolve_separable():
+    cutouts = Cutouts(cutouts=[np.random.rand(50, 50) for _ in range(3)], 
+                      cutout_data=[{"RA": i, "DEC": -i} for i in range(3)])
+    cutouts.get_ra_dec()
+    psf = np.outer(np.hanning(9), np.hanning(7))
+    convolved = cutouts.convolve(psf, max_residual=1e-6)
+
+    assert convolved.metadata["PSF_RANKS"] == [1, 1, 1]
+    assert convolved.ras == [0, 1, 2] and convolved.decs == [0, -1, -2]
+    assert np.allclose(convolved.cutouts[2], convolve2d(cutouts.cutouts[2], psf))
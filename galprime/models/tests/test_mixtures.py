@@ -0,0 +1,71 @@
+import numpy as np
+
+from .. import galaxies, mixtures, psfs, rendering
+from ..utils import convolve_model
+from ...utils import Ltot
+
+
+def test_sersic_mixture():
+    for n in [1, 2.5, 4]:
+        amps, sigmas, error = mixtures.sersic_mixture(n)
+        rs = np.geomspace(0.05, 5, 200)
+        profile = np.exp(-rendering.sersic_bn(n) * (rs ** (1 / n) - 1))
+        approx = np.sum(amps * np.exp(-0.5 * (rs[:, None] / sigmas) ** 2), axis=1)
+
+        assert error <= 1e-3
+        assert np.allclose(approx, profile, rtol=1e-3, atol=0)
+
+    # n = 0.5 is a single, exact Gaussian
+    amps, sigmas, error = mixtures.sersic_mixture(0.5)
+    assert len(amps) == 1 and error == 0
+
+
+def test_fit_psf_mixture():
+    psf = psfs.prepare_psf(rendering.render_gaussian((41, 41), 20, 20, 2.5, 2.5, 0.))
+    weights, sigmas, residual = mixtures.fit_psf_mixture(psf)
+
+    assert np.isclose(np.sum(weights), 1)
+    assert np.isclose(np.sqrt(np.sum(weights * sigmas ** 2)), 2.5, rtol=1e-2)
+    assert residual < 1e-4
+
+
+def test_mixture_model_matches_numeric():
+    params = {"MAG": 20, "REFF": 4, "N": 2, "ELLIP": 0.3, "PA": 0.7, "SHAPE": 201}
+    components = galaxies.SingleSersicModel().mixture_components(**params)
+    psf = psfs.prepare_psf(rendering.render_gaussian((91, 91), 45, 45, 2.5, 2.5, 0.))
+    psf_mixture = mixtures.fit_psf_mixture(psf)
+
+    unconvolved = mixtures.gen_mixture_model(components, **params)
+    convolved = mixtures.gen_mixture_model(components, psf_mixture, **params)
+    numeric = convolve_model(unconvolved, psf)
+
+    # The mixture has the Sersic profile (normalised to its continuous rather than pixel-sampled 
+    # flux), the convolved model has the requested flux, and matches the numerical convolution outside the core
+    model, _ = galaxies.gen_single_sersic(**params)
+    rr = np.hypot(*(np.indices(convolved.shape) - 100.5))
+    ratio = (unconvolved / model)[rr < 40]
+    assert np.allclose(ratio, np.median(ratio), rtol=1e-3)
+    assert np.isclose(np.median(ratio), 1, rtol=2e-2)
+    assert np.isclose(galaxies.circle_sum(convolved, 100.5, 100.5, 40), Ltot(20), rtol=5e-3)
+
+    ring = (rr > 10) & (rr < 40)
+    assert np.allclose(convolved[ring], numeric[ring], rtol=1e-2, atol=0)
+
+
+def test_generate_mixture():
+    model = galaxies.SingleSersicModel()
+    psf_mixture = mixtures.fit_psf_mixture(psfs.prepare_psf(rendering.render_gaussian((41, 41), 20, 20, 2, 2, 0.)))
+    params = {"MAG": 20, "REFF": 4, "N": 2, "ELLIP": 0.3, "SHAPE": 101}
+
+    image, drawn = model.generate_mixture(psf_mixture, params)
+    assert "PA" not in params
+    assert drawn["X0"] == drawn["Y0"] == 50.5 and drawn["SHAPE"] == (101, 101)
+
+    expected = mixtures.gen_mixture_model(model.mixture_components(**drawn), psf_mixture, **drawn)
+    assert np.array_equal(image, expected)
+
+def test_registry_mixture():
+    registry = psfs.PSFRegistry([rendering.render_gaussian((41, 41), 20, 20, 2, 2, 0.)], shape=101)
+
+    assert registry.mixture(0) is registry.mixture(0)
+    assert len(registry._mixtures) == 1
@@ -0,0 +1,63 @@
+import pickle
+
+import numpy as np
+from astropy.modeling.models import Gaussian2D
+from scipy.signal import convolve2d
+
+from ...core.config import default_config
+from ...core.cutouts import Cutouts
+from .. import psfs
+
+
+def gaussian_psf(shape=(41, 41), x_0=20, y_0=20, sigma=3):
+    ys, xs = np.mgrid[:shape[0], :shape[1]]
+    return Gaussian2D(amplitude=5, x_mean=x_0, y_mean=y_0, x_stddev=sigma, y_stddev=sigma)(xs, ys)
+
+
+def test_prepare_psf():
+    psf = psfs.prepare_psf(gaussian_psf(shape=(40, 44), x_0=22, y_0=18), energy=0.999)
+
+    assert psf.shape[0] == psf.shape[1] and psf.shape[0] % 2 == 1
+    assert psf.shape[0] < 37
+    assert np.unravel_index(np.argmax(psf), psf.shape) == (psf.shape[0] // 2, psf.shape[1] // 2)
+    assert np.isclose(np.sum(psf), 1)
+
+
+def test_registry_convolve():
+    registry = psfs.PSFRegistry([gaussian_psf(), gaussian_psf(sigma=2)], shape=101)
+    model = np.random.rand(101, 101)
+
+    for i in range(len(registry)):
+        convolved = registry.convolve(model, i)
+        assert np.allclose(convolved, convolve2d(model, registry.kernel(i), mode="same"), atol=1e-12)
+    assert len(registry._transforms) == 2
+
+    # Transforms are rebuilt per process rather than pickled
+    assert len(pickle.loads(pickle.dumps(registry))._transforms) == 0
+
+    # Other shapes fall back to a direct convolution with the prepared PSF
+    small = np.random.rand(51, 51)
+    assert np.allclose(registry.convolve(small, 0), convolve2d(small, registry.kernel(0), mode="same"))
+
+
+def test_get_psf_registry():
+    config = default_config()
+    cutouts = Cutouts(cutouts=[gaussian_psf()], cutout_data=[{}])
+    assert psfs.get_psf_registry(config, psfs=cutouts) is None
+
+    config["PSFS"]["REGISTRY"] = True
+    registry = psfs.get_psf_registry(config, psfs=cutouts)
+    assert registry.shape == (config["MODEL"]["SIZE"], config["MODEL"]["SIZE"])
+    assert psfs.get_psf_registry(config) is registry
+
+
+def test_registry_separable():
+    cutouts = Cutouts(cutouts=[gaussian_psf(), gaussian_psf(sigma=2)], cutout_data=[{}, {}], metadata={})
+    registry = psfs.PSFRegistry.from_cutouts(cutouts, shape=101, max_residual=1e-8)
+    model = np.random.rand(101, 101)
+
+    # Circular Gaussians are exactly separable
+    assert cutouts.metadata["PSF_RANKS"] == [1, 1]
+    assert registry.use_separable(0, "separable")
+    assert np.allclose(registry.convolve(model, 0, method="separable"), 
+                       convolve2d(model, registry.kernel(0), mode="same"), atol=1e-10)
@@ -0,0 +1,131 @@
+import numpy as np
+from astropy.modeling.models import Gaussian2D, Sersic2D
+from scipy.special import gamma
+
+from .. import galaxies, rendering
+from ...utils import fluxes
+
+
+def astropy_sersic(shape, x_0, y_0, r_eff, n, ellip, theta):
+    ys, xs = np.mgrid[:shape[0], :shape[1]]
+    return Sersic2D(amplitude=1, r_eff=r_eff, n=n, x_0=x_0, y_0=y_0, ellip=ellip, theta=theta)(xs, ys)
+
+
+def test_render_sersic_matches_astropy():
+    for r_eff, n, ellip, theta in [(1, 1, 0.3, 0.2), (3.5, 4, 0.7, 2.5), (10, 0.6, 0.1, 1.)]:
+        ref = astropy_sersic((101, 121), 50.5, 60.2, r_eff, n, ellip, theta)
+        z = rendering.render_sersic((101, 121), 50.5, 60.2, r_eff, n, ellip, theta)
+
+        assert z.shape == ref.shape
+        assert np.allclose(z, ref, rtol=1e-10, atol=0)
+
+
+def test_render_sersic_float32():
+    ref = astropy_sersic((101, 101), 50.5, 50.5, 4, 2, 0.4, 1.)
+    z = rendering.render_sersic((101, 101), 50.5, 50.5, 4, 2, 0.4, 1., dtype=np.float32)
+
+    assert z.dtype == np.float32
+    assert np.allclose(z, ref, rtol=1e-4, atol=0)
+
+
+def test_pixel_axes_cached():
+    ys, xs = rendering.pixel_axes((51, 61))
+
+    assert rendering.pixel_axes((51, 61))[0] is ys
+    assert len(ys) == 51 and len(xs) == 61
+    assert not ys.flags.writeable
+
+
+def test_gen_single_sersic_dtype():
+    mod32, _ = galaxies.gen_single_sersic(MAG=20, REFF=3, N=2, ELLIP=0.3, PA=1., DTYPE="float32")
+    mod64, _ = galaxies.gen_single_sersic(MAG=20, REFF=3, N=2, ELLIP=0.3, PA=1.)
+
+    assert mod32.dtype == np.float32
+    assert np.allclose(mod32, mod64, rtol=1e-4, atol=1e-8)
+
+
+def test_sersic_flux_in_circle_total():
+    # A very large aperture should recover the total flux of the elliptical profile
+    r_eff, n, ellip = 3., 2., 0.4
+    bn = fluxes.b(n)
+    total = 2 * np.pi * (1 - ellip) * r_eff ** 2 * n * np.exp(bn) * gamma(2 * n) / bn ** (2 * n)
+
+    assert np.isclose(fluxes.sersic_flux_in_circle(1e4, r_eff, n, ellip), total, rtol=1e-6)
+
+
+def test_analytic_normalisation():
+    for r_eff, n, ellip in [(0.5, 1, 0.3), (2, 4, 0.5), (5, 1, 0.8), (12, 0.5, 0.1)]:
+        z = rendering.render_sersic((301, 301), 150.5, 150.3, r_eff, n, ellip, 0.7)
+        direct = galaxies.sersic_normalisation(z, 150.5, 150.3, r_eff, n, ellip, method="10RE")
+        analytic = galaxies.sersic_normalisation(z, 150.5, 150.3, r_eff, n, ellip, method="ANALYTIC")
+
+        assert np.isclose(direct, analytic, rtol=5e-4)
+
+
+def test_gen_single_sersic_norm():
+    mod, _ = galaxies.gen_single_sersic(MAG=20, REFF=4, N=2, ELLIP=0.3, PA=1., SHAPE=201)
+    mod_analytic, _ = galaxies.gen_single_sersic(MAG=20, REFF=4, N=2, ELLIP=0.3, PA=1., SHAPE=201, 
+                                                 NORM="ANALYTIC")
+
+    assert np.isclose(np.sum(mod), np.sum(mod_analytic), rtol=5e-4)
+
+
+def test_render_gaussian_matches_astropy():
+    ys, xs = np.mgrid[:81, :91]
+    ref = Gaussian2D(amplitude=1, x_mean=40.2, y_mean=45.5, x_stddev=6, y_stddev=3, theta=0.4)(xs, ys)
+    z = rendering.render_gaussian((81, 91), 40.2, 45.5, 6, 3, 0.4)
+
+    assert np.allclose(z, ref, rtol=1e-10, atol=1e-300)
+
+
+def test_sersic_stamp_footprint():
+    stamp, (y_lo, x_lo) = rendering.render_sersic_stamp((451, 451), 225.5, 225.5, 2, 1, 0.3, 0.5)
+    full = rendering.render_sersic((451, 451), 225.5, 225.5, 2, 1, 0.3, 0.5)
+
+    assert stamp.size < full.size / 100
+    assert np.allclose(stamp, full[y_lo:y_lo + stamp.shape[0], x_lo:x_lo + stamp.shape[1]])
+    assert np.isclose(stamp.sum(), full.sum(), rtol=2e-3)
+
+
+def test_truncated_models():
+    for gen, params in [(galaxies.gen_single_sersic, {"REFF": 3, "N": 2}), 
+                        (galaxies.gen_gaussian, {"STDDEV": 3})]:
+        full, _ = gen(MAG=20, ELLIP=0.3, PA=1., SHAPE=201, **params)
+        truncated, _ = gen(MAG=20, ELLIP=0.3, PA=1., SHAPE=201, TRUNC_FRAC=0.999, **params)
+
+        assert truncated.shape == full.shape
+        assert np.count_nonzero(truncated) < truncated.size / 4
+        assert np.isclose(np.sum(truncated), np.sum(full), rtol=1e-3)
+
+    model, _ = galaxies.BulgeDiskSersicModel().generate(params={"SHAPE": 201, "PA": 1., "TRUNC_FRAC": 0.999})
+    assert np.count_nonzero(model) < model.size / 4
+
+
+def test_bn_table():
+    table = rendering.SersicBnTable(tolerance=1e-7)
+    ns = np.concatenate([np.random.uniform(0.1, 10, 500), [0.01, 30]])
+
+    assert table.max_error <= 1e-7
+    assert np.allclose(table(ns), fluxes.b(ns), rtol=1e-7, atol=0)
+    assert rendering.bn_table() is rendering.bn_table()
+
+    # Rendering with a tabulated b(n) matches the exact coefficient
+    bn = rendering.bn_table()(2.37)
+    exact = rendering.render_sersic((51, 51), 25, 25, 4., 2.37, 0.3, 1.)
+    assert np.allclose(rendering.render_sersic((51, 51), 25, 25, 4., 2.37, 0.3, 1., bn=bn), exact, rtol=1e-5)
+
+
+def test_add_sersic_objects():
+    from ...core.cutouts import Cutouts
+    from ...utils import generators
+
+    blank = Cutouts(cutouts=[np.zeros((101, 101)) for _ in range(2)], cutout_data=[{}, {}])
+    np.random.seed(5)
+    full = generators.add_sersic_objects(blank, n_objects=5)
+    np.random.seed(5)
+    truncated = generators.add_sersic_objects(blank, n_objects=5, light_fraction=0.9999)
+
+    assert np.all(blank.cutouts[0] == 0)
+    for f, t in zip(full.cutouts, truncated.cutouts):
+        assert np.sum(f) > 0
+        assert np.isclose(np.sum(t), np.sum(f), rtol=1e-3)
@@ -1,5 +1,208 @@
-from scipy.signal import convolve2d
+import numpy as np
 
+from scipy import ndimage
+from scipy.fft import irfft2, next_fast_len, rfft2
+from scipy.signal import convolve2d, fftconvolve, oaconvolve
 
-def convolve_model(model, psf):
-    return convolve2d(model, psf, mode='same')
\ No newline at end of file
+
+conv_methods = ("direct", "fft", "oa", "separable", "auto")
+
+
+def convolution_costs(image_shape, kernel_shape, rank=None):
+    """ Estimate the relative cost of each convolution method for a given image and kernel size.
+
+    The estimates are operation counts weighted by per-operation costs measured for scipy's
+    convolve2d, fftconvolve and oaconvolve: direct convolution scales as N * K, FFT convolution as
+    L log L over the zero-padded frame, and overlap-add as the FFTs of the kernel-sized blocks
+    (with some extra bookkeeping per block). If the rank of a separable decomposition of the kernel 
+    is given, the cost of the rank pairs of 1D convolutions (N * rank * (Ky + Kx)) is included too.
+
+    Args:
+        image_shape (tuple): The shape of the image.
+        kernel_shape (tuple): The shape of the kernel.
+        rank (int, optional): Rank of the separable kernel decomposition. Defaults to None.
+
+    Returns:
+        dict: Estimated cost (arbitrary units) for the "direct", "fft" and "oa" methods, and the
+            "separable" method if rank is given.
+    """
+    n_image = np.prod(image_shape, dtype=float)
+    n_kernel = np.prod(kernel_shape, dtype=float)
+
+    fft_len = np.prod([next_fast_len(n + k - 1, real=True) for n, k in zip(image_shape, kernel_shape)],
+                      dtype=float)
+
+    block = [min(next_fast_len(4 * k, real=True), next_fast_len(n + k - 1, real=True))
+             for n, k in zip(image_shape, kernel_shape)]
+    n_blocks = np.prod([np.ceil(n / max(b - k + 1, 1)) for n, k, b in zip(image_shape, kernel_shape, block)])
+    block_len = np.prod(block, dtype=float)
+
+    costs = {
+        "direct": 3 * n_image * n_kernel,
+        "fft": 3 * fft_len * np.log2(fft_len),
+        "oa": 4.5 * n_blocks * block_len * np.log2(block_len),
+    }
+    if rank is not None:
+        costs["separable"] = n_image * rank * np.sum(kernel_shape, dtype=float)
+    return costs
+
+
+def choose_convolution_method(image_shape, kernel_shape, rank=None):
+    """ Pick the cheapest convolution method for a given image and kernel size.
+
+    Args:
+        image_shape (tuple): The shape of the image.
+        kernel_shape (tuple): The shape of the kernel.
+        rank (int, optional): Rank of the separable kernel decomposition, if one is available. 
+            Defaults to None.
+
+    Returns:
+        str: "direct", "fft", "oa" or "separable".
+    """
+    costs = convolution_costs(image_shape, kernel_shape, rank=rank)
+    return min(costs, key=costs.get)
+
+
+def separable_decomposition(psf, max_residual=1e-4, max_rank=None):
+    """ Decompose a PSF into a sum of separable (outer product) terms with an SVD.
+
+    The rank is the smallest one for which the residual energy, the fraction of sum(psf^2) not
+    captured by the kept singular values, is at most max_residual.
+
+    Args:
+        psf (numpy.ndarray): The PSF.
+        max_residual (float, optional): Maximum fractional residual energy. Defaults to 1e-4.
+        max_rank (int, optional): Upper limit on the rank. Defaults to None.
+
+    Returns:
+        tuple: The (rank, Ky) column kernels, the (rank, Kx) row kernels, and the residual energy.
+    """
+    u, s, vt = np.linalg.svd(np.asarray(psf, dtype=float), full_matrices=False)
+    energy = s ** 2
+    residual = np.clip(1 - np.cumsum(energy) / np.sum(energy), 0, None)
+
+    rank = int(np.argmax(residual <= max_residual)) + 1 if np.any(residual <= max_residual) else len(s)
+    if max_rank is not None:
+        rank = min(rank, max_rank)
+
+    return (u[:, :rank] * s[:rank]).T.copy(), vt[:rank].copy(), float(residual[rank - 1])
+
+
+def _convolve1d(image, kernel, axis, mode):
+    # 1D convolution along an axis, with the zero-padded "same"/"full" conventions of convolve2d
+    k = len(kernel)
+    origin = 0 if k % 2 == 1 else -1
+    if mode == "same":
+        return ndimage.convolve1d(image, kernel, axis=axis, mode="constant", origin=origin)
+    
+    pad = [(0, 0)] * image.ndim
+    pad[axis] = (k - 1, k - 1)
+    out = ndimage.convolve1d(np.pad(image, pad), kernel, axis=axis, mode="constant", origin=origin)
+    return np.take(out, np.arange(k // 2, k // 2 + image.shape[axis] + k - 1), axis=axis)
+
+
+def separable_convolve(image, cols, rows, mode="same"):
+    """ Convolve an image with a separable kernel decomposition (see separable_decomposition), as a 
+    sum of pairs of 1D convolutions. This costs N * rank * (Ky + Kx) instead of N * Ky * Kx.
+
+    Args:
+        image (numpy.ndarray): The image.
+        cols (numpy.ndarray): The (rank, Ky) column kernels.
+        rows (numpy.ndarray): The (rank, Kx) row kernels.
+        mode (str, optional): "same" or "full", as in scipy.signal.convolve2d. Defaults to "same".
+
+    Returns:
+        numpy.ndarray: The convolved image.
+    """
+    out = None
+    for col, row in zip(cols, rows):
+        term = _convolve1d(_convolve1d(image, col, 0, mode), row, 1, mode)
+        if out is None:
+            out = term
+        else:
+            out += term
+    return out
+
+
+def batch_fft_convolve(stack, psfs, mode="full", chunk_size=None):
+    """ Convolve a stack of equally sized images with one real FFT pair along the trailing axes.
+
+    The images are zero-padded to the (fast) linear convolution size and transformed together with 
+    rfft2 over axes (-2, -1), multiplied by the transform of the PSF (or by the transform of each 
+    image's own PSF) and transformed back, so the whole stack costs one batched FFT per chunk 
+    instead of one Python-level convolution per image.
+
+    Args:
+        stack (numpy.ndarray): The (N, H, W) image stack.
+        psfs (numpy.ndarray): A single (Ky, Kx) PSF, or an (N, Ky, Kx) stack with one PSF per image.
+        mode (str, optional): Output size, "same" or "full", as in scipy.signal.convolve2d. 
+            Defaults to "full".
+        chunk_size (int, optional): Number of images transformed at once, to bound the memory of the 
+            padded complex transforms. Defaults to None (the whole stack).
+
+    Returns:
+        numpy.ndarray: The (N, H', W') stack of convolved images.
+    """
+    stack, psfs = np.asarray(stack), np.asarray(psfs)
+    n, height, width = stack.shape
+    ky, kx = psfs.shape[-2:]
+    fshape = tuple(next_fast_len(s + k - 1, real=True) for s, k in ((height, ky), (width, kx)))
+
+    if mode == "full":
+        (y_lo, x_lo), (out_h, out_w) = (0, 0), (height + ky - 1, width + kx - 1)
+    elif mode == "same":
+        (y_lo, x_lo), (out_h, out_w) = ((ky - 1) // 2, (kx - 1) // 2), (height, width)
+    else:
+        raise ValueError(f"Invalid mode {mode}. Possible values are 'same' and 'full'.")
+
+    shared = psfs.ndim == 2
+    psf_ft = rfft2(psfs, s=fshape) if shared else None
+    dtype = np.result_type(stack.dtype, psfs.dtype, np.float32)
+    out = np.empty((n, out_h, out_w), dtype=dtype)
+
+    chunk_size = n if chunk_size is None else max(int(chunk_size), 1)
+    for lo in range(0, n, chunk_size):
+        hi = min(lo + chunk_size, n)
+        ft = rfft2(stack[lo:hi], s=fshape, axes=(-2, -1))
+        ft *= psf_ft if shared else rfft2(psfs[lo:hi], s=fshape, axes=(-2, -1))
+        full = irfft2(ft, s=fshape, axes=(-2, -1))
+        out[lo:hi] = full[:, y_lo:y_lo + out_h, x_lo:x_lo + out_w]
+    return out
+
+
+def convolve_model(model, psf, method="auto", mode="same", max_residual=1e-4):
+    """ Convolve a model with a PSF.
+
+    All methods zero-pad the image edges. The exact methods agree to within floating point precision, 
+    the "separable" method to within its residual energy threshold.
+
+    Args:
+        model (numpy.ndarray): The model image.
+        psf (numpy.ndarray): The PSF (kernel).
+        method (str, optional): "direct" (scipy.signal.convolve2d), "fft" (scipy.signal.fftconvolve),
+            "oa" (overlap-add, scipy.signal.oaconvolve), "separable" (low-rank SVD approximation of 
+            the PSF, see separable_decomposition) or "auto" to pick the cheapest exact method from 
+            the image and kernel sizes (see choose_convolution_method). Defaults to "auto".
+        mode (str, optional): Output size, "same" or "full", as in scipy.signal.convolve2d.
+            Defaults to "same".
+        max_residual (float, optional): Residual energy threshold for the "separable" method. 
+            Defaults to 1e-4.
+
+    Returns:
+        numpy.ndarray: The convolved model.
+    """
+    method = method.lower()
+    if method not in conv_methods:
+        raise ValueError(f"Invalid convolution method {method}. Possible values are {conv_methods}.")
+    if method == "auto":
+        method = choose_convolution_method(model.shape, psf.shape)
+
+    if method == "separable":
+        cols, rows, _ = separable_decomposition(psf, max_residual=max_residual)
+        return separable_convolve(model, cols, rows, mode=mode)
+    elif method == "direct":
+        return convolve2d(model, psf, mode=mode)
+    elif method == "fft":
+        return fftconvolve(model, psf, mode=mode)
+    else:
+        return oaconvolve(model, psf, mode=mode)
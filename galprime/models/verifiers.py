@@ -1,3 +1,4 @@
+import numpy as np
 
 
 class ParamVerifier:
@@ -21,6 +22,28 @@ class ParamVerifier:
         is_valid = all(condition(params) for condition in self.conditions)
         return is_valid
     
+    def verify_batch(self, param_list):
+        """ Check every parameter set in a batch at once.
+
+        The parameter dicts are turned into columns of arrays so each condition is evaluated 
+        a single time over the whole batch.
+
+        Args:
+            param_list (list): A list of parameter dictionaries.
+
+        Returns:
+            numpy.ndarray: Boolean array, True where the parameter set is valid.
+        """
+        valid = np.ones(len(param_list), dtype=bool)
+        if len(param_list) == 0:
+            return valid
+        
+        columns = {key: np.array([p[key] for p in param_list]) for key in param_list[0]
+                   if all(key in p for p in param_list)}
+        for condition in self.conditions:
+            valid &= np.asarray(condition(columns), dtype=bool)
+        return valid
+    
     
 class NullVerifier(ParamVerifier):
     def __init__(self):
@@ -45,10 +68,10 @@ class DefaultVerifier(ParamVerifier):
         return p["REFF"] > 0
 
     def n_condition(self, p):
-        return 0 < p["N"] < 10
+        return (0 < p["N"]) & (p["N"] < 10)
 
     def ellip_condition(self, p):
-        return 0 < p["ELLIP"] < 1
+        return (0 < p["ELLIP"]) & (p["ELLIP"] < 1)
 
 class BulgeDiskVerifier(ParamVerifier):
 
@@ -67,7 +90,7 @@ class BulgeDiskVerifier(ParamVerifier):
         return p["MAG"] > 0
 
     def fbulge_condition(self, p):
-        return 0 < p["FBULGE"] < 1
+        return (0 < p["FBULGE"]) & (p["FBULGE"] < 1)
 
     def reff_bulge_condition(self, p):
         return p["REFF_BULGE"] > 0
@@ -76,7 +99,34 @@ class BulgeDiskVerifier(ParamVerifier):
         return p["REFF_DISK"] > 0
 
     def ellip_disk_condition(self, p):
-        return 0 < p["ELLIP_DISK"] < 1
+        return (0 < p["ELLIP_DISK"]) & (p["ELLIP_DISK"] < 1)
 
     def ellip_bulge_condition(self, p):
-        return 0 < p["ELLIP_BULGE"] < 1
+        return (0 < p["ELLIP_BULGE"]) & (p["ELLIP_BULGE"] < 1)
+
+
+class MultiComponentVerifier(ParamVerifier):
+    """ Verifier for MultiComponentModel, checking the suffixed parameters of every component.
+
+    Args:
+        components (dict): Mapping of component name to profile ("SERSIC" or "GAUSSIAN").
+    """
+
+    def __init__(self, components):
+        super().__init__()
+        for name, profile in components.items():
+            self.conditions.append(self._positive(f"MAG_{name}"))
+            self.conditions.append(self._in_range(f"ELLIP_{name}", 0, 1))
+            if profile.upper() == "GAUSSIAN":
+                self.conditions.append(self._positive(f"STDDEV_{name}"))
+            else:
+                self.conditions.append(self._positive(f"REFF_{name}"))
+                self.conditions.append(self._in_range(f"N_{name}", 0, 10))
+
+    @staticmethod
+    def _positive(key):
+        return lambda p: p[key] > 0
+
+    @staticmethod
+    def _in_range(key, low, high):
+        return lambda p: (low < p[key]) & (p[key] < high)
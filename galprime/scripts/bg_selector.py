@@ -6,7 +6,6 @@ import galprime as gp
 import argparse
 from astropy.io import fits 
 from astropy.nddata import Cutout2D
-from astropy.stats import sigma_clipped_stats
 from astropy.table import Table 
 from astropy.wcs import WCS
 
@@ -28,6 +27,7 @@ parser.add_argument("--nbgs", type=int, default=50, help="Run ID")
 parser.add_argument("--cmap", type=str, default='Greys_r', help="Colormap to use for plotting")
 parser.add_argument("--tc", type=str, default="black", help="Text color")
 parser.add_argument("--overwrite", action='store_true', help="Overwrite output file")
+parser.add_argument("--subsample", type=int, default=0, help="Number of pixels to estimate the image statistics from (default 0, all pixels)")
 
 args = parser.parse_args()
 
@@ -45,7 +45,7 @@ def add_bg_info(bg, axis):
     ymin, ymax = axis.get_ylim()
     dx, dy = xmax - xmin, ymax - ymin
 
-    bg_mean, bg_median, bg_std = sigma_clipped_stats(bg.data)
+    bg_mean, bg_median, bg_std = gp.sigclip_stats(bg.data)
 
     out_text = ""
     out_text += f"Mean: {bg_mean:.3e}\n"
@@ -103,7 +103,7 @@ class BackgroundSelector:
 
         self.hist_ax, self.img_ax, self.bgs_ax, self.info_ax = axes
         
-        self.img_stats = sigma_clipped_stats(image)
+        self.img_stats = gp.sigclip_stats(image, subsample=args.subsample or None)
         self.hist_min = self.img_stats[0] - 3 * self.img_stats[2]
         self.hist_max = self.img_stats[0] + 3 * self.img_stats[2]
 
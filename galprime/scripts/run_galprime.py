@@ -65,28 +65,43 @@ def main():
 
         keys, kde = gp.setup_kde(model_template, config, b.objects)
 
-        # Create and pickle the gprime single objects
-        to_process = []
+        # Sample the model parameters for the whole bin
+        param_list = []
         for i in range(n_objects):
-            filename = f'{outfiles["TEMP"]}{run_id}_{b.bin_id()}_{i}.pkl'
-
-            bg = bgs.cutouts[bg_indices[i]]
-            psf = psfs.cutouts[psf_indices[i]]
-
             params = gp.sample_kde(config, keys, kde, model_template)
             params = gp.update_required(params, config)
 
             if mag_kde is not None:
                 mag = mag_kde.resample(size=1)[0][0]
                 params["MAG"] = mag
+            param_list.append(params)
+
+        # Optionally render the whole bin's models up front in a single batch
+        models, model_params = [None] * n_objects, [None] * n_objects
+        if config["MODEL"].get("BATCH", False):
+            models, param_table = model_template.generate_batch(param_list)
+            model_params = [dict(zip(param_table.colnames, row)) for row in param_table]
 
-            gprime_single = gp.GPrimeSingle(config, model(), params, 
+        # Create and pickle the gprime single objects
+        to_process = []
+        for i in range(n_objects):
+            filename = f'{outfiles["TEMP"]}{run_id}_{b.bin_id()}_{i}.pkl'
+
+            bg = bgs.cutouts[bg_indices[i]]
+            psf = psfs.cutouts[psf_indices[i]] if psf_registry is None else psf_registry.kernel(psf_indices[i])
+
+            model_instance = model()
+            if model_params[i] is not None:
+                model_instance.params.update(model_params[i])
+
+            gprime_single = gp.GPrimeSingle(config, model_instance, param_list[i], 
                                             bg=bg, psf=psf, logger=logger,
                                             save_output=args.save_objs,
                                             metadata={"BIN_ID": b.bin_id(),
                                                     "ITERATION": i,
                                                     "BG_INDEX": bg_indices[i],
-                                                    "PSF_INDEX": psf_indices[i]})
+                                                    "PSF_INDEX": psf_indices[i]},
+                                            model_image=models[i], model_params=model_params[i])
             gp.save_object(gprime_single, filename)
 
             to_process.append(filename)
@@ -115,6 +130,11 @@ def main():
         percent_good = len(good_results) / n_objects * 100
         logger.info(f"Bin {b.bin_id()}: {len(good_results)} of {n_objects} successfully finished ({percent_good} %).")
 
+        if config["MASKING"].get("INCREMENTAL", False):
+            n_fallback = sum(bool(r["METADATA"].get("MASK_FALLBACK", False)) for r in good_results)
+            logger.info(f"Bin {b.bin_id()}: incremental bgsub masks fell back to a full segmentation for "
+                        f"{n_fallback} of {len(good_results)} objects.")
+
 
     config = gp.read_config_file(args.config_filename)
 
@@ -133,8 +153,14 @@ def main():
 
     # Load in backgrounds, PSFS, and object catalogue
     bgs = gp.Cutouts.from_file(f'{config["FILE_DIR"]}{config["FILES"]["BACKGROUNDS"]}', logger=logger)
+    bg_sidecar = gp.get_background_sidecar(config, backgrounds=bgs, logger=logger)
     psfs = gp.Cutouts.from_file(f'{config["FILE_DIR"]}{config["FILES"]["PSFS"]}', logger=logger)
     psfs.get_ra_dec(ra_key=config["PSFS"]["PSF_RA"], dec_key=config["PSFS"]["PSF_DEC"])
+
+    # Prepare the PSF library once, before the worker pools are forked
+    psf_registry = gp.get_psf_registry(config, psfs=psfs)
+    if psf_registry is not None:
+        logger.info(f"Built PSF registry of {len(psf_registry)} PSFs for model size {psf_registry.shape}")
     
     # Load in object catalogue
     object_catalogue = gp.load_and_trim_table(config, logger)
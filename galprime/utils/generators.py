@@ -1,7 +1,5 @@
 import numpy as np
 
-from astropy.modeling.models import Sersic2D
-
 from ..core.cutouts import Cutouts
 from .fluxes import I_e
 
@@ -14,10 +12,11 @@ def gen_sersic_models(n_models = 50, width=(81, 81),
                       re_range = [2, 10],
                       m0=27, **kwargs):
     
+    from ..models import rendering
+
     if not isinstance(width, tuple):
         width = (width, width)
 
-    y,x = np.mgrid[:width[0], :width[1]]
     cutouts, cutout_data = [], []
     for i in range(n_models):
         mag = np.random.uniform(*mag_range)
@@ -28,9 +27,7 @@ def gen_sersic_models(n_models = 50, width=(81, 81),
 
         Ltot = fluxes.Ltot(mag, m0)
 
-        sersic = Sersic2D(amplitude=1, r_eff=re, n=n, x_0=width[1]/2, y_0=width[0]/2, ellip=ellip, 
-                          theta=pa)
-        z = sersic(x, y)
+        z = rendering.render_sersic(width, width[1]/2, width[0]/2, re, n, ellip, pa)
         z *= Ltot / np.nansum(z)
         
         cutouts.append(z)
@@ -57,33 +54,43 @@ def add_gaussian_noise(cutouts, mean=0, std=0.5):
 
 
 def add_sersic_objects(cutouts, n_objects=10, reff_range=[1, 5], n_range=[0.5, 4], 
-                       mag_range=[20, 25], ellip_range = [0.05, 0.95], min_r=10):
+                       mag_range=[20, 25], ellip_range = [0.05, 0.95], min_r=10, light_fraction=None):
     """
-    Add sersic objects to the cutouts
+    Add sersic objects to the cutouts. Objects are rendered with the native Sersic engine 
+    (galprime.models.rendering). If light_fraction is given, each object is only rendered within the 
+    box enclosing that fraction of its light, which is much cheaper for compact contaminants.
+
+    The parameters of the objects of each cutout are drawn at once, and their b(n) coefficients are 
+    looked up together in the per-process b(n) table (rendering.bn_table) rather than with one 
+    gammaincinv call per object.
     """
+    from ..models import rendering
+
     cutouts = cutouts.copy()
 
     for i in range(len(cutouts.cutouts)):
         cutout = cutouts.cutouts[i]
-        ys, xs = np.mgrid[:cutout.shape[0], :cutout.shape[1]]
-        for j in range(n_objects):
-            reff = np.random.uniform(reff_range[0], reff_range[1])
-            n = np.random.uniform(n_range[0], n_range[1])
-            mag = np.random.uniform(mag_range[0], mag_range[1])
-            ellip = np.random.uniform(ellip_range[0], ellip_range[1])
-
-            x0, y0 = np.random.uniform(0, cutout.shape[0]), np.random.uniform(0, cutout.shape[1])
-            if np.sqrt((x0 - cutout.shape[0] / 2) ** 2 + (y0 - cutout.shape[1] / 2) ** 2) < min_r:
-                continue
-
-            i_r50 = I_e(mag, reff, n=n)
-
-            theta = np.random.uniform(0, 2 * np.pi)
-
-            model = Sersic2D(amplitude=i_r50, r_eff=reff, n=n, x_0=x0, y_0=y0, ellip=ellip, theta=theta)
-
-            cutout += model(xs, ys)
+        reffs = np.random.uniform(reff_range[0], reff_range[1], n_objects)
+        ns = np.random.uniform(n_range[0], n_range[1], n_objects)
+        mags = np.random.uniform(mag_range[0], mag_range[1], n_objects)
+        ellips = np.random.uniform(ellip_range[0], ellip_range[1], n_objects)
+        x0s, y0s = np.random.uniform(0, cutout.shape[0], n_objects), np.random.uniform(0, cutout.shape[1], n_objects)
+        thetas = np.random.uniform(0, 2 * np.pi, n_objects)
+
+        keep = np.hypot(x0s - cutout.shape[0] / 2, y0s - cutout.shape[1] / 2) >= min_r
+        bns = rendering.bn_table()(ns[keep])
+        i_r50s = I_e(mags[keep], reffs[keep], n=ns[keep], bn=bns)
+
+        for x0, y0, reff, n, ellip, theta, i_r50, bn in zip(x0s[keep], y0s[keep], reffs[keep], ns[keep], 
+                                                             ellips[keep], thetas[keep], i_r50s, bns):
+            if light_fraction is None:
+                cutout += rendering.render_sersic(cutout.shape, x0, y0, reff, n, ellip, theta, amplitude=i_r50, bn=bn)
+            else:
+                stamp, (y_lo, x_lo) = rendering.render_sersic_stamp(cutout.shape, x0, y0, reff, n, ellip, theta,
+                                                                    light_fraction=light_fraction, 
+                                                                    amplitude=i_r50, bn=bn)
+                cutout[y_lo:y_lo + stamp.shape[0], x_lo:x_lo + stamp.shape[1]] += stamp
 
         cutouts.cutouts[i] = cutout
 
-    return cutouts
\ No newline at end of file
+    return cutouts